@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import fcntl
+import atexit
+import argparse
+import threading
+
+import numpy as np
+
+from download_parcial import trilhas, ler_moov, LayoutNaoSuportado
+
+ANALISE_FILE = os.environ.get('ANALISE_CLIPES_FILE', os.path.join('.cache', 'analise_clipes.json'))
+ANALISE_MAX_ENTRADAS = 5000
+# Keyframes guardados com pelo menos isso de distância (clipes só com quadros I teriam um por quadro)
+PASSO_MINIMO = 0.5
+# A janela só sai do começo se for bem mais movimentada; diferença pequena é ruído do encoder
+GANHO_MINIMO = 1.2
+# Corte de cena no meio de um segmento curto parece duas tomadas piscando
+PENALIDADE_CORTE = 0.8
+
+
+def analisar_moov(moov):
+    """Estatísticas da trilha de vídeo tiradas só das tabelas do moov, sem decodificar nada.
+
+    {'duracao', 'keyframes': [segundos], 'bytes': [bytes dos quadros não-chave
+    de cada GOP], 'cortes': [keyframes fora do intervalo regular]}. Quadros P/B
+    crescem com o movimento, então bytes por segundo entre keyframes mede o
+    quanto a imagem muda; keyframes antes do intervalo regular do encoder são
+    cortes de cena. None se não houver trilha de vídeo.
+    """
+    video = next((t for t in trilhas(moov) if t['tipo'] == 'vide' and len(t['tempos'])), None)
+    if video is None:
+        return None
+
+    tempos, tamanhos, sincronas = video['tempos'], video['tamanhos'], video['sincronas']
+    quadro = float(np.median(np.diff(tempos))) if len(tempos) > 1 else 0.0
+    duracao = float(tempos[-1]) + quadro
+
+    indices = []
+    for i in np.flatnonzero(sincronas):
+        if not indices or tempos[i] - tempos[indices[-1]] >= PASSO_MINIMO:
+            indices.append(int(i))
+    if not indices or indices[0] != 0:
+        indices.insert(0, 0)
+
+    # Só com quadros I não há P/B: o tamanho de todos vira a medida
+    peso = tamanhos if sincronas.all() else np.where(sincronas, 0, tamanhos)
+    keyframes = tempos[indices]
+    intervalos = np.diff(np.append(keyframes, duracao))
+    regular = float(np.median(intervalos)) if len(intervalos) else 0.0
+    cortes = [round(float(t), 3) for t, anterior in zip(keyframes[1:], intervalos[:-1]) if anterior < 0.8 * regular]
+
+    return {'duracao': round(duracao, 3), 'keyframes': [round(float(t), 3) for t in keyframes],
+            'bytes': np.add.reduceat(peso, indices).astype(int).tolist(), 'cortes': cortes}
+
+
+def escolher_inicio(analise, segundos):
+    """Keyframe (segundos) onde começa a janela de `segundos` mais movimentada; 0 na dúvida"""
+    if not analise or len(analise['keyframes']) < 2:
+        return 0.0
+
+    keyframes = np.array(analise['keyframes'])
+    duracao = analise['duracao']
+    candidatos = keyframes[keyframes + segundos <= duracao + 1e-3]
+    if len(candidatos) < 2:
+        return 0.0
+
+    # Bytes acumulados nos limites dos GOPs; dentro de um GOP, proporcional ao tempo
+    limites = np.append(keyframes, duracao)
+    acumulado = np.concatenate([[0], np.cumsum(analise['bytes'])])
+    energia = np.interp(candidatos + segundos, limites, acumulado) - np.interp(candidatos, limites, acumulado)
+
+    cortes = np.array(analise['cortes'])
+    if len(cortes):
+        dentro = ((cortes[None, :] > candidatos[:, None] + 1e-3) &
+                  (cortes[None, :] < candidatos[:, None] + segundos)).sum(axis=1)
+        energia = energia * PENALIDADE_CORTE ** dentro
+
+    melhor = int(np.argmax(energia))
+    if energia[melhor] < GANHO_MINIMO * energia[0]:
+        return 0.0
+    return float(candidatos[melhor])
+
+
+class AnalisesClipes:
+    """Análises por mídia (URL ou arquivo local) guardadas em .cache/analise_clipes.json.
+
+    A análise não depende da duração do segmento, então um clipe reaparecendo
+    com outra duração também sai do cache; só o moov ainda é lido para saber
+    os bytes a baixar. Análises novas e acertos (que renovam 'usado', o
+    critério de remoção acima de ANALISE_MAX_ENTRADAS) ficam em memória até
+    salvar(), chamado na publicação e na saída do processo.
+    """
+
+    def __init__(self, arquivo=ANALISE_FILE):
+        self.arquivo = arquivo
+        self.analises = {}
+        self.pendentes = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(arquivo):
+            try:
+                with open(arquivo, 'r', encoding='utf-8') as f:
+                    self.analises = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Cache de análise de clipes inválido: {e}")
+        atexit.register(self.salvar)
+
+    def inicio(self, chave, segundos, moov):
+        """Início da janela para um clipe cujo moov já está em mãos (download parcial)"""
+        entrada = self._obter(chave)
+        if entrada is None:
+            entrada = self._guardar(chave, analisar_moov(moov))
+        return escolher_inicio(entrada['analise'], segundos)
+
+    def inicio_arquivo(self, caminho, segundos):
+        """Início da janela para um MP4 local; 0 se não der para ler o moov"""
+        chave = f'{caminho}:{os.path.getsize(caminho)}:{int(os.path.getmtime(caminho))}'
+        entrada = self._obter(chave)
+        if entrada is None:
+            try:
+                analise = analisar_moov(ler_moov(caminho))
+            except (LayoutNaoSuportado, OSError, ValueError) as e:
+                print(f"⚠️ Sem análise de {os.path.basename(caminho)}: {e}")
+                analise = None
+            entrada = self._guardar(chave, analise)
+        return escolher_inicio(entrada['analise'], segundos)
+
+    def salvar(self):
+        """Junta as análises pendentes ao que está em disco (outros processos também analisam) e grava"""
+        with self._lock:
+            if not self.pendentes:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.arquivo) or '.', exist_ok=True)
+                with open(self.arquivo + '.lock', 'a') as trava:
+                    fcntl.flock(trava, fcntl.LOCK_EX)
+                    try:
+                        with open(self.arquivo, 'r', encoding='utf-8') as f:
+                            analises = json.load(f)
+                    except (OSError, ValueError):
+                        analises = {}
+
+                    for chave, entrada in self.pendentes.items():
+                        anterior = analises.get(chave)
+                        if anterior is None or _usado(anterior) <= _usado(entrada):
+                            analises[chave] = entrada
+                    if len(analises) > ANALISE_MAX_ENTRADAS:
+                        recentes = sorted(analises.items(), key=lambda item: _usado(item[1]))
+                        analises = dict(recentes[-ANALISE_MAX_ENTRADAS:])
+
+                    temporario = self.arquivo + '.tmp'
+                    with open(temporario, 'w', encoding='utf-8') as f:
+                        json.dump(analises, f, separators=(',', ':'))
+                    os.replace(temporario, self.arquivo)
+            except OSError as e:
+                print(f"⚠️ Não foi possível gravar o cache de análise de clipes: {e}")
+                return
+
+            self.analises = analises
+            self.pendentes = {}
+
+    def _obter(self, chave):
+        """Entrada do cache, renovando 'usado' para ela não ser a próxima a sair"""
+        with self._lock:
+            entrada = self.analises.get(chave)
+            if entrada is not None:
+                entrada['usado'] = int(time.time())
+                self.pendentes[chave] = entrada
+        return entrada
+
+    def _guardar(self, chave, analise):
+        agora = int(time.time())
+        entrada = {'analise': analise, 'criado': agora, 'usado': agora}
+        with self._lock:
+            self.analises[chave] = entrada
+            self.pendentes[chave] = entrada
+        return entrada
+
+
+def _usado(entrada):
+    # Entradas gravadas antes de existir 'usado' só têm 'criado'
+    return entrada.get('usado', entrada.get('criado', 0))
+
+
+analises = AnalisesClipes()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Janela mais movimentada de um MP4, pelas tabelas do moov')
+    parser.add_argument('video')
+    parser.add_argument('--segundos', type=float, default=5)
+    args = parser.parse_args(argv)
+
+    analise = analisar_moov(ler_moov(args.video))
+    if not analise:
+        print("⚠️ Sem trilha de vídeo")
+        return
+
+    inicio = escolher_inicio(analise, args.segundos)
+    limites = analise['keyframes'][1:] + [analise['duracao']]
+    for t, fim, quantidade in zip(analise['keyframes'], limites, analise['bytes']):
+        marca = '  ◀' if t == inicio else ('  ✂️' if t in analise['cortes'] else '')
+        print(f"  {t:8.2f}s  {quantidade / max(fim - t, 1e-3) / 1024:9.1f} KB/s{marca}")
+    print(f"🎬 Janela de {args.segundos:g}s começando em {inicio:.2f}s")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,951 @@
+"""Benchmark offline do pipeline de generate_video.py.
+
+Sobe um servidor HTTP local que imita Pexels (busca + arquivos), Gemini
+(generateContent/streamGenerateContent) e YouTube (discovery, upload
+resumable e thumbnails), gera clipes e fotos sintéticos na hora e troca o Edge TTS por um
+tom com duração proporcional ao texto. Cada etapa (roteiro, tts, busca,
+download, render, upload, thumbnail) é cronometrada e o resultado vai para
+bench_results/<data>_<commit>.json.
+
+Uso:
+    python benchmark.py                          # short (~40s) e long (10 min)
+    python benchmark.py --cenarios short --repeticoes 3
+    python benchmark.py --memoria 10 30 60           # pico de RSS/ffmpeg por nº de segmentos
+    python benchmark.py --caminhos 20                # compositor x ffmpeg direto, com e sem legendas
+    python benchmark.py --duracao-clip 30            # clipes longos como os do Pexels (download parcial)
+    python benchmark.py --catalogo                   # colhe o catálogo offline antes (busca local)
+    python benchmark.py --upload-streaming --banda-upload-mbps 40   # upload durante o render (MP4 fragmentado)
+    python benchmark.py --verificar                  # confere download parcial, upload em streaming e thumbnail
+    python benchmark.py --comparar antes.json depois.json
+"""
+import io
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import random
+import shutil
+import asyncio
+import argparse
+import filecmp
+import platform
+import tempfile
+import threading
+import subprocess
+import statistics
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+from PIL import Image
+import imageio_ffmpeg
+
+from tracing import MonitorRecursos
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTADOS_DIR = os.path.join(REPO_DIR, 'bench_results')
+FFMPEG = imageio_ffmpeg.get_ffmpeg_exe()
+
+PALAVRAS_POR_SEGMENTO = 12
+RESULTADOS_POR_PAGINA = 10
+ESTAGIOS = ['roteiro', 'tts', 'busca', 'download', 'render', 'upload', 'thumbnail']
+
+CENARIOS = {
+    'short': {'tipo': 'short', 'duracao': 40},
+    'long': {'tipo': 'long', 'duracao': 600},
+}
+
+FORMATOS = {'portrait': (1080, 1920), 'landscape': (1920, 1080)}
+
+VOCABULARIO = ('universo estrela planeta oceano floresta cérebro memória história segredo '
+               'descoberta energia tempo cidade montanha rio animal ciência mistério luz '
+               'vento gelo fogo pedra ouro máquina código sonho viagem ilha deserto').split()
+KEYWORDS = 'space ocean forest brain city mountain river animal light technology desert ice'.split()
+
+
+def gerar_midias(pasta, quantidade, duracao_clip):
+    """Clipes com ruído colorido e JPEGs de ruído nas duas orientações"""
+    os.makedirs(pasta, exist_ok=True)
+    rng = np.random.RandomState(7)
+    arquivos = {'video': {}, 'foto': {}}
+
+    for orientacao, (largura, altura) in FORMATOS.items():
+        arquivos['video'][orientacao] = []
+        arquivos['foto'][orientacao] = []
+
+        for i in range(quantidade):
+            nome = f'v_{orientacao}_{i}.mp4'
+            cor = '0x%06x' % rng.randint(0, 0xFFFFFF)
+            subprocess.run([
+                FFMPEG, '-y', '-loglevel', 'error',
+                '-f', 'lavfi', '-i', f'color=c={cor}:s={largura}x{altura}:r=30:d={duracao_clip}',
+                '-vf', 'noise=alls=30:allf=t+u', '-c:v', 'libx264', '-preset', 'ultrafast',
+                '-pix_fmt', 'yuv420p', '-movflags', '+faststart', os.path.join(pasta, nome)
+            ], check=True)
+            arquivos['video'][orientacao].append(nome)
+
+            nome = f'f_{orientacao}_{i}.jpg'
+            base = rng.randint(0, 256, size=3)
+            ruido = rng.randint(-40, 40, size=(altura // 8, largura // 8, 3))
+            pixels = np.clip(base + ruido, 0, 255).astype(np.uint8)
+            Image.fromarray(pixels).resize((largura, altura)).save(os.path.join(pasta, nome), quality=90)
+            arquivos['foto'][orientacao].append(nome)
+
+    return arquivos
+
+
+def texto_falso(palavras, rng):
+    frases = []
+    while palavras > 0:
+        tamanho = min(palavras, PALAVRAS_POR_SEGMENTO)
+        frase = ' '.join(rng.choice(VOCABULARIO) for _ in range(tamanho))
+        frases.append(frase.capitalize() + '.')
+        palavras -= tamanho
+    return frases
+
+
+def resposta_gemini(prompt, rng):
+    """Resposta plausível para cada tipo de prompt do pipeline"""
+    match = re.search(r'(\d+(?:\.\d+)?) palavras', prompt)
+    palavras = int(float(match.group(1))) if match else 120
+
+    if '"segmentos"' in prompt:
+        # Como num roteiro real, os segmentos giram em torno de poucos assuntos
+        assunto = rng.sample(KEYWORDS, 5)
+        return json.dumps({
+            'titulo': 'Benchmark ' + ' '.join(rng.sample(VOCABULARIO, 4)),
+            'tags': rng.sample(VOCABULARIO, 6),
+            'segmentos': [{'texto': frase, 'keywords': rng.sample(assunto, 3)}
+                          for frase in texto_falso(palavras, rng)]
+        }, ensure_ascii=False)
+
+    if 'palavras-chave em INGLÊS' in prompt:
+        return ', '.join(rng.sample(KEYWORDS, 4))
+
+    if '"titulo"' in prompt:
+        return json.dumps({'titulo': 'Benchmark ' + ' '.join(rng.sample(VOCABULARIO, 4)),
+                           'keywords': rng.sample(KEYWORDS, 5)})
+
+    return ' '.join(texto_falso(palavras, rng))
+
+
+class ServidorFalso(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, pasta_midias, arquivos, latencia, banda_upload=None):
+        super().__init__(('127.0.0.1', 0), HandlerFalso)
+        self.pasta_midias = pasta_midias
+        self.arquivos = arquivos
+        self.latencia = latencia
+        # Bytes por segundo aceitos no upload do YouTube; None = sem limite
+        self.banda_upload = banda_upload
+        self.rng = random.Random(42)
+        self.uploads = {}
+        self.hashes = {}
+        self.thumbnails = {}
+        self.contadores = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def contar(self, nome, bytes_=0):
+        with self._lock:
+            c = self.contadores.setdefault(nome, {'requisicoes': 0, 'bytes': 0})
+            c['requisicoes'] += 1
+            c['bytes'] += bytes_
+
+
+class HandlerFalso(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, dados, status=200, headers=None):
+        corpo = json.dumps(dados).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        for chave, valor in (headers or {}).items():
+            self.send_header(chave, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _corpo(self):
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(tamanho) if tamanho else b''
+
+    def do_HEAD(self):
+        self.do_GET(somente_cabecalho=True)
+
+    def do_GET(self, somente_cabecalho=False):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        servidor = self.server
+
+        if url.path in ('/videos/search', '/v1/search'):
+            time.sleep(servidor.latencia)
+            tipo = 'video' if url.path.startswith('/videos') else 'foto'
+            orientacao = params.get('orientation', ['portrait'])[0]
+            consulta = params.get('query', [''])[0]
+            pagina = int(params.get('page', ['1'])[0])
+            servidor.contar('pexels_busca')
+            self._json(self._resultados(tipo, orientacao, consulta, pagina))
+        elif url.path.startswith('/media/'):
+            self._arquivo(url.path[len('/media/'):], somente_cabecalho)
+        elif url.path.startswith('/discovery/'):
+            self._json(self._discovery())
+        else:
+            self._json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        servidor = self.server
+        corpo = self._corpo()
+
+        if ':generateContent' in url.path or ':streamGenerateContent' in url.path:
+            time.sleep(servidor.latencia)
+            servidor.contar('gemini')
+            prompt = json.loads(corpo)['contents'][0]['parts'][0]['text']
+            texto = resposta_gemini(prompt, servidor.rng)
+            if ':streamGenerateContent' in url.path:
+                self._sse(texto)
+            else:
+                self._json({'candidates': [{'content': {'parts': [{'text': texto}]}}]})
+        elif url.path.startswith('/upload/youtube/v3/'):
+            upload_id = str(len(servidor.uploads) + 1)
+            servidor.uploads[upload_id] = 0
+            servidor.hashes[upload_id] = hashlib.sha256()
+            if '/thumbnails/' in url.path:
+                servidor.thumbnails[upload_id] = bytearray()
+            self._json({}, headers={'Location': f'{servidor.base}{url.path}?upload_id={upload_id}'})
+        else:
+            self._json({'error': 'not found'}, 404)
+
+    def do_PUT(self):
+        url = urlparse(self.path)
+        servidor = self.server
+        upload_id = parse_qs(url.query).get('upload_id', [''])[0]
+        corpo = self._corpo()
+        servidor.contar('youtube_thumbnail' if '/thumbnails/' in url.path else 'youtube_upload', len(corpo))
+        if servidor.banda_upload and '/thumbnails/' not in url.path:
+            time.sleep(len(corpo) / servidor.banda_upload)
+
+        # Content-Range: bytes a-b/total (total '*' enquanto o tamanho é desconhecido)
+        match = re.match(r'bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)', self.headers.get('Content-Range', ''))
+        if match and match.group(1) and int(match.group(1)) != servidor.uploads.get(upload_id, 0):
+            self._json({'error': f'pedaço começa em {match.group(1)}, recebido {servidor.uploads.get(upload_id, 0)}'}, 400)
+            return
+
+        recebido = servidor.uploads.get(upload_id, 0) + len(corpo)
+        servidor.uploads[upload_id] = recebido
+        if upload_id in servidor.hashes:
+            servidor.hashes[upload_id].update(corpo)
+        if upload_id in servidor.thumbnails:
+            servidor.thumbnails[upload_id] += corpo
+
+        if match and (match.group(3) == '*' or (match.group(2) and int(match.group(2)) + 1 < int(match.group(3)))):
+            self.send_response(308)
+            self.send_header('Range', f'bytes=0-{recebido - 1}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if '/thumbnails/' in url.path:
+            self._json({'items': [{'default': {'url': f'{servidor.base}/thumb.jpg'}}]})
+        else:
+            self._json({'id': f'bench{upload_id}', 'snippet': {}, 'status': {'uploadStatus': 'uploaded'}})
+
+    def _resultados(self, tipo, orientacao, consulta, pagina):
+        arquivos = self.server.arquivos[tipo][orientacao]
+        largura, altura = FORMATOS[orientacao]
+        # IDs estáveis por (consulta, página) para o índice de mídias usadas funcionar
+        semente = sum(map(ord, consulta)) * 100 + pagina * RESULTADOS_POR_PAGINA
+        itens = []
+
+        for i in range(RESULTADOS_POR_PAGINA):
+            media_id = semente + i
+            link = f'{self.server.base}/media/{arquivos[media_id % len(arquivos)]}?id={media_id}'
+            # Descrição em inglês como nas páginas do Pexels, para o catálogo indexar
+            descricao = random.Random(media_id).sample(KEYWORDS, 3)
+            if tipo == 'video':
+                itens.append({'id': media_id, 'duration': 8, 'width': largura, 'height': altura,
+                              'url': f"https://www.pexels.com/video/{'-'.join(descricao)}-{media_id}/",
+                              'video_files': [{'link': link, 'width': largura, 'height': altura, 'quality': 'hd'}]})
+            else:
+                itens.append({'id': media_id, 'width': largura, 'height': altura, 'alt': ' '.join(descricao),
+                              'url': f"https://www.pexels.com/photo/{'-'.join(descricao)}-{media_id}/",
+                              'src': {'large2x': link, 'original': link}})
+
+        return {'videos': itens} if tipo == 'video' else {'photos': itens}
+
+    def _arquivo(self, nome, somente_cabecalho):
+        caminho = os.path.join(self.server.pasta_midias, os.path.basename(nome))
+        if not os.path.exists(caminho):
+            self._json({'error': 'not found'}, 404)
+            return
+
+        tamanho = os.path.getsize(caminho)
+        inicio, fim = 0, tamanho - 1
+        match = re.match(r'bytes=(\d*)-(\d*)', self.headers.get('Range', ''))
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                inicio = int(match.group(1))
+                fim = min(int(match.group(2)), fim) if match.group(2) else fim
+            else:
+                inicio = max(0, tamanho - int(match.group(2)))
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {inicio}-{fim}/{tamanho}')
+        else:
+            self.send_response(200)
+
+        self.send_header('Content-Type', 'video/mp4' if caminho.endswith('.mp4') else 'image/jpeg')
+        self.send_header('Content-Length', str(fim - inicio + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        if somente_cabecalho:
+            return
+
+        self.server.contar('download', fim - inicio + 1)
+        with open(caminho, 'rb') as f:
+            f.seek(inicio)
+            restante = fim - inicio + 1
+            while restante > 0:
+                bloco = f.read(min(1 << 16, restante))
+                if not bloco:
+                    break
+                self.wfile.write(bloco)
+                restante -= len(bloco)
+
+    def _sse(self, texto):
+        palavras = texto.split(' ')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for i in range(0, len(palavras), 8):
+            pedaco = ' '.join(palavras[i:i + 8]) + (' ' if i + 8 < len(palavras) else '')
+            evento = {'candidates': [{'content': {'parts': [{'text': pedaco}]}}]}
+            dados = f'data: {json.dumps(evento)}\n\n'.encode('utf-8')
+            self.wfile.write(f'{len(dados):x}\r\n'.encode('ascii') + dados + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _discovery(self):
+        """Documento de discovery do YouTube com rootUrl apontando para este servidor"""
+        import googleapiclient
+        caminho = os.path.join(os.path.dirname(googleapiclient.__file__), 'discovery_cache', 'documents',
+                               'youtube.v3.json')
+        with open(caminho, 'r', encoding='utf-8') as f:
+            documento = json.load(f)
+        documento['rootUrl'] = self.server.base + '/'
+        documento['baseUrl'] = self.server.base + '/youtube/v3/'
+        return documento
+
+
+class ComunicadorTom:
+    """Substitui edge_tts.Communicate: um tom de 220Hz com a duração que a fala teria"""
+
+    # Ajustado por cenário para o roteiro inteiro durar a duração alvo
+    palavras_por_segundo = 2.5
+
+    def __init__(self, texto, voz=None, **kwargs):
+        self.duracao = max(0.5, len(texto.split()) / self.palavras_por_segundo)
+
+    async def save(self, caminho):
+        processo = await asyncio.create_subprocess_exec(
+            FFMPEG, '-y', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f'sine=frequency=220:sample_rate=24000:duration={self.duracao:.2f}',
+            '-c:a', 'libmp3lame', '-b:a', '48k', caminho
+        )
+        if await processo.wait() != 0:
+            raise RuntimeError('ffmpeg falhou ao gerar o tom')
+
+
+class Cronometro:
+    """Soma o tempo gasto dentro de uma função (e quantas vezes foi chamada)"""
+
+    def __init__(self, funcao):
+        self.funcao = funcao
+        self.segundos = 0.0
+        self.chamadas = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return self.funcao(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.segundos += time.perf_counter() - inicio
+                self.chamadas += 1
+
+    def zerar(self):
+        self.segundos = 0.0
+        self.chamadas = 0
+
+
+def commit_atual():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        sujo = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_DIR,
+                              capture_output=True, text=True).stdout.strip()
+        return commit + ('-dirty' if sujo else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecido'
+
+
+def sha256_arquivo(caminho):
+    """SHA-256 lido em blocos (hashlib.file_digest só existe a partir do Python 3.11; os workflows usam 3.10)"""
+    hash_ = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            hash_.update(bloco)
+    return hash_.hexdigest()
+
+
+def preparar_ambiente(servidor, pasta_trabalho):
+    """Aponta o pipeline para o servidor local e importa generate_video dentro da pasta de trabalho"""
+    shutil.copy(os.path.join(REPO_DIR, 'config.json'), pasta_trabalho)
+    os.chdir(pasta_trabalho)
+
+    os.environ.update({
+        'PEXELS_API_KEY': 'benchmark',
+        'PEXELS_API_URL': servidor.base,
+        'GEMINI_API_KEY': 'benchmark',
+        'GEMINI_ENDPOINT': servidor.base,
+        'GEMINI_RPM': '100000',
+        'YOUTUBE_DISCOVERY_URL': servidor.base + '/discovery/{api}/{apiVersion}',
+        'YOUTUBE_CREDENTIALS': json.dumps({
+            'token': 'benchmark', 'refresh_token': 'benchmark', 'client_id': 'benchmark',
+            'client_secret': 'benchmark', 'expiry': '2099-01-01T00:00:00Z'
+        }),
+        'USAR_CURACAO': 'false',
+        'FALLBACK_FOTOS': '4',
+        'FALLBACK_VIDEOS': '2',
+        # A colheita do catálogo (--catalogo) faz uma busca por tema, orientação e tipo de uma vez
+        'PEXELS_LIMITE_HORA': '100000',
+    })
+
+    # Pool de fallback aquecido fora do tempo medido, como no workflow
+    sys.path.insert(0, REPO_DIR)
+    import fallback_pool
+    fallback_pool.PoolFallback().atualizar('benchmark')
+
+    import generate_video
+    return generate_video
+
+
+def executar_cenario(g, nome, cenario, cronometros, servidor, streaming=False):
+    """Roda roteiro → TTS → busca → render → upload cronometrando cada etapa.
+
+    Com streaming o upload acontece durante o render (MP4 fragmentado); o
+    tempo de upload é só o que sobra depois que o render termina.
+    """
+    g.VIDEO_TYPE = cenario['tipo']
+    g.config['duracao_minutos'] = cenario['duracao'] / 60
+    for cronometro in cronometros.values():
+        cronometro.zerar()
+
+    os.makedirs(g.ASSETS_DIR, exist_ok=True)
+    os.makedirs(g.VIDEOS_DIR, exist_ok=True)
+    tempos = {}
+
+    inicio = time.perf_counter()
+    plano = g.gerar_plano(cenario['tipo'], random.choice(g.config['temas']), usar_cache=False)
+    tempos['roteiro'] = time.perf_counter() - inicio
+    if not plano:
+        raise RuntimeError('plano não foi gerado')
+
+    ComunicadorTom.palavras_por_segundo = len(plano['roteiro'].split()) / cenario['duracao']
+    audio_path = os.path.join(g.ASSETS_DIR, 'audio.mp3')
+    inicio = time.perf_counter()
+    g.criar_audio(plano['roteiro'], audio_path)
+    audio_clip = g.AudioFileClip(audio_path)
+    duracao = audio_clip.duration
+    audio_clip.close()
+    tempos['tts'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    # Uma Execucao só para a busca inteira: o planejador de mídias agrupa os segmentos dela
+    atual = g.Execucao(cenario['tipo'], g.config, g.ASSETS_DIR, g.VIDEOS_DIR)
+    with g.usar_execucao(atual):
+        midias = g.analisar_roteiro_e_buscar_midias(plano['roteiro'], duracao, segmentos_plano=plano['segmentos'])
+    tempos['busca'] = time.perf_counter() - inicio
+
+    video_path = os.path.join(g.VIDEOS_DIR, f'{nome}.mp4')
+    criar_video = g.criar_video_short_sincronizado if cenario['tipo'] == 'short' else g.criar_video_long_sincronizado
+    cronometros['download'].zerar()
+    inicio = time.perf_counter()
+    if streaming:
+        fim_render = []
+
+        def renderizar():
+            pronto = criar_video(audio_path, midias, video_path, duracao, True)
+            fim_render.append(time.perf_counter())
+            return pronto
+
+        _, video_id = g.renderizar_e_enviar(renderizar, video_path, plano['titulo'], plano['roteiro'][:300],
+                                            plano['tags'])
+        if not video_id:
+            raise RuntimeError('render não produziu vídeo')
+        tempos['download'] = cronometros['download'].segundos
+        tempos['render'] = fim_render[0] - inicio - tempos['download']
+        tempos['upload'] = time.perf_counter() - fim_render[0]
+    else:
+        if not criar_video(audio_path, midias, video_path, duracao):
+            raise RuntimeError('render não produziu vídeo')
+        # Os downloads acontecem dentro do render; separados para medir cada etapa
+        tempos['download'] = cronometros['download'].segundos
+        tempos['render'] = time.perf_counter() - inicio - tempos['download']
+
+        inicio = time.perf_counter()
+        video_id = g.fazer_upload_youtube(video_path, plano['titulo'], plano['roteiro'][:300], plano['tags'])
+        tempos['upload'] = time.perf_counter() - inicio
+
+    # O servidor falso guarda o hash do que recebeu: o upload tem que ser o arquivo final, byte a byte
+    if sha256_arquivo(video_path) != servidor.hashes[video_id[len('bench'):]].hexdigest():
+        raise RuntimeError('bytes enviados diferem do vídeo renderizado')
+
+    inicio = time.perf_counter()
+    if not g.publicar_thumbnail(video_path, plano['titulo'], video_id):
+        raise RuntimeError('thumbnail não foi enviada')
+    tempos['thumbnail'] = time.perf_counter() - inicio
+
+    tempos['total'] = sum(tempos[e] for e in ESTAGIOS)
+
+    resultado = {
+        'duracao_video': round(duracao, 2),
+        'segmentos': len(plano['segmentos']),
+        'midias': len(midias),
+        'bytes_video': os.path.getsize(video_path),
+        'buscas_pexels': cronometros['busca'].chamadas,
+        'assuntos': len(atual.planejador.grupos),
+        'assuntos_catalogo': atual.planejador.locais,
+        'downloads': cronometros['download'].chamadas,
+        'estagios': {estagio: round(segundos, 3) for estagio, segundos in tempos.items()},
+    }
+
+    shutil.rmtree(g.ASSETS_DIR, ignore_errors=True)
+    os.remove(video_path)
+    return resultado
+
+
+def medir_memoria(g, servidor, arquivos, contagens, duracao_segmento):
+    """Renderiza vídeos long com N segmentos de vídeo e mede pico de RSS e de processos filhos.
+
+    Com fontes abertas sob demanda, os picos devem ficar constantes à medida
+    que o número de segmentos cresce.
+    """
+    g.VIDEO_TYPE = 'long'
+    videos = arquivos['video']['landscape']
+    resultados = {}
+
+    for n in contagens:
+        os.makedirs(g.ASSETS_DIR, exist_ok=True)
+        os.makedirs(g.VIDEOS_DIR, exist_ok=True)
+        duracao = n * duracao_segmento
+        audio_path = os.path.join(g.ASSETS_DIR, 'audio.mp3')
+        subprocess.run([
+            FFMPEG, '-y', '-loglevel', 'error', '-f', 'lavfi',
+            '-i', f'sine=frequency=220:sample_rate=24000:duration={duracao:.2f}', audio_path
+        ], check=True)
+
+        midias = [{
+            'midia': (f'{servidor.base}/media/{videos[i % len(videos)]}?id={i}', 'video'),
+            'inicio': i * duracao_segmento,
+            'duracao': duracao_segmento,
+        } for i in range(n)]
+
+        print(f"\n🧠 Memória: {n} segmentos ({duracao:.0f}s)...")
+        video_path = os.path.join(g.VIDEOS_DIR, f'memoria_{n}.mp4')
+        inicio = time.perf_counter()
+        with g.tracer.span('memoria', segmentos=n) as span, MonitorRecursos(span, intervalo=0.1):
+            if not g.criar_video_long_sincronizado(audio_path, midias, video_path, duracao):
+                raise RuntimeError('render não produziu vídeo')
+
+        encode = [s for s in g.tracer.spans if s.nome == 'encode'][-1]
+        resultados[str(n)] = {
+            'segundos': round(time.perf_counter() - inicio, 3),
+            'pico_rss_mb': span.atributos['pico_rss_mb'],
+            'processos_filhos_pico': span.atributos['processos_filhos_pico'],
+            'fontes_abertas_pico': encode.atributos.get('fontes_abertas_pico'),
+        }
+
+        shutil.rmtree(g.ASSETS_DIR, ignore_errors=True)
+        os.remove(video_path)
+
+    return resultados
+
+
+def comparar_caminhos(g, servidor, arquivos, segmentos, duracao_segmento):
+    """Renderiza a mesma linha do tempo (3 fotos para cada vídeo, só cortes) pelo compositor e pelo ffmpeg,
+    sem e com legendas (narração de ~2,5 palavras por segundo)"""
+    resultados = {}
+
+    for tipo, orientacao in (('short', 'portrait'), ('long', 'landscape')):
+        g.VIDEO_TYPE = tipo
+        fotos = arquivos['foto'][orientacao]
+        videos = arquivos['video'][orientacao]
+        duracao = segmentos * duracao_segmento
+        resultados[tipo] = {}
+
+        variantes = [(caminho, render_cortes, legendas)
+                     for caminho, render_cortes in (('compositor', False), ('cortes', True))
+                     for legendas in (False, True)]
+        for caminho, render_cortes, legendas in variantes:
+            nome = caminho + ('+legendas' if legendas else '')
+            os.makedirs(g.ASSETS_DIR, exist_ok=True)
+            os.makedirs(g.VIDEOS_DIR, exist_ok=True)
+            audio_path = os.path.join(g.ASSETS_DIR, 'audio.mp3')
+            subprocess.run([
+                FFMPEG, '-y', '-loglevel', 'error', '-f', 'lavfi',
+                '-i', f'sine=frequency=220:sample_rate=24000:duration={duracao:.2f}', audio_path
+            ], check=True)
+
+            midias = [{
+                'midia': (f'{servidor.base}/media/{videos[i % len(videos)]}?id={i}', 'video') if i % 4 == 3
+                else (f'{servidor.base}/media/{fotos[i % len(fotos)]}?id={i}', 'foto'),
+                'inicio': i * duracao_segmento,
+                'duracao': duracao_segmento,
+                'texto': 'benchmark',
+                'texto_completo': texto_falso(max(1, round(duracao_segmento * 2.5)), random.Random(i))[0],
+            } for i in range(segmentos)]
+
+            print(f"\n✂️ {tipo}, {segmentos} segmentos pelo {nome}...")
+            g.RENDER_CORTES = render_cortes
+            g.config['legendas'] = legendas
+            video_path = os.path.join(g.VIDEOS_DIR, f'caminho_{caminho}.mp4')
+            criar_video = g.criar_video_short_sincronizado if tipo == 'short' else g.criar_video_long_sincronizado
+            spans_antes = len(g.tracer.spans)
+            if not criar_video(audio_path, midias, video_path, duracao):
+                raise RuntimeError('render não produziu vídeo')
+
+            novos = g.tracer.spans[spans_antes:]
+            encode = [s for s in novos if s.nome == 'encode'][-1]
+            resultados[tipo][nome] = {
+                'segundos': round(encode.duracao, 3),
+                'caminho_usado': encode.atributos.get('caminho'),
+                'legendas': any(s.nome == 'legendas' for s in novos),
+                'bytes_video': os.path.getsize(video_path),
+                'pico_rss_mb': encode.atributos.get('pico_rss_mb'),
+            }
+
+            shutil.rmtree(g.ASSETS_DIR, ignore_errors=True)
+            os.remove(video_path)
+
+    g.RENDER_CORTES = True
+    g.config.pop('legendas', None)
+    return resultados
+
+
+def gerar_amostras_mp4(pasta, duracao=12):
+    """O mesmo tipo de clipe (keyframe a cada 1s, com áudio) nos três layouts de MP4 que o download parcial encontra"""
+    layouts = {
+        'faststart': ['-movflags', '+faststart'],
+        'moov_no_fim': [],
+        'fragmentado': ['-movflags', 'frag_keyframe+empty_moov+default_base_moof'],
+    }
+    amostras = {}
+    for layout, opcoes in layouts.items():
+        nome = f'amostra_{layout}.mp4'
+        subprocess.run([
+            FFMPEG, '-y', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f'testsrc2=s=640x360:r=30:d={duracao}',
+            '-f', 'lavfi', '-i', f'sine=f=440:d={duracao}',
+            '-vf', 'noise=alls=30:allf=t+u', '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '30',
+            '-pix_fmt', 'yuv420p', '-c:a', 'aac', *opcoes, os.path.join(pasta, nome)
+        ], check=True)
+        amostras[layout] = nome
+    return amostras
+
+
+def quadros_decodificados(caminho):
+    """framemd5 de todos os streams: duas listas iguais são os mesmos quadros e amostras de áudio"""
+    saida = subprocess.run([FFMPEG, '-loglevel', 'error', '-i', caminho, '-map', '0', '-f', 'framemd5', '-'],
+                           check=True, capture_output=True, text=True).stdout
+    return [linha for linha in saida.splitlines() if not linha.startswith('#')]
+
+
+def verificar_download_parcial(servidor, pasta_midias, pasta_saida, inicio=4.0, segundos=2.0):
+    """Baixa um trecho de cada layout pelo servidor falso (que atende Range) e confere bytes e quadros.
+
+    faststart e moov no fim têm que vir parciais e decodificar exatamente como
+    o mesmo recorte feito sobre o arquivo inteiro; o fragmentado tem que cair
+    no download completo, byte a byte igual ao original. Retorna as falhas.
+    """
+    from download_parcial import DownloadParcial, recortar, MARGEM
+
+    falhas = []
+    os.makedirs(pasta_saida, exist_ok=True)
+    for layout, nome in gerar_amostras_mp4(pasta_midias).items():
+        original = os.path.join(pasta_midias, nome)
+        destino = os.path.join(pasta_saida, nome)
+        total = os.path.getsize(original)
+
+        servidor.contadores.pop('download', None)
+        download = DownloadParcial(f'{servidor.base}/media/{nome}')
+        parcial = download.baixar(destino, segundos, lambda moov: inicio)
+        enviados = servidor.contadores.get('download', {}).get('bytes', 0)
+
+        erros = []
+        if download.baixados != enviados:
+            erros.append(f'contou {download.baixados} bytes, o servidor enviou {enviados}')
+        if layout == 'fragmentado':
+            if parcial:
+                erros.append('MP4 fragmentado não caiu no download completo')
+            if enviados != total:
+                erros.append(f'{enviados} bytes enviados para um arquivo de {total}')
+            if not filecmp.cmp(original, destino, shallow=False):
+                erros.append('download completo difere do original')
+        else:
+            if not parcial:
+                erros.append('trecho não foi baixado por faixas')
+            if enviados > total / 2:
+                erros.append(f'{enviados} de {total} bytes baixados para {segundos:.0f}s')
+            referencia = destino + '.referencia.mp4'
+            recortar(original, referencia, inicio, segundos + MARGEM)
+            esperados = quadros_decodificados(referencia)
+            obtidos = quadros_decodificados(destino)
+            if obtidos != esperados:
+                erros.append(f'{len(obtidos)} quadros decodificados diferem dos {len(esperados)} do recorte local')
+            elif len(esperados) < segundos * 30:
+                erros.append(f'só {len(esperados)} quadros para {segundos:.0f}s')
+
+        print(f"{'❌' if erros else '✅'} Download parcial ({layout}): {enviados / 2**10:.0f} de {total / 2**10:.0f} KB"
+              f"{' - ' + '; '.join(erros) if erros else ''}")
+        falhas += [f'download parcial ({layout}): {erro}' for erro in erros]
+    return falhas
+
+
+def verificar_uploads(g, servidor, cronometros):
+    """Short curto com upload normal e em streaming: bytes iguais ao vídeo, pedaços durante o render e thumbnail JPEG"""
+    falhas = []
+    cenario = dict(CENARIOS['short'], duracao=10)
+    for streaming in (False, True):
+        modo = 'streaming' if streaming else 'normal'
+        servidor.contadores.pop('youtube_upload', None)
+        try:
+            # executar_cenario já confere o hash do que chegou ao YouTube falso contra o arquivo renderizado
+            executar_cenario(g, f'verificacao_{modo}', cenario, cronometros, servidor, streaming)
+        except RuntimeError as e:
+            falhas.append(f'upload {modo}: {e}')
+            print(f"❌ Upload {modo}: {e}")
+            continue
+
+        erros = []
+        pedacos = servidor.contadores.get('youtube_upload', {}).get('requisicoes', 0)
+        if streaming and pedacos < 2:
+            erros.append(f'{pedacos} pedaço(s) enviado(s); o upload não acompanhou o render')
+
+        ultima = servidor.thumbnails[max(servidor.thumbnails, key=int)] if servidor.thumbnails else b''
+        try:
+            imagem = Image.open(io.BytesIO(ultima))
+            if imagem.format != 'JPEG' or imagem.size != (720, 1280):
+                erros.append(f'thumbnail {imagem.format} {imagem.size[0]}x{imagem.size[1]}, esperado JPEG 720x1280')
+        except OSError:
+            erros.append('thumbnail recebida não é uma imagem')
+
+        print(f"{'❌' if erros else '✅'} Upload {modo}: {pedacos} pedaço(s), thumbnail {len(ultima) / 2**10:.0f} KB"
+              f"{' - ' + '; '.join(erros) if erros else ''}")
+        falhas += [f'upload {modo}: {erro}' for erro in erros]
+    return falhas
+
+
+def mediana_das_execucoes(execucoes):
+    resultado = dict(execucoes[0])
+    resultado['estagios'] = {
+        estagio: round(statistics.median(e['estagios'][estagio] for e in execucoes), 3)
+        for estagio in execucoes[0]['estagios']
+    }
+    resultado['execucoes'] = [e['estagios'] for e in execucoes]
+    return resultado
+
+
+def imprimir_resultado(resultado):
+    for nome, cenario in resultado['cenarios'].items():
+        print(f"\n📊 {nome}: {cenario['duracao_video']:.0f}s, {cenario['segmentos']} segmentos, "
+              f"{cenario['midias']} mídias")
+        for estagio, segundos in cenario['estagios'].items():
+            print(f"  {estagio:<10} {segundos:>9.2f}s")
+
+    for n, medida in resultado.get('memoria', {}).items():
+        print(f"\n🧠 {n} segmentos: pico RSS {medida['pico_rss_mb']:.0f} MB, "
+              f"{medida['processos_filhos_pico']} processos filhos, "
+              f"{medida['fontes_abertas_pico']} fontes abertas, {medida['segundos']:.1f}s")
+
+    for tipo, medidas in resultado.get('caminhos', {}).items():
+        compositor, cortes = medidas['compositor'], medidas['cortes']
+        print(f"\n✂️ {tipo}: compositor {compositor['segundos']:.1f}s, cortes {cortes['segundos']:.1f}s "
+              f"({compositor['segundos'] / cortes['segundos']:.1f}x)")
+        for caminho in ('compositor', 'cortes'):
+            com_legendas = medidas.get(caminho + '+legendas')
+            if com_legendas and com_legendas['legendas']:
+                custo = (com_legendas['segundos'] - medidas[caminho]['segundos']) / medidas[caminho]['segundos'] * 100
+                print(f"  💬 legendas no {caminho}: {com_legendas['segundos']:.1f}s ({custo:+.1f}%)")
+
+
+def comparar(arquivo_a, arquivo_b):
+    with open(arquivo_a, 'r', encoding='utf-8') as f:
+        a = json.load(f)
+    with open(arquivo_b, 'r', encoding='utf-8') as f:
+        b = json.load(f)
+
+    print(f"📊 {a['commit']} → {b['commit']}")
+    for nome in a['cenarios']:
+        if nome not in b['cenarios']:
+            continue
+        print(f"\n{nome}:")
+        for estagio, antes in a['cenarios'][nome]['estagios'].items():
+            depois = b['cenarios'][nome]['estagios'].get(estagio)
+            if depois is None:
+                continue
+            variacao = (depois - antes) / antes * 100 if antes else 0
+            print(f"  {estagio:<10} {antes:>9.2f}s → {depois:>9.2f}s  ({variacao:+.1f}%)")
+
+    for n, antes in a.get('memoria', {}).items():
+        depois = b.get('memoria', {}).get(n)
+        if depois:
+            print(f"\n🧠 {n} segmentos: RSS {antes['pico_rss_mb']:.0f} → {depois['pico_rss_mb']:.0f} MB, "
+                  f"processos {antes['processos_filhos_pico']} → {depois['processos_filhos_pico']}")
+
+    for tipo, antes in a.get('caminhos', {}).items():
+        depois = b.get('caminhos', {}).get(tipo)
+        if depois:
+            print(f"\n✂️ {tipo}: cortes {antes['cortes']['segundos']:.1f}s → {depois['cortes']['segundos']:.1f}s, "
+                  f"compositor {antes['compositor']['segundos']:.1f}s → {depois['compositor']['segundos']:.1f}s")
+
+
+def falhas_encontradas(falhas):
+    """Código de saída da verificação"""
+    if falhas:
+        print(f"\n❌ {len(falhas)} verificação(ões) falharam:")
+        for falha in falhas:
+            print(f"   - {falha}")
+        return 1
+    print("\n✅ Todas as verificações passaram")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark offline do pipeline de vídeo')
+    parser.add_argument('--cenarios', nargs='+', choices=list(CENARIOS), default=list(CENARIOS))
+    parser.add_argument('--repeticoes', type=int, default=1)
+    parser.add_argument('--duracao-short', type=float, default=CENARIOS['short']['duracao'],
+                        help='duração do cenário short em segundos (padrão 40)')
+    parser.add_argument('--duracao-long', type=float, default=CENARIOS['long']['duracao'],
+                        help='duração do cenário long em segundos (padrão 600)')
+    parser.add_argument('--midias', type=int, default=6, help='arquivos sintéticos por orientação')
+    parser.add_argument('--duracao-clip', type=float, default=8, help='duração dos clipes sintéticos (padrão 8)')
+    parser.add_argument('--latencia-ms', type=float, default=0, help='latência simulada de Pexels/Gemini')
+    parser.add_argument('--saida', help='arquivo JSON de resultado (padrão bench_results/<data>_<commit>.json)')
+    parser.add_argument('--memoria', nargs='*', type=int, metavar='N',
+                        help='mede pico de memória/processos no render com N segmentos (padrão 10 30 60)')
+    parser.add_argument('--duracao-segmento', type=float, default=0.5,
+                        help='duração de cada segmento no teste de memória')
+    parser.add_argument('--caminhos', type=int, nargs='?', const=20, metavar='N',
+                        help='compara compositor e render por cortes com N segmentos (padrão 20)')
+    parser.add_argument('--upload-streaming', action='store_true',
+                        help='envia o vídeo ao YouTube falso enquanto renderiza (MP4 fragmentado)')
+    parser.add_argument('--banda-upload-mbps', type=float,
+                        help='limita o upload do YouTube falso a N Mbit/s (padrão sem limite)')
+    parser.add_argument('--catalogo', action='store_true',
+                        help='colhe o catálogo offline de todos os temas antes dos cenários')
+    parser.add_argument('--verificar', action='store_true',
+                        help='só confere download parcial, upload em streaming e thumbnail; sai com erro se falharem')
+    parser.add_argument('--comparar', nargs=2, metavar=('ANTES', 'DEPOIS'))
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+
+    CENARIOS['short']['duracao'] = args.duracao_short
+    CENARIOS['long']['duracao'] = args.duracao_long
+    random.seed(42)
+    commit = commit_atual()
+    pasta_trabalho = tempfile.mkdtemp(prefix='benchmark_')
+    diretorio_original = os.getcwd()
+    if args.verificar:
+        # Pedaços de 1 MB para um short de 10s subir em vários enquanto renderiza
+        os.environ['UPLOAD_CHUNK_MB'] = '1'
+
+    try:
+        print("🎨 Gerando mídias sintéticas...")
+        pasta_midias = os.path.join(pasta_trabalho, '_midias')
+        # A verificação só precisa de mídias para um short de 10s
+        quantidade = min(args.midias, 2) if args.verificar else args.midias
+        arquivos = gerar_midias(pasta_midias, quantidade, duracao_clip=args.duracao_clip)
+
+        banda = args.banda_upload_mbps * 1e6 / 8 if args.banda_upload_mbps else None
+        servidor = ServidorFalso(pasta_midias, arquivos, args.latencia_ms / 1000, banda)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+        g = preparar_ambiente(servidor, pasta_trabalho)
+        g.edge_tts.Communicate = ComunicadorTom
+        cronometros = {
+            'busca': Cronometro(g.buscar_candidatos_pexels),
+            'download': Cronometro(g.baixar_midia),
+        }
+        g.buscar_candidatos_pexels = cronometros['busca']
+        g.baixar_midia = cronometros['download']
+
+        if args.catalogo:
+            # Fora do tempo medido, como o passo de colheita no workflow
+            temas = g.config['temas']
+            g.catalogo.colher(temas, 'benchmark', max_buscas=len(temas) * 4)
+
+        if args.verificar:
+            falhas = verificar_download_parcial(servidor, pasta_midias, os.path.join(pasta_trabalho, '_parcial'))
+            falhas += verificar_uploads(g, servidor, cronometros)
+            servidor.shutdown()
+            return falhas_encontradas(falhas)
+
+        resultado = {
+            'commit': commit,
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+            'cenarios': {},
+        }
+
+        if args.memoria is not None:
+            resultado['memoria'] = medir_memoria(g, servidor, arquivos, args.memoria or [10, 30, 60],
+                                                 args.duracao_segmento)
+            args.cenarios = []
+
+        if args.caminhos:
+            resultado['caminhos'] = comparar_caminhos(g, servidor, arquivos, args.caminhos, args.duracao_segmento)
+            args.cenarios = []
+
+        for nome in args.cenarios:
+            print(f"\n⏱️ Cenário {nome}...")
+            execucoes = [executar_cenario(g, nome, CENARIOS[nome], cronometros, servidor, args.upload_streaming)
+                         for _ in range(args.repeticoes)]
+            resultado['cenarios'][nome] = mediana_das_execucoes(execucoes)
+
+        resultado['servidor'] = servidor.contadores
+        servidor.shutdown()
+    finally:
+        os.chdir(diretorio_original)
+        shutil.rmtree(pasta_trabalho, ignore_errors=True)
+
+    saida = args.saida or os.path.join(
+        RESULTADOS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{commit}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    imprimir_resultado(resultado)
+    print(f"\n💾 Resultado salvo em {saida}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
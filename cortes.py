@@ -0,0 +1,210 @@
+import os
+import shutil
+import tempfile
+import subprocess
+
+# MP4 que pode ser lido (e enviado) enquanto é escrito: moov vazio no início e um fragmento por keyframe
+MOVFLAGS_FRAGMENTADO = '+frag_keyframe+empty_moov+default_base_moof'
+PRESET = 'medium'
+# Entra na chave do cache de partes: mudar a forma de codificar precisa invalidar o que já foi guardado
+VERSAO_PARTES = 1
+
+
+class RenderPorCortes:
+    """Render direto no ffmpeg para linhas do tempo que são só cortes secos.
+
+    Quando nenhum segmento se sobrepõe a outro, cada quadro do vídeo vem de uma
+    única fonte e o compositor quadro a quadro do moviepy é desnecessário. Cada
+    segmento vira uma parte codificada separadamente (foto em loop com zoom via
+    zoompan, vídeo recortado e completado com preto se for curto, preto nas
+    lacunas), com as fronteiras arredondadas para quadros inteiros. As partes
+    são juntadas pelo demuxer concat sem recodificar e o áudio entra no final.
+    O enquadramento é o mesmo dos _abrir_* do generate_video: fotos de short
+    ajustadas pela altura e presas no canto superior esquerdo, o resto cobrindo
+    o quadro pelo centro, e o zoom crescendo a partir do canto superior esquerdo.
+    Legendas entram em cada parte pelo filtro overlay, com os sprites PNG de
+    Legendas.exportar() ligados só nos quadros de cada fala.
+    Com fragmentado=True as partes saem como H.264 puro (sem B-frames, para o
+    tempo de cada quadro sair da contagem) e vão direto para um ffmpeg que junta
+    o áudio e escreve MP4 fragmentado: o arquivo final cresce enquanto as partes
+    seguintes ainda são codificadas.
+    Com um CacheSegmentos, cada parte é procurada pelo hash de (conteúdo da
+    mídia, transformação, quadros, legendas, perfil de saída) antes de ser
+    codificada; refazer um vídeo com uma mídia trocada só codifica as partes
+    que mudaram, e a junção continua sendo cópia de stream.
+    """
+
+    def __init__(self, tamanho, fps, bitrate, zoom, cobrir_fotos=True, cache=None):
+        self.tamanho = tamanho
+        self.fps = fps
+        self.bitrate = bitrate
+        self.zoom = zoom
+        self.cobrir_fotos = cobrir_fotos
+        self.cache = cache
+        self.partes = 0
+        self.reaproveitadas = 0
+
+    def aceita(self, segmentos):
+        """True se os segmentos ({inicio, duracao, caminho, tipo, zoom}) não se sobrepõem"""
+        fim = 0
+        for seg in sorted(segmentos, key=lambda s: s['inicio']):
+            # Sobreposição de até um quadro é arredondamento da sincronização, não camada
+            if seg['inicio'] < fim - 1 / self.fps:
+                return False
+            fim = seg['inicio'] + seg['duracao']
+        return True
+
+    def renderizar(self, segmentos, duracao, audio_path, output_file, pasta, legendas=None, fragmentado=False):
+        pasta_partes = tempfile.mkdtemp(prefix='cortes_', dir=pasta)
+        try:
+            falas = []
+            if legendas:
+                sprites = legendas.exportar(pasta_partes)
+                falas = [(round(inicio * self.fps), round(fim * self.fps), *sprites[texto])
+                         for inicio, fim, texto in legendas.falas]
+
+            if fragmentado:
+                self._renderizar_fragmentado(segmentos, duracao, audio_path, output_file, pasta_partes, falas)
+                return output_file
+
+            partes = []
+            self.reaproveitadas = 0
+            for i, (seg, inicio, quadros, sobreposicoes) in enumerate(self._partes_com_falas(segmentos, duracao, falas)):
+                parte = os.path.join(pasta_partes, f'{i:04d}.mp4')
+                self._parte(seg, quadros, parte, sobreposicoes)
+                partes.append(parte)
+            self.partes = len(partes)
+
+            lista = os.path.join(pasta_partes, 'partes.txt')
+            with open(lista, 'w', encoding='utf-8') as f:
+                f.writelines(f"file '{os.path.abspath(parte)}'\n" for parte in partes)
+
+            _ffmpeg('-f', 'concat', '-safe', '0', '-i', lista, '-i', audio_path,
+                    '-map', '0:v', '-map', '1:a', '-c:v', 'copy', '-c:a', 'aac',
+                    '-movflags', '+faststart', output_file)
+        finally:
+            shutil.rmtree(pasta_partes, ignore_errors=True)
+
+        return output_file
+
+    def _renderizar_fragmentado(self, segmentos, duracao, audio_path, output_file, pasta_partes, falas):
+        import imageio_ffmpeg
+
+        # O demuxer concat lê a lista inteira na abertura; H.264 Annex B concatenado byte a byte não precisa
+        juntar = subprocess.Popen([
+            imageio_ffmpeg.get_ffmpeg_exe(), '-y', '-loglevel', 'error', '-fflags', '+genpts',
+            '-f', 'h264', '-framerate', str(self.fps), '-i', 'pipe:0',
+            '-i', audio_path, '-map', '0:v', '-map', '1:a', '-c:v', 'copy', '-c:a', 'aac',
+            '-movflags', MOVFLAGS_FRAGMENTADO, '-f', 'mp4', output_file
+        ], stdin=subprocess.PIPE)
+        self.partes = 0
+        self.reaproveitadas = 0
+        try:
+            for seg, inicio, quadros, sobreposicoes in self._partes_com_falas(segmentos, duracao, falas):
+                parte = os.path.join(pasta_partes, f'{self.partes:04d}.h264')
+                self._parte(seg, quadros, parte, sobreposicoes, ['-bf', '0', '-f', 'h264'])
+                with open(parte, 'rb') as f:
+                    shutil.copyfileobj(f, juntar.stdin)
+                os.remove(parte)
+                self.partes += 1
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                juntar.stdin.close()
+            except BrokenPipeError:
+                pass
+            codigo = juntar.wait()
+        if codigo:
+            raise subprocess.CalledProcessError(codigo, 'ffmpeg (juntar partes)')
+
+    def _partes_com_falas(self, segmentos, duracao, falas):
+        for seg, inicio, quadros in self._partes(segmentos, duracao):
+            # Falas que aparecem nesta parte, em quadros relativos ao início dela
+            sobreposicoes = [(max(0, a - inicio), min(quadros, b - inicio), x, y, caminho)
+                             for a, b, x, y, caminho in falas if a < inicio + quadros and b > inicio]
+            yield seg, inicio, quadros, sobreposicoes
+
+    def _partes(self, segmentos, duracao):
+        """(segmento ou None para preto, quadro inicial, número de quadros), cobrindo o vídeo inteiro sem buracos"""
+        total = round(duracao * self.fps)
+        cursor = 0
+
+        for seg in sorted(segmentos, key=lambda s: s['inicio']):
+            inicio = max(round(seg['inicio'] * self.fps), cursor)
+            fim = min(round((seg['inicio'] + seg['duracao']) * self.fps), total)
+            if inicio > cursor:
+                yield None, cursor, inicio - cursor
+            if fim > inicio:
+                yield seg, inicio, fim - inicio
+                cursor = fim
+            else:
+                cursor = max(cursor, inicio)
+
+        if cursor < total:
+            yield None, cursor, total - cursor
+
+    def _parte(self, seg, quadros, destino, sobreposicoes=(), saida=()):
+        """Codifica uma parte em `destino`, ou a tira do cache se já foi codificada igual"""
+        if self.cache is None:
+            self._codificar(seg, quadros, destino, sobreposicoes, saida)
+            return
+
+        chave = self._chave(seg, quadros, sobreposicoes, saida)
+        if self.cache.obter(chave, destino):
+            self.reaproveitadas += 1
+            return
+        self._codificar(seg, quadros, destino, sobreposicoes, saida)
+        self.cache.guardar(chave, destino)
+
+    def _chave(self, seg, quadros, sobreposicoes, saida):
+        """Tudo o que muda os bytes da parte: mídia, transformação, duração, legendas e perfil de saída"""
+        if seg is None:
+            midia = transformacao = None
+        else:
+            midia = self.cache.digest(seg['caminho'])
+            # A duração do segmento dá a velocidade do zoom, que pode diferir da quantidade de quadros da parte
+            transformacao = [seg['tipo'], bool(seg.get('zoom')), seg['duracao'] if seg.get('zoom') else None]
+        legendas = [(a, b, x, y, self.cache.digest(caminho)) for a, b, x, y, caminho in sobreposicoes]
+        perfil = [VERSAO_PARTES, self.tamanho, self.fps, self.bitrate, PRESET, self.zoom, self.cobrir_fotos, list(saida)]
+        return self.cache.chave(midia, transformacao, quadros, legendas, perfil)
+
+    def _codificar(self, seg, quadros, destino, sobreposicoes=(), saida=()):
+        largura, altura = self.tamanho
+        cobrir = f'scale={largura}:{altura}:force_original_aspect_ratio=increase,crop={largura}:{altura}'
+
+        if seg is None:
+            entrada = ['-f', 'lavfi', '-i', f'color=c=black:s={largura}x{altura}:r={self.fps}']
+            filtros = []
+        elif seg['tipo'] == 'video':
+            entrada = ['-i', seg['caminho']]
+            # Clipe mais curto que o segmento termina em preto, como na linha do tempo
+            filtros = [cobrir, f'fps={self.fps}', 'tpad=stop=-1:stop_mode=add:color=black']
+        else:
+            entrada = ['-loop', '1', '-framerate', str(self.fps), '-i', seg['caminho']]
+            if self.cobrir_fotos:
+                filtros = [cobrir]
+            else:
+                filtros = [f'scale=-2:{altura}', f"crop=w='min(iw,{largura})':h={altura}",
+                           f'pad={largura}:{altura}:0:0:black']
+            if seg.get('zoom'):
+                quadros_clip = max(1.0, seg['duracao'] * self.fps)
+                filtros.append(f"zoompan=z='1+{self.zoom}*on/{quadros_clip:.3f}':x=0:y=0:d=1"
+                               f":s={largura}x{altura}:fps={self.fps}")
+
+        filtros.append('setsar=1')
+        grafo = f"[0:v]{','.join(filtros)}[v0]"
+        for i, (a, b, x, y, caminho) in enumerate(sobreposicoes, start=1):
+            entrada += ['-loop', '1', '-i', caminho]
+            grafo += f";[v{i - 1}][{i}:v]overlay={x}:{y}:enable='between(n,{a},{b - 1})'[v{i}]"
+        grafo += f";[v{len(sobreposicoes)}]format=yuv420p[saida]"
+
+        _ffmpeg(*entrada, '-filter_complex', grafo, '-map', '[saida]', '-frames:v', str(quadros), '-an',
+                '-c:v', 'libx264', '-preset', PRESET, '-b:v', self.bitrate, '-r', str(self.fps), *saida, destino)
+
+
+def _ffmpeg(*argumentos):
+    import imageio_ffmpeg
+
+    subprocess.run([imageio_ffmpeg.get_ffmpeg_exe(), '-y', '-loglevel', 'error', *argumentos],
+                   check=True, stdin=subprocess.DEVNULL)
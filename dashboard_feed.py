@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+from datetime import datetime, timedelta
+from run_log import RunLog
+
+DASHBOARD_DIR = 'dashboard'
+TAMANHO_PAGINA = 10
+DIAS_RESUMO = 7
+
+
+def _caminho(nome):
+    return os.path.join(DASHBOARD_DIR, nome)
+
+
+def _ler_json(nome, padrao=None):
+    try:
+        with open(_caminho(nome), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return padrao
+
+
+def _gravar_json(nome, dados):
+    os.makedirs(DASHBOARD_DIR, exist_ok=True)
+    temporario = _caminho(nome + '.tmp')
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temporario, _caminho(nome))
+
+
+def _item_compacto(entrada):
+    """Só os campos que o painel exibe"""
+    return {
+        'data': entrada.get('data'),
+        'tipo': entrada.get('tipo'),
+        'titulo': entrada.get('titulo'),
+        'duracao': round(entrada.get('duracao', 0), 1),
+        'url': entrada.get('url')
+    }
+
+
+def _somar(agregados, entrada):
+    dia = entrada.get('data', '')[:10]
+    tipo = entrada.get('tipo', '')
+    item = agregados['dias'].setdefault(dia, {}).setdefault(tipo, {'quantidade': 0, 'duracao': 0})
+    item['quantidade'] += 1
+    item['duracao'] = round(item['duracao'] + entrada.get('duracao', 0), 2)
+
+
+def _montar_resumo(agregados, total, ultimo):
+    """Resumo pequeno: totais, por tipo, últimos dias e quantidade de páginas"""
+    por_tipo = {}
+    duracao_total = 0
+    for tipos in agregados['dias'].values():
+        for tipo, item in tipos.items():
+            acumulado = por_tipo.setdefault(tipo, {'quantidade': 0, 'duracao': 0})
+            acumulado['quantidade'] += item['quantidade']
+            acumulado['duracao'] = round(acumulado['duracao'] + item['duracao'], 2)
+            duracao_total += item['duracao']
+
+    limite = (datetime.now() - timedelta(days=DIAS_RESUMO - 1)).strftime('%Y-%m-%d')
+    ultimos_dias = {dia: tipos for dia, tipos in agregados['dias'].items() if dia >= limite}
+
+    return {
+        'atualizado_em': datetime.now().isoformat(timespec='seconds'),
+        'total': total,
+        'duracao_total': round(duracao_total, 2),
+        'por_tipo': por_tipo,
+        'ultimos_dias': ultimos_dias,
+        'ultimo': _item_compacto(ultimo) if ultimo else None,
+        'tamanho_pagina': TAMANHO_PAGINA,
+        'paginas': (total + TAMANHO_PAGINA - 1) // TAMANHO_PAGINA
+    }
+
+
+def gerar_feed(run_log=None):
+    """Reconstrói todos os artefatos do painel a partir do log"""
+    run_log = run_log or RunLog()
+
+    agregados = {'dias': {}}
+    pagina = []
+    numero = 0
+    total = 0
+    ultimo = None
+
+    # Páginas em blocos cronológicos fixos: só a última muda a cada publicação
+    for entrada in run_log.todos():
+        _somar(agregados, entrada)
+        pagina.append(_item_compacto(entrada))
+        total += 1
+        ultimo = entrada
+        if len(pagina) == TAMANHO_PAGINA:
+            numero += 1
+            _gravar_json(f'pagina_{numero}.json', pagina)
+            pagina = []
+
+    if pagina:
+        numero += 1
+        _gravar_json(f'pagina_{numero}.json', pagina)
+
+    _gravar_json('agregados.json', agregados)
+    _gravar_json('resumo.json', _montar_resumo(agregados, total, ultimo))
+
+    print(f"📊 Painel gerado: {total} vídeos em {numero} páginas")
+
+
+def atualizar_feed(entrada, run_log=None):
+    """Atualiza os artefatos com uma nova entrada, reescrevendo só a última página"""
+    run_log = run_log or RunLog()
+
+    resumo = _ler_json('resumo.json')
+    agregados = _ler_json('agregados.json')
+
+    if not resumo or not agregados or resumo['total'] != run_log.total() - 1:
+        gerar_feed(run_log)
+        return
+
+    total = resumo['total']
+    numero = total // TAMANHO_PAGINA + 1
+    pagina = _ler_json(f'pagina_{numero}.json', []) if total % TAMANHO_PAGINA else []
+    pagina.append(_item_compacto(entrada))
+    _gravar_json(f'pagina_{numero}.json', pagina)
+
+    _somar(agregados, entrada)
+    _gravar_json('agregados.json', agregados)
+    _gravar_json('resumo.json', _montar_resumo(agregados, total + 1, entrada))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] != 'gerar':
+        print("Uso: python dashboard_feed.py [gerar]")
+        sys.exit(1)
+    gerar_feed()
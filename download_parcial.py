@@ -0,0 +1,373 @@
+import os
+import sys
+import struct
+import argparse
+import subprocess
+
+import numpy as np
+import requests
+
+# Blocos grandes: com 8 KB o laço do Python, não a rede, limita a vazão
+BLOCO = 1 << 20
+# Primeira requisição: cobre ftyp e, em arquivos faststart, quase sempre o moov inteiro
+CABECALHO = 1 << 16
+# Segundos além do segmento, para arredondamento do render
+MARGEM = 1.0
+# Baixado além do corte (e antes dele, no áudio): B-frames e priming do AAC deslocam pts de dts, e o ffmpeg corta por pts
+FOLGA = 0.5
+# Acima disso o ganho não compensa o remux: baixa o arquivo inteiro
+PROPORCAO_MAXIMA = 0.8
+
+
+class LayoutNaoSuportado(Exception):
+    """O contêiner não permite baixar só o começo (não é MP4, é fragmentado, moov ausente...)"""
+
+
+def _caixas(dados, inicio=0, fim=None):
+    """(tipo, início do conteúdo, fim) de cada caixa MP4 em dados[inicio:fim]"""
+    fim = len(dados) if fim is None else fim
+    while inicio + 8 <= fim:
+        tipo, cabecalho, tamanho = _cabecalho(dados[inicio:inicio + 16])
+        tamanho = tamanho or fim - inicio
+        if tamanho < cabecalho:
+            raise LayoutNaoSuportado(f'caixa {tipo!r} com tamanho {tamanho}')
+        yield tipo, inicio + cabecalho, inicio + tamanho
+        inicio += tamanho
+
+
+def _cabecalho(dados):
+    """(tipo, tamanho do cabeçalho, tamanho total ou 0 se vai até o fim) da caixa no início de dados"""
+    tamanho, tipo = struct.unpack('>I4s', dados[:8])
+    if tamanho == 1:
+        return tipo.decode('latin-1'), 16, struct.unpack('>Q', dados[8:16])[0]
+    if 0 < tamanho < 8:
+        raise LayoutNaoSuportado(f'caixa {tipo!r} com tamanho {tamanho}')
+    return tipo.decode('latin-1'), 8, tamanho
+
+
+def _filha(dados, inicio, fim, *caminho):
+    """Limites do conteúdo da caixa em `caminho` (ex.: 'mdia', 'minf', 'stbl'), ou None"""
+    for nome in caminho:
+        for tipo, a, b in _caixas(dados, inicio, fim):
+            if tipo == nome:
+                inicio, fim = a, b
+                break
+        else:
+            return None
+    return inicio, fim
+
+
+def _tabela(dados, caixa, colunas, tipo='>u4', cabecalho=8):
+    """Entradas de uma caixa de tabela (versão/flags + contagem + entradas) como array (n, colunas)"""
+    a, _ = caixa
+    quantidade = struct.unpack('>I', dados[a + cabecalho - 4:a + cabecalho])[0]
+    valores = np.frombuffer(dados, dtype=tipo, count=quantidade * colunas, offset=a + cabecalho)
+    return valores.reshape(quantidade, colunas).astype(np.int64)
+
+
+def trilhas(moov):
+    """Tabelas de amostras de cada trilha do moov, expandidas por amostra.
+
+    Para cada trilha: {'tipo' ('vide', 'soun'...), 'escala', 'tempos' (dts em
+    segundos), 'tamanhos', 'posicoes' (byte absoluto no arquivo), 'sincronas'
+    (bool por amostra; sem stss todas são)}. Vem de stts, stsz, stsc,
+    stco/co64 e stss.
+    """
+    if _filha(moov, 0, len(moov), 'mvex'):
+        raise LayoutNaoSuportado('MP4 fragmentado')
+
+    for tipo, a, b in _caixas(moov):
+        if tipo != 'trak':
+            continue
+        mdhd = _filha(moov, a, b, 'mdia', 'mdhd')
+        hdlr = _filha(moov, a, b, 'mdia', 'hdlr')
+        stbl = _filha(moov, a, b, 'mdia', 'minf', 'stbl')
+        if not mdhd or not hdlr or not stbl:
+            raise LayoutNaoSuportado('trilha sem mdhd/hdlr/stbl')
+
+        versao = moov[mdhd[0]]
+        escala = struct.unpack('>I', moov[mdhd[0] + (20 if versao == 1 else 12):][:4])[0]
+
+        caixas = {t: (x, y) for t, x, y in _caixas(moov, *stbl)}
+        if 'stts' not in caixas or 'stsz' not in caixas or 'stsc' not in caixas:
+            raise LayoutNaoSuportado('tabela de amostras incompleta')
+        if 'stco' in caixas:
+            chunks = _tabela(moov, caixas['stco'], 1)[:, 0]
+        elif 'co64' in caixas:
+            chunks = _tabela(moov, caixas['co64'], 1, '>u8')[:, 0]
+        else:
+            raise LayoutNaoSuportado('trilha sem stco/co64')
+
+        x, _ = caixas['stsz']
+        tamanho_fixo, quantidade = struct.unpack('>II', moov[x + 4:x + 12])
+        if tamanho_fixo:
+            tamanhos = np.full(quantidade, tamanho_fixo, dtype=np.int64)
+        else:
+            tamanhos = _tabela(moov, caixas['stsz'], 1, cabecalho=12)[:, 0]
+
+        stts = _tabela(moov, caixas['stts'], 2)
+        tempos = np.concatenate([[0], np.cumsum(np.repeat(stts[:, 1], stts[:, 0]))])[:quantidade]
+
+        # Amostras por chunk, expandindo as faixas do stsc; posição = início do chunk + amostras anteriores nele
+        stsc = _tabela(moov, caixas['stsc'], 3)
+        primeiros = np.append(stsc[:, 0], len(chunks) + 1)
+        por_chunk = np.repeat(stsc[:, 1], np.diff(primeiros))[:len(chunks)]
+        if por_chunk.sum() < quantidade or len(tempos) < quantidade:
+            raise LayoutNaoSuportado('tabelas não cobrem as amostras')
+        chunk = np.repeat(np.arange(len(chunks)), por_chunk)[:quantidade]
+        anteriores = np.cumsum(tamanhos) - tamanhos
+        primeira_do_chunk = (np.cumsum(por_chunk) - por_chunk)[chunk]
+        posicoes = chunks[chunk] + anteriores - anteriores[primeira_do_chunk]
+
+        sincronas = np.ones(quantidade, dtype=bool)
+        if 'stss' in caixas:
+            sincronas[:] = False
+            sincronas[_tabela(moov, caixas['stss'], 1)[:, 0] - 1] = True
+
+        yield {'tipo': moov[hdlr[0] + 8:hdlr[0] + 12].decode('latin-1'), 'escala': escala,
+               'tempos': tempos / escala, 'tamanhos': tamanhos, 'posicoes': posicoes, 'sincronas': sincronas}
+
+
+def faixa_dos_segundos(moov, inicio, fim, folga=0.0):
+    """Bytes [a, b) do arquivo com as amostras de todas as trilhas entre `inicio` e `fim` segundos.
+
+    O vídeo começa na última amostra síncrona (keyframe) até `inicio`, para o
+    trecho poder ser decodificado sem nada antes dele; as outras trilhas,
+    `folga` segundos antes, porque o seek do ffmpeg as posiciona pelo pts.
+    """
+    a, b = None, 0
+    for trilha in trilhas(moov):
+        tempos = trilha['tempos']
+        if not len(tempos):
+            continue
+        limite = inicio if trilha['tipo'] == 'vide' else inicio - folga
+        sincronas = np.flatnonzero(trilha['sincronas'] & (tempos <= limite + 1e-6))
+        primeira = int(sincronas[-1]) if len(sincronas) else 0
+        ultima = max(primeira + 1, int(np.searchsorted(tempos, fim, 'left')))
+
+        posicoes = trilha['posicoes'][primeira:ultima]
+        a = min(a, int(posicoes.min())) if a is not None else int(posicoes.min())
+        b = max(b, int((posicoes + trilha['tamanhos'][primeira:ultima]).max()))
+
+    if a is None:
+        raise LayoutNaoSuportado('nenhuma trilha com amostras')
+    return a, b
+
+
+def caixas_de_topo(ler, total):
+    """{tipo: (início, início do conteúdo, fim)} das caixas de topo; `ler(posicao, n)` devolve bytes"""
+    topo = {}
+    posicao = 0
+    while posicao + 8 <= total:
+        tipo, conteudo, tamanho = _cabecalho(ler(posicao, min(16, total - posicao)))
+        if posicao == 0 and tipo != 'ftyp':
+            raise LayoutNaoSuportado(f'não é MP4 (começa com {tipo!r})')
+        if tipo == 'moof':
+            raise LayoutNaoSuportado('MP4 fragmentado')
+        # Tamanho 0: a caixa vai até o fim do arquivo
+        fim = total if tamanho == 0 else posicao + tamanho
+        topo.setdefault(tipo, (posicao, posicao + conteudo, fim))
+        posicao = fim
+
+    if 'moov' not in topo or 'mdat' not in topo:
+        raise LayoutNaoSuportado('sem moov ou mdat no topo')
+    return topo
+
+
+def ler_moov(caminho):
+    """Conteúdo do moov de um MP4 local"""
+    with open(caminho, 'rb') as f:
+        def ler(posicao, quantidade):
+            f.seek(posicao)
+            return f.read(quantidade)
+
+        _, dados, fim = caixas_de_topo(ler, os.path.getsize(caminho))['moov']
+        return ler(dados, fim - dados)
+
+
+class DownloadParcial:
+    """Baixa de uma URL só os bytes de que um trecho de `segundos` de um MP4 precisa.
+
+    Uma requisição Range pega o começo do arquivo; as caixas de topo dizem onde
+    ficam moov e mdat (buscando só os cabeçalhos que faltarem). Com o moov em
+    mãos, as tabelas de amostras dão os bytes do mdat entre o keyframe em que o
+    trecho começa (o início do arquivo, ou o que escolher_inicio devolver) e o
+    fim dele. As faixas baixadas (cabeçalhos, moov e esse pedaço do mdat) são
+    gravadas nas posições originais de um arquivo esparso, de modo que os
+    offsets do moov continuam valendo, e um remux sem recodificar (-ss -c copy
+    -t) produz o arquivo final, começando no keyframe, com a duração certa e
+    faststart.
+
+    Servidor sem suporte a Range, contêiner que não seja MP4 progressivo ou
+    trecho que seja quase o arquivo todo caem no download completo, reaproveitando
+    o que já veio.
+    """
+
+    def __init__(self, url, sessao=None, span=None, timeout=30):
+        self.url = url
+        self.sessao = sessao or requests
+        self.span = span
+        self.timeout = timeout
+        self.baixados = 0
+        # Se o arquivo gravado já é o trecho remuxado (e não o original inteiro)
+        self.recortado = False
+
+    def baixar(self, destino, segundos=None, escolher_inicio=None):
+        """Grava em `destino`; True se só um trecho foi baixado.
+
+        `escolher_inicio(moov)` pode devolver um keyframe (em segundos) onde o
+        trecho começa, em vez do começo do arquivo.
+        """
+        if segundos is None:
+            with self._get() as response:
+                response.raise_for_status()
+                self._gravar(response, destino)
+            return False
+
+        with self._get(0, CABECALHO - 1) as response:
+            response.raise_for_status()
+            total = self._total(response)
+            if response.status_code != 206 or total is None:
+                # Servidor ignorou o Range: o corpo já é o arquivo inteiro
+                self._gravar(response, destino)
+                return False
+            cabeca = self._ler(response)
+
+        try:
+            faixas, inicio = self._planejar(cabeca, total, segundos, escolher_inicio)
+        except (LayoutNaoSuportado, struct.error, ValueError) as e:
+            self._anotar(parcial=False, motivo=str(e)[:100])
+            self._completar(cabeca, total, destino)
+            return False
+
+        parcial = sum(b - a for a, b in faixas) <= PROPORCAO_MAXIMA * total
+        if not parcial:
+            # Quase tudo: uma requisição só, mas ainda com remux para começar no keyframe escolhido
+            faixas = [(0, total)]
+
+        temporario = destino + '.parcial'
+        try:
+            with open(temporario, 'wb') as f:
+                # Arquivo esparso do tamanho original: o que não foi baixado não ocupa disco
+                f.truncate(total)
+                f.write(cabeca)
+                for a, b in faixas:
+                    a = max(a, len(cabeca))
+                    if a < b:
+                        f.seek(a)
+                        with self._get(a, b - 1) as response:
+                            if response.status_code != 206:
+                                raise LayoutNaoSuportado(f'HTTP {response.status_code} para faixa')
+                            self._copiar(response, f)
+            recortar(temporario, destino, inicio, segundos + MARGEM)
+            self.recortado = True
+        except (LayoutNaoSuportado, subprocess.CalledProcessError) as e:
+            self._anotar(parcial=False, motivo=str(e)[:100])
+            self._completar(cabeca, total, destino)
+            return False
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+
+        self._anotar(parcial=parcial, tamanho_total=total, inicio_clip=round(inicio, 3))
+        return parcial
+
+    def _planejar(self, cabeca, total, segundos, escolher_inicio=None):
+        """Faixas [a, b) do arquivo original necessárias para o trecho, e o segundo em que ele começa"""
+        def ler(posicao, quantidade):
+            if posicao + quantidade <= len(cabeca):
+                return cabeca[posicao:posicao + quantidade]
+            return self._faixa(posicao, posicao + quantidade - 1)
+
+        topo = caixas_de_topo(ler, total)
+        comeco, dados, fim = topo['moov']
+        moov = ler(dados, fim - dados)
+        inicio = escolher_inicio(moov) if escolher_inicio else 0.0
+        a, b = faixa_dos_segundos(moov, inicio, inicio + segundos + MARGEM + FOLGA, FOLGA)
+
+        # Começo do arquivo (ftyp, moov se faststart, cabeçalho do mdat), o trecho e o moov se estiver no fim
+        faixas = [(0, topo['mdat'][1]), (a, min(b, total))]
+        if comeco >= topo['mdat'][1]:
+            faixas.append((comeco, fim))
+        return faixas, inicio
+
+    def _completar(self, inicio, total, destino):
+        """Download completo aproveitando os bytes do começo que já vieram"""
+        with open(destino, 'wb') as f:
+            f.write(inicio)
+            if len(inicio) >= total:
+                return
+            with self._get(len(inicio), total - 1) as response:
+                if response.status_code == 206:
+                    self._copiar(response, f)
+                    return
+
+        with self._get() as response:
+            response.raise_for_status()
+            self._gravar(response, destino)
+
+    def _faixa(self, a, b):
+        with self._get(a, b) as response:
+            if response.status_code != 206:
+                raise LayoutNaoSuportado(f'HTTP {response.status_code} para faixa')
+            return self._ler(response)
+
+    def _get(self, a=None, b=None):
+        headers = {'Range': f'bytes={a}-{b}'} if a is not None else {}
+        return self.sessao.get(self.url, headers=headers, stream=True, timeout=self.timeout)
+
+    def _total(self, response):
+        intervalo = response.headers.get('Content-Range', '')
+        total = intervalo.rpartition('/')[2]
+        return int(total) if total.isdigit() else None
+
+    def _ler(self, response):
+        dados = response.content
+        self._contar(len(dados))
+        return dados
+
+    def _copiar(self, response, arquivo):
+        for bloco in response.iter_content(chunk_size=BLOCO):
+            arquivo.write(bloco)
+            self._contar(len(bloco))
+
+    def _gravar(self, response, destino):
+        with open(destino, 'wb') as f:
+            self._copiar(response, f)
+
+    def _contar(self, quantidade):
+        self.baixados += quantidade
+        if self.span:
+            self.span.somar('bytes', quantidade)
+
+    def _anotar(self, **campos):
+        if self.span:
+            self.span.anotar(**campos)
+
+
+def recortar(origem, destino, inicio, segundos):
+    """Remux sem recodificar de `segundos` a partir de `inicio` (um keyframe), com faststart"""
+    import imageio_ffmpeg
+
+    # O seek vai para o keyframe <= alvo: um pouco depois dele, para o arredondamento não cair no anterior
+    alvo = inicio + 0.01 if inicio else 0
+    subprocess.run([imageio_ffmpeg.get_ffmpeg_exe(), '-y', '-loglevel', 'error', '-ss', f'{alvo:.3f}',
+                    '-i', origem, '-map', '0', '-c', 'copy', '-t', f'{segundos:.3f}', '-movflags', '+faststart',
+                    '-f', 'mp4', destino], check=True, stdin=subprocess.DEVNULL, capture_output=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Baixa só um trecho de um MP4 remoto')
+    parser.add_argument('url')
+    parser.add_argument('destino')
+    parser.add_argument('--segundos', type=float, help='sem isso, baixa o arquivo inteiro')
+    parser.add_argument('--inicio', type=float, default=0, help='keyframe onde o trecho começa')
+    args = parser.parse_args(argv)
+
+    download = DownloadParcial(args.url)
+    parcial = download.baixar(args.destino, args.segundos, lambda moov: args.inicio)
+    print(f"📥 {args.destino}: {download.baixados / 2**20:.1f} MB baixados ({'trecho' if parcial else 'completo'})")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,236 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+
+import requests
+from PIL import Image, ImageOps
+
+from quota import cotas
+
+POOL_DIR = os.environ.get('FALLBACK_DIR', os.path.join('.cache', 'fallback'))
+PEXELS_API_URL = os.environ.get('PEXELS_API_URL', 'https://api.pexels.com')
+FOTOS_POR_ORIENTACAO = int(os.environ.get('FALLBACK_FOTOS', '12'))
+VIDEOS_POR_ORIENTACAO = int(os.environ.get('FALLBACK_VIDEOS', '6'))
+# Itens mais velhos que isso são trocados aos poucos, no máximo ROTACAO_POR_ATUALIZACAO por vez
+ROTACAO_DIAS = int(os.environ.get('FALLBACK_ROTACAO_DIAS', '14'))
+ROTACAO_POR_ATUALIZACAO = 3
+DURACAO_CLIP = 10
+
+FORMATOS = {'portrait': (1080, 1920), 'landscape': (1920, 1080)}
+BUSCAS = ['nature landscape', 'sky clouds', 'ocean waves', 'forest', 'mountains',
+          'abstract light', 'city night', 'stars night sky']
+
+
+class PoolFallback:
+    """Pool local de fotos e clipes já no tamanho final, para preencher lacunas sem rede.
+
+    O manifesto guarda, por orientação, cada arquivo com o ID no Pexels, quando
+    entrou e quando foi usado pela última vez. escolher() devolve os menos usados
+    recentemente; atualizar() roda fora do render (antes da geração, no workflow)
+    e faz a rotação: troca os itens velhos e completa até a capacidade.
+    """
+
+    def __init__(self, diretorio=POOL_DIR):
+        self.diretorio = diretorio
+        self.manifesto_file = os.path.join(diretorio, 'pool.json')
+        self.itens = {orientacao: [] for orientacao in FORMATOS}
+        self.usados_nesta_execucao = set()
+
+        if os.path.exists(self.manifesto_file):
+            try:
+                with open(self.manifesto_file, 'r', encoding='utf-8') as f:
+                    self.itens.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Manifesto do pool de fallback inválido: {e}")
+
+        for orientacao in self.itens:
+            self.itens[orientacao] = [item for item in self.itens[orientacao]
+                                      if os.path.exists(self._caminho(item))]
+
+    def total(self, orientacao, tipo=None):
+        return sum(1 for item in self.itens.get(orientacao, []) if tipo is None or item['tipo'] == tipo)
+
+    def escolher(self, orientacao, quantidade=1, tipos=('video', 'foto')):
+        """Retorna até `quantidade` mídias locais [(caminho, tipo)], as menos usadas recentemente primeiro"""
+        candidatos = [item for item in self.itens.get(orientacao, []) if item['tipo'] in tipos]
+        # Embaralha antes de ordenar para variar entre itens nunca usados
+        random.shuffle(candidatos)
+        candidatos.sort(key=lambda item: (item['arquivo'] in self.usados_nesta_execucao, item.get('ultimo_uso', 0)))
+
+        escolhidos = candidatos[:quantidade]
+        agora = int(time.time())
+        for item in escolhidos:
+            item['ultimo_uso'] = agora
+            item['usos'] = item.get('usos', 0) + 1
+            self.usados_nesta_execucao.add(item['arquivo'])
+
+        return [(self._caminho(item), item['tipo']) for item in escolhidos]
+
+    def atualizar(self, api_key, orientacoes=FORMATOS):
+        """Rotaciona itens velhos e completa o pool até a capacidade (chamadas ao Pexels só se faltar algo).
+
+        Os itens velhos só saem depois que os substitutos foram baixados, então
+        uma atualização sem rede nunca esvazia o pool.
+        """
+        session = requests.Session()
+        session.headers['Authorization'] = api_key or ''
+        limite = time.time() - ROTACAO_DIAS * 86400
+
+        for orientacao in orientacoes:
+            for tipo, capacidade in (('foto', FOTOS_POR_ORIENTACAO), ('video', VIDEOS_POR_ORIENTACAO)):
+                velhos = sorted((item for item in self.itens[orientacao]
+                                 if item['tipo'] == tipo and item['adicionado'] < limite),
+                                key=lambda item: item['adicionado'])[:ROTACAO_POR_ATUALIZACAO]
+                faltam = capacidade - self.total(orientacao, tipo) + len(velhos)
+                if faltam > 0:
+                    print(f"📥 Pool {orientacao}/{tipo}: baixando {faltam}")
+                    self._completar(session, orientacao, tipo, faltam)
+
+                for item in velhos[:max(0, self.total(orientacao, tipo) - capacidade)]:
+                    self._remover(orientacao, item)
+
+                # Capacidade reduzida por variável de ambiente: descarta os mais usados
+                do_tipo = sorted((item for item in self.itens[orientacao] if item['tipo'] == tipo),
+                                 key=lambda item: -item.get('usos', 0))
+                for item in do_tipo[:max(0, len(do_tipo) - capacidade)]:
+                    self._remover(orientacao, item)
+
+        self.salvar()
+
+    def salvar(self):
+        os.makedirs(self.diretorio, exist_ok=True)
+        temporario = self.manifesto_file + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(self.itens, f, separators=(',', ':'))
+        os.replace(temporario, self.manifesto_file)
+
+    def _caminho(self, item):
+        return os.path.join(self.diretorio, item['arquivo'])
+
+    def _remover(self, orientacao, item):
+        self.itens[orientacao].remove(item)
+        try:
+            os.remove(self._caminho(item))
+        except OSError:
+            pass
+
+    def _completar(self, session, orientacao, tipo, faltam):
+        existentes = {item['media_id'] for item in self.itens[orientacao]}
+        buscas = random.sample(BUSCAS, len(BUSCAS))
+
+        for busca in buscas:
+            if faltam <= 0:
+                return
+            for media_id, url in _buscar(session, busca, tipo, orientacao):
+                if faltam <= 0:
+                    return
+                if media_id in existentes:
+                    continue
+                item = self._baixar_normalizado(session, media_id, url, tipo, orientacao)
+                if item:
+                    self.itens[orientacao].append(item)
+                    existentes.add(media_id)
+                    faltam -= 1
+
+    def _baixar_normalizado(self, session, media_id, url, tipo, orientacao):
+        largura, altura = FORMATOS[orientacao]
+        pasta = os.path.join(self.diretorio, orientacao)
+        os.makedirs(pasta, exist_ok=True)
+        nome = media_id.replace(':', '_') + ('.mp4' if tipo == 'video' else '.jpg')
+        destino = os.path.join(pasta, nome)
+        bruto = destino + '.download'
+
+        try:
+            with session.get(url, stream=True, timeout=60) as response:
+                response.raise_for_status()
+                with open(bruto, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=1 << 16):
+                        f.write(chunk)
+
+            if tipo == 'video':
+                _normalizar_clip(bruto, destino, largura, altura)
+            else:
+                with Image.open(bruto) as imagem:
+                    ImageOps.fit(imagem.convert('RGB'), (largura, altura)).save(destino, quality=90)
+        except (requests.RequestException, OSError, subprocess.CalledProcessError) as e:
+            print(f"⚠️ Pool: falha em {media_id}: {e}")
+            return None
+        finally:
+            if os.path.exists(bruto):
+                os.remove(bruto)
+
+        return {'arquivo': os.path.join(orientacao, nome), 'tipo': tipo, 'media_id': media_id,
+                'adicionado': int(time.time()), 'ultimo_uso': 0, 'usos': 0}
+
+
+def _buscar(session, busca, tipo, orientacao):
+    """(media_id, url) dos resultados de uma busca no Pexels"""
+    if tipo == 'video':
+        url = f'{PEXELS_API_URL}/videos/search'
+        params = {'query': busca, 'per_page': 15, 'orientation': orientacao, 'size': 'medium'}
+    else:
+        url = f'{PEXELS_API_URL}/v1/search'
+        params = {'query': busca, 'per_page': 15, 'orientation': orientacao}
+
+    try:
+        response = session.get(url, params=params, timeout=15)
+        cotas.consumir('pexels')
+        response.raise_for_status()
+        dados = response.json()
+    except (requests.RequestException, ValueError) as e:
+        print(f"⚠️ Pool: busca '{busca}' falhou: {e}")
+        return []
+
+    if tipo == 'foto':
+        return [(f"foto:{foto['id']}", foto['src']['large2x']) for foto in dados.get('photos', [])]
+
+    resultados = []
+    for video in dados.get('videos', []):
+        # Menor arquivo que ainda cobre o quadro final, para baixar menos
+        arquivos = sorted((f for f in video.get('video_files', []) if f.get('width') and f.get('height')),
+                          key=lambda f: f['width'] * f['height'])
+        minimo = min(FORMATOS[orientacao])
+        adequados = [f for f in arquivos if min(f['width'], f['height']) >= minimo] or arquivos[-1:]
+        if adequados:
+            resultados.append((f"video:{video['id']}", adequados[0]['link']))
+    return resultados
+
+
+def _normalizar_clip(origem, destino, largura, altura):
+    """Recorta/escala para o quadro final, sem áudio e com no máximo DURACAO_CLIP segundos"""
+    import imageio_ffmpeg
+
+    subprocess.run([
+        imageio_ffmpeg.get_ffmpeg_exe(), '-y', '-loglevel', 'error', '-i', origem, '-t', str(DURACAO_CLIP),
+        '-vf', f'scale={largura}:{altura}:force_original_aspect_ratio=increase,crop={largura}:{altura},setsar=1',
+        '-an', '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '20', '-pix_fmt', 'yuv420p',
+        '-movflags', '+faststart', destino
+    ], check=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pool local de mídias de fallback')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('atualizar', help='Rotaciona itens velhos e completa o pool')
+    p.add_argument('--orientacao', choices=list(FORMATOS), action='append',
+                   help='padrão: as duas orientações')
+
+    sub.add_parser('status', help='Conteúdo do pool por orientação e tipo')
+
+    args = parser.parse_args(argv)
+    pool = PoolFallback()
+
+    if args.comando == 'atualizar':
+        pool.atualizar(os.environ.get('PEXELS_API_KEY'), args.orientacao or list(FORMATOS))
+
+    for orientacao in FORMATOS:
+        print(f"📦 {orientacao}: {pool.total(orientacao, 'foto')} fotos, {pool.total(orientacao, 'video')} vídeos")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
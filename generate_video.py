@@ -3,21 +3,49 @@ import json
 import random
 import re
 import asyncio
+import time
 import shutil
+import subprocess
+import threading
+import contextvars
+import uuid
+import sqlite3
+from contextlib import contextmanager
+from functools import partial
 from datetime import datetime
 import requests
 import feedparser
 import edge_tts
 from moviepy.editor import *
-from google import generativeai as genai
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 from PIL import Image
+from run_log import RunLog
+from llm_client import GeminiClient, ErroGemini
+from dashboard_feed import atualizar_feed
+from title_index import IndiceSimilaridade
+from media_index import IndiceMidiasUsadas, associar_url, id_midia
+from tracing import tracer, Tracer, MonitorRecursos, usar_tracer
+from timeline import LinhaDoTempo
+from cortes import RenderPorCortes, MOVFLAGS_FRAGMENTADO
+from download_parcial import DownloadParcial, LayoutNaoSuportado, ler_moov, recortar, MARGEM as MARGEM_TRECHO
+from analise_clipes import analises
+from legendas import Legendas, dividir_falas, carregar_fonte, FONTE_RELATIVA
+from fallback_pool import PoolFallback, DURACAO_CLIP as DURACAO_CLIP_FALLBACK
+from quota import cotas, CotaEsgotada, YOUTUBE_CUSTO_UPLOAD, YOUTUBE_CUSTO_THUMBNAIL
+from thumbnail import gerar_thumbnail
+from workspace import AreaTrabalho
+from media_planner import PlanejadorMidias, PAGINAS_POR_GRUPO
+from media_catalog import CatalogoMidias
+from media_preflight import VerificadorMidias
+from render_cache import CacheSegmentos
+from upload_streaming import ArquivoCrescendo, RenderInterrompido
 
 # Importar sistema de curadoria se existir
 try:
-    from telegram_curator import TelegramCurator
+    from telegram_curator import TelegramCurator, CURACAO_FILE, curadoria_exclusiva
     CURACAO_DISPONIVEL = True
 except ImportError:
     print("⚠️ telegram_curator.py não encontrado - modo curadoria desativado")
@@ -32,22 +60,126 @@ GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
 PEXELS_API_KEY = os.environ.get('PEXELS_API_KEY')
 YOUTUBE_CREDENTIALS = os.environ.get('YOUTUBE_CREDENTIALS')
 
+# Permitem apontar o pipeline para servidores locais (benchmarks e testes)
+PEXELS_API_URL = os.environ.get('PEXELS_API_URL', 'https://api.pexels.com')
+YOUTUBE_DISCOVERY_URL = os.environ.get('YOUTUBE_DISCOVERY_URL')
+
 # Configuração de curadoria
 USAR_CURACAO = os.environ.get('USAR_CURACAO', 'false').lower() == 'true' and CURACAO_DISPONIVEL
 CURACAO_TIMEOUT = int(os.environ.get('CURACAO_TIMEOUT', '3600'))
 
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.5-flash')
+# Quantas vezes sortear outro tema quando o título sai parecido com um já publicado
+MAX_TENTATIVAS_TEMA = int(os.environ.get('MAX_TENTATIVAS_TEMA', '5'))
+
+# 'estruturado': uma chamada gera título, tags e segmentos; 'classico': título, roteiro e keywords separados;
+# 'streaming': roteiro em streaming alimentando TTS e busca de mídia frase a frase
+MODO_GERACAO = os.environ.get('MODO_GERACAO', 'estruturado')
+TTS_CONCORRENCIA = int(os.environ.get('TTS_CONCORRENCIA', '3'))
+
+# Linhas do tempo só com cortes secos vão direto para o ffmpeg; 'false' força o compositor do moviepy
+RENDER_CORTES = os.environ.get('RENDER_CORTES', 'true').lower() == 'true'
+# Partes do render por cortes guardadas em .cache/segmentos: refazer com uma mídia trocada só codifica a parte dela.
+# Desligado por padrão: o pipeline renderiza cada vídeo uma vez, e só quem renderiza o mesmo conteúdo de novo
+# (benchmark, testes de render locais) reaproveita alguma parte
+CACHE_SEGMENTOS = os.environ.get('CACHE_SEGMENTOS', 'false').lower() == 'true'
+ZOOM_SHORT = 0.1
+ZOOM_LONG = 0.05
+
+# Vídeos do Pexels baixados só até a duração do segmento (Range + moov); 'false' baixa sempre inteiro
+DOWNLOAD_PARCIAL = os.environ.get('DOWNLOAD_PARCIAL', 'true').lower() == 'true'
+# Vídeos usados a partir do keyframe da janela mais movimentada (pelo moov), não do começo
+ESCOLHER_TRECHO = os.environ.get('ESCOLHER_TRECHO', 'true').lower() == 'true'
+# Buscas respondidas primeiro pelo catálogo offline (media_catalog.py colher); a API só quando ele não tem
+USAR_CATALOGO = os.environ.get('USAR_CATALOGO', 'true').lower() == 'true'
+# Mídias escolhidas conferidas (HEAD) antes do download; as que não servem trocam pelo próximo candidato
+VALIDAR_MIDIAS = os.environ.get('VALIDAR_MIDIAS', 'true').lower() == 'true'
+TENTATIVAS_SUBSTITUTA = int(os.environ.get('TENTATIVAS_SUBSTITUTA', '3'))
+# 'true': render em MP4 fragmentado enviado ao YouTube enquanto é escrito (publicação em max(render, upload))
+UPLOAD_STREAMING = os.environ.get('UPLOAD_STREAMING', 'false').lower() == 'true'
+
+# Quanto uma execução avulsa espera a cota liberar antes de desistir (segundos)
+COTA_ESPERA_MAX = int(os.environ.get('COTA_ESPERA_MAX', '900'))
+# Para a reserva de cota do Pexels: segmentos que costumam cair no mesmo assunto (uma busca para todos)
+SEGMENTOS_POR_ASSUNTO = int(os.environ.get('SEGMENTOS_POR_ASSUNTO', '5'))
+
+llm = GeminiClient(GEMINI_API_KEY)
 
 with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
     config = json.load(f)
 
+midias_usadas = IndiceMidiasUsadas()
+pool_fallback = PoolFallback()
+catalogo = CatalogoMidias()
+verificador = VerificadorMidias()
+cache_segmentos = CacheSegmentos() if CACHE_SEGMENTOS else None
+indice_similaridade = IndiceSimilaridade()
+
+# Índices e log são compartilhados entre os jobs do agendador; gravações passam por aqui
+_lock_indices = threading.Lock()
+
+
+class Execucao:
+    """O que varia de um job para outro: canal, tipo de vídeo, config e pastas.
+
+    Rodando generate_video.py direto vale o padrão (variáveis de ambiente e
+    config.json); o agendador ativa uma Execucao por job com usar_execucao().
+    Com uma AreaTrabalho, os rascunhos e a curadoria ficam numa pasta só desta
+    execução, apagada no fim; sem ela, assets_dir é compartilhada e nada é apagado.
+    O planejador agrupa as buscas no Pexels dos segmentos da execução.
+    """
+
+    def __init__(self, tipo, config, assets_dir=ASSETS_DIR, videos_dir=VIDEOS_DIR, usar_curacao=False,
+                 credenciais=None, canal=None, area=None):
+        self.tipo = tipo
+        self.config = config
+        self.assets_dir = assets_dir
+        self.videos_dir = videos_dir
+        self.usar_curacao = usar_curacao
+        self.credenciais = credenciais
+        self.canal = canal
+        self.id = uuid.uuid4().hex
+        self.area = None
+        self.curacao_file = None
+        self.planejador = PlanejadorMidias(buscar_candidatos_pexels, escolher_nao_usadas, buscar_no_catalogo)
+        if area:
+            self.usar_area(area)
+    
+    def usar_area(self, area):
+        """Passa a usar uma AreaTrabalho exclusiva para rascunhos e curadoria"""
+        self.area = area
+        self.assets_dir = area.pasta
+        self.curacao_file = area.curacao_file
+
+_execucao_atual = contextvars.ContextVar('execucao_atual', default=None)
+
+def execucao():
+    """Execução ativa no contexto; sem agendador, montada a partir dos globais do módulo"""
+    return _execucao_atual.get() or Execucao(VIDEO_TYPE, config, ASSETS_DIR, VIDEOS_DIR, USAR_CURACAO,
+                                             YOUTUBE_CREDENTIALS)
+
+@contextmanager
+def usar_execucao(atual):
+    token = _execucao_atual.set(atual)
+    try:
+        yield atual
+    finally:
+        _execucao_atual.reset(token)
+
+@contextmanager
+def reservas_midias(atual):
+    """Solta as mídias reservadas pela execução quando ela termina, publicando ou não"""
+    try:
+        yield
+    finally:
+        midias_usadas.liberar(atual.id)
+
 def buscar_noticias():
     """Busca notícias em feeds RSS"""
-    if config.get('tipo') != 'noticias':
+    config_canal = execucao().config
+    if config_canal.get('tipo') != 'noticias':
         return None
     
-    feeds = config.get('rss_feeds', [])
+    feeds = config_canal.get('rss_feeds', [])
     todas_noticias = []
     
     for feed_url in feeds[:3]:
@@ -64,34 +196,41 @@ def buscar_noticias():
     
     return random.choice(todas_noticias) if todas_noticias else None
 
-def gerar_titulo_especifico(tema):
+def gerar_titulo_especifico(tema, usar_cache=False):
     """Gera título específico e keywords baseado no tema"""
     prompt = f"""Baseado no tema "{tema}", crie um título ESPECÍFICO e palavras-chave.
 
 Retorne APENAS JSON: {{"titulo": "título aqui", "keywords": ["palavra1", "palavra2", "palavra3", "palavra4", "palavra5"]}}"""
     
-    response = model.generate_content(prompt)
-    texto = response.text.strip().replace('```json', '').replace('```', '').strip()
+    try:
+        texto = llm.gerar(prompt, 'titulo', usar_cache=usar_cache)
+    except ErroGemini as e:
+        print(f"⚠️ Gemini indisponível para o título, usando o tema: {e}")
+        return {"titulo": tema, "keywords": ["technology", "innovation", "future", "modern", "digital"]}
+    
+    texto = texto.strip().replace('```json', '').replace('```', '').strip()
     
     inicio = texto.find('{')
     fim = texto.rfind('}') + 1
     
     if inicio == -1 or fim == 0:
+        print(f"⚠️ Resposta sem JSON para o título: {texto[:100]}")
         return {"titulo": tema, "keywords": ["technology", "innovation", "future", "modern", "digital"]}
     
     try:
         return json.loads(texto[inicio:fim])
-    except:
+    except ValueError as e:
+        print(f"⚠️ JSON inválido para o título: {e}")
         return {"titulo": tema, "keywords": ["technology", "innovation", "future", "modern", "digital"]}
 
-def gerar_roteiro(duracao_alvo, titulo, noticia=None):
-    """Gera roteiro baseado na duração e tema"""
+def _prompt_roteiro(duracao_alvo, titulo, noticia=None):
+    """Monta as instruções de roteiro conforme duração e tipo de conteúdo"""
     if duracao_alvo == 'short':
         palavras_alvo = 120
         tempo = '30-60 segundos'
     else:
-        palavras_alvo = config.get('duracao_minutos', 10) * 150
-        tempo = f"{config.get('duracao_minutos', 10)} minutos"
+        palavras_alvo = execucao().config.get('duracao_minutos', 10) * 150
+        tempo = f"{execucao().config.get('duracao_minutos', 10)} minutos"
     
     if noticia:
         prompt = f"""Script sobre: {titulo}
@@ -110,9 +249,7 @@ REGRAS IMPORTANTES:
 - Fale diretamente com o espectador
 - Texto corrido para narração
 - SEM formatação, asteriscos ou marcadores
-- SEM emojis
-
-Escreva APENAS o roteiro de narração."""
+- SEM emojis"""
         else:
             prompt = f"""Crie um script sobre: {titulo}
 
@@ -127,14 +264,12 @@ REGRAS IMPORTANTES:
 - Texto corrido para narração
 - SEM formatação, asteriscos ou marcadores
 - SEM emojis
-- Finalize com chamada para inscrição no canal
-
-Escreva APENAS o roteiro de narração."""
-    
-    response = model.generate_content(prompt)
-    texto = response.text
+- Finalize com chamada para inscrição no canal"""
     
-    # Limpeza do texto
+    return prompt
+
+def limpar_texto_narracao(texto):
+    """Remove marcações que o modelo às vezes devolve"""
     texto = re.sub(r'\*+', '', texto)
     texto = re.sub(r'#+\s', '', texto)
     texto = re.sub(r'^-\s', '', texto, flags=re.MULTILINE)
@@ -142,32 +277,117 @@ Escreva APENAS o roteiro de narração."""
     
     return texto
 
+def gerar_roteiro(duracao_alvo, titulo, noticia=None, usar_cache=False):
+    """Gera roteiro baseado na duração e tema"""
+    prompt = _prompt_roteiro(duracao_alvo, titulo, noticia) + "\n\nEscreva APENAS o roteiro de narração."
+    
+    texto = llm.gerar(prompt, 'roteiro', usar_cache=usar_cache)
+    
+    return limpar_texto_narracao(texto)
+
+def gerar_plano(duracao_alvo, tema, noticia=None, usar_cache=False):
+    """Gera título, tags e roteiro já segmentado (com keywords por segmento) em uma única chamada"""
+    prompt = _prompt_roteiro(duracao_alvo, tema, noticia) + """
+
+ESTRUTURA:
+- Crie um título ESPECÍFICO e chamativo para o vídeo
+- Divida a narração em segmentos curtos, de 1 ou 2 frases cada; cada segmento vira uma cena
+- Para cada segmento, dê de 3 a 5 palavras-chave em INGLÊS para buscar imagens/vídeos que ilustrem aquele trecho
+- Dê de 5 a 10 tags para o YouTube
+
+Retorne APENAS JSON:
+{"titulo": "título aqui", "tags": ["tag1", "tag2"], "segmentos": [{"texto": "trecho da narração", "keywords": ["keyword1", "keyword2", "keyword3"]}]}"""
+    
+    try:
+        texto = llm.gerar(prompt, 'plano', usar_cache=usar_cache)
+    except ErroGemini as e:
+        print(f"⚠️ Gemini indisponível para o plano: {e}")
+        return None
+    
+    texto = texto.strip().replace('```json', '').replace('```', '').strip()
+    inicio = texto.find('{')
+    fim = texto.rfind('}') + 1
+    
+    try:
+        dados = json.loads(texto[inicio:fim]) if inicio != -1 and fim > 0 else {}
+    except ValueError as e:
+        print(f"⚠️ JSON inválido no plano: {e}")
+        return None
+    
+    segmentos = []
+    for seg in dados.get('segmentos', []):
+        if not isinstance(seg, dict):
+            continue
+        texto_seg = limpar_texto_narracao(str(seg.get('texto', '')))
+        keywords = [str(k).strip() for k in seg.get('keywords', []) if str(k).strip()]
+        if texto_seg:
+            segmentos.append({'texto': texto_seg, 'keywords': keywords[:5] or normalizar_keywords(texto_seg)})
+    
+    if not segmentos or not dados.get('titulo'):
+        print("⚠️ Plano sem título ou segmentos")
+        return None
+    
+    return {
+        'titulo': noticia['titulo'] if noticia else str(dados['titulo']).strip(),
+        'tags': [str(t).strip().lstrip('#') for t in dados.get('tags', []) if str(t).strip()][:10],
+        'segmentos': segmentos,
+        'roteiro': ' '.join(seg['texto'] for seg in segmentos)
+    }
+
+def gerar_plano_inedito(noticia, indice_similaridade):
+    """Gera o plano, sorteando outro tema quando título ou roteiro repetem um vídeo publicado"""
+    plano = None
+    
+    for tentativa in range(MAX_TENTATIVAS_TEMA):
+        tema = noticia['titulo'] if noticia else random.choice(execucao().config['temas'])
+        print(f"📝 Tema: {tema}")
+        
+        plano = gerar_plano(execucao().tipo, tema, noticia)
+        if not plano or noticia:
+            return plano
+        
+        repetido = (indice_similaridade.consultar(plano['titulo'], 'titulo')
+                    or indice_similaridade.consultar(plano['roteiro'], 'roteiro'))
+        if not repetido:
+            return plano
+        print(f"♻️ Plano {repetido[0]:.0%} parecido com '{repetido[1]['texto']}' - sorteando outro tema")
+    
+    return plano
+
+def escolher_voz():
+    """Escolhe a voz do Edge TTS conforme o tipo do canal"""
+    vozes_disponiveis = [
+        'pt-BR-FranciscaNeural',
+        'pt-BR-AntonioNeural',
+        'pt-BR-BrendaNeural',
+        'pt-BR-ThalitaNeural',
+    ]
+    
+    config_canal = execucao().config
+    tipo_canal = config_canal.get('tipo', 'motivacional')
+    
+    if tipo_canal == 'noticias':
+        voz = 'pt-BR-FranciscaNeural'
+    elif tipo_canal == 'motivacional':
+        voz = 'pt-BR-AntonioNeural'
+    else:
+        voz = random.choice(vozes_disponiveis)
+    
+    voz = config_canal.get('voz_fallback', voz)
+    
+    print(f"🎤 Usando voz: {voz}")
+    return voz
+
 def criar_audio(texto, output_file):
     """Cria áudio usando Edge TTS com múltiplas vozes"""
     
     async def gerar():
-        vozes_disponiveis = [
-            'pt-BR-FranciscaNeural',
-            'pt-BR-AntonioNeural',
-            'pt-BR-BrendaNeural',
-            'pt-BR-ThalitaNeural',
-        ]
-        
-        tipo_canal = config.get('tipo', 'motivacional')
-        
-        if tipo_canal == 'noticias':
-            voz = 'pt-BR-FranciscaNeural'
-        elif tipo_canal == 'motivacional':
-            voz = 'pt-BR-AntonioNeural'
-        else:
-            voz = random.choice(vozes_disponiveis)
-        
-        voz = config.get('voz_fallback', voz)
+        voz = escolher_voz()
         
-        print(f"🎤 Usando voz: {voz}")
-        
-        communicate = edge_tts.Communicate(texto, voz)
-        await communicate.save(output_file)
+        with tracer.span('tts', 'tts', caracteres=len(texto)) as span:
+            communicate = edge_tts.Communicate(texto, voz)
+            await communicate.save(output_file)
+            span.anotar(bytes=os.path.getsize(output_file))
         
         print("✅ Áudio gerado com Edge TTS!")
         return output_file
@@ -182,88 +402,220 @@ def extrair_keywords_do_texto(texto):
 Retorne APENAS palavras separadas por vírgula."""
     
     try:
-        response = model.generate_content(prompt)
-        keywords = [k.strip() for k in response.text.strip().split(',')]
+        resposta = llm.gerar(prompt, 'keywords')
+        keywords = [k.strip() for k in resposta.strip().split(',')]
         return keywords[:5]
-    except:
-        palavras = texto.lower().split()
-        return [p for p in palavras if len(p) > 4][:3]
+    except ErroGemini as e:
+        print(f"⚠️ Keywords via Gemini falharam, usando palavras do texto: {e}")
+        return normalizar_keywords(texto)
 
-def buscar_midia_pexels(keywords, tipo='video', quantidade=1):
-    """Busca mídias no Pexels"""
+def normalizar_keywords(texto):
+    """Keywords de emergência: as palavras mais longas do próprio texto"""
+    palavras = texto.lower().split()
+    return [p for p in palavras if len(p) > 4][:3]
+
+def _get_pexels(url, headers, tipo, palavra_busca):
+    with tracer.span('pexels', 'pexels', tipo=tipo, busca=palavra_busca) as span:
+        response = requests.get(url, headers=headers, timeout=15)
+        span.anotar(status=response.status_code, bytes=len(response.content))
+    
+    cotas.consumir('pexels')
+    if response.status_code == 429:
+        reset = response.headers.get('X-Ratelimit-Reset', '')
+        cotas.esgotar('pexels', int(reset) if reset.isdigit() else None)
+    return response
+
+def buscar_candidatos_pexels(palavra_busca, tipo='video', pagina=1):
+    """Faz uma busca no Pexels e retorna todos os candidatos utilizáveis"""
     headers = {'Authorization': PEXELS_API_KEY}
-    
-    if isinstance(keywords, str):
-        keywords = [keywords]
-    
-    palavra_busca = ' '.join(keywords[:3])
-    pagina = random.randint(1, 3)
-    
-    midias = []
+    orientacao = orientacao_atual()
+    candidatos = []
     
     if tipo == 'video':
-        orientacao = 'portrait' if VIDEO_TYPE == 'short' else 'landscape'
-        url = f'https://api.pexels.com/videos/search?query={palavra_busca}&per_page=30&page={pagina}&orientation={orientacao}'
+        url = f'{PEXELS_API_URL}/videos/search?query={palavra_busca}&per_page=30&page={pagina}&orientation={orientacao}'
         
         try:
-            response = requests.get(url, headers=headers, timeout=15)
+            response = _get_pexels(url, headers, tipo, palavra_busca)
             if response.status_code == 200:
-                videos = response.json().get('videos', [])
-                random.shuffle(videos)
-                
-                for video in videos:
-                    for file in video['video_files']:
-                        if VIDEO_TYPE == 'short':
-                            if file.get('height', 0) > file.get('width', 0):
-                                midias.append((file['link'], 'video'))
-                                break
-                        else:
-                            if file.get('width', 0) >= 1280:
-                                midias.append((file['link'], 'video'))
-                                break
-                    
-                    if len(midias) >= quantidade:
-                        break
+                for video in response.json().get('videos', []):
+                    arquivo = arquivo_adequado(video['video_files'])
+                    if arquivo:
+                        candidatos.append({'id': f"video:{video['id']}", 'url': arquivo['link'], 'tipo': 'video'})
         except Exception as e:
             print(f"⚠️ Pexels vídeos: {e}")
-    
-    # Se não encontrou vídeos suficientes, buscar fotos
-    if len(midias) < quantidade:
-        orientacao = 'portrait' if VIDEO_TYPE == 'short' else 'landscape'
-        url = f'https://api.pexels.com/v1/search?query={palavra_busca}&per_page=50&page={pagina}&orientation={orientacao}'
+    else:
+        url = f'{PEXELS_API_URL}/v1/search?query={palavra_busca}&per_page=50&page={pagina}&orientation={orientacao}'
         
         try:
-            response = requests.get(url, headers=headers, timeout=15)
+            response = _get_pexels(url, headers, tipo, palavra_busca)
             if response.status_code == 200:
-                fotos = response.json().get('photos', [])
-                random.shuffle(fotos)
-                
-                for foto in fotos[:quantidade * 2]:
-                    midias.append((foto['src']['large2x'], 'foto'))
+                for foto in response.json().get('photos', []):
+                    candidatos.append({'id': f"foto:{foto['id']}", 'url': foto['src']['large2x'], 'tipo': 'foto'})
         except Exception as e:
             print(f"⚠️ Pexels fotos: {e}")
     
-    random.shuffle(midias)
-    return midias[:quantidade]
+    for candidato in candidatos:
+        associar_url(candidato['url'], candidato['id'])
+    
+    return candidatos
+
+def arquivo_adequado(arquivos):
+    """Primeiro arquivo de um vídeo do Pexels no formato do tipo de vídeo atual"""
+    for arquivo in arquivos:
+        if execucao().tipo == 'short':
+            adequado = arquivo.get('height', 0) > arquivo.get('width', 0)
+        else:
+            adequado = arquivo.get('width', 0) >= 1280
+        
+        if adequado:
+            return arquivo
+    return None
 
-def baixar_midia(url, filename):
-    """Baixa mídia de uma URL"""
+def buscar_no_catalogo(palavra_busca, tipo='video'):
+    """Candidatos do catálogo offline para a busca, sem rede; vazio manda a busca para a API"""
+    if not USAR_CATALOGO:
+        return []
+    
     try:
-        response = requests.get(url, stream=True, timeout=30)
-        with open(filename, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        return filename
-    except:
-        return None
+        itens = catalogo.buscar(palavra_busca, tipo, orientacao_atual())
+    except sqlite3.Error as e:
+        # Catálogo travado por outra colheita, corrompido ou sqlite sem FTS5: a busca vai para a API
+        print(f"⚠️ Catálogo offline indisponível: {e}")
+        return []
+    
+    candidatos = []
+    for item in itens:
+        arquivo = arquivo_adequado(item['arquivos']) if tipo == 'video' else item['arquivos'][0]
+        if arquivo:
+            candidatos.append({'id': item['id'], 'url': arquivo['link'], 'tipo': tipo})
+    
+    for candidato in candidatos:
+        associar_url(candidato['url'], candidato['id'])
+    
+    return candidatos
+
+def escolher_nao_usadas(candidatos, quantidade):
+    """Escolhe candidatos evitando mídias usadas recentemente; completa com as menos recentes"""
+    novas = [c for c in candidatos if not midias_usadas.recente(c['id'])]
+    escolhidas = novas[:quantidade]
+    
+    if len(escolhidas) < quantidade:
+        restantes = [c for c in candidatos if c not in escolhidas]
+        # Reservadas por outra execução em andamento só entram depois de todas as já publicadas
+        restantes.sort(key=lambda c: (midias_usadas.reservada(c['id']), -midias_usadas.dias_desde_uso(c['id'])))
+        escolhidas += restantes[:quantidade - len(escolhidas)]
+    
+    dono = execucao().id
+    for candidato in escolhidas:
+        midias_usadas.reservar(candidato['id'], dono)
+    
+    return escolhidas
+
+def orientacao_atual():
+    return 'portrait' if execucao().tipo == 'short' else 'landscape'
+
+def midia_fallback(quantidade=1, duracao=None):
+    """Mídias do pool local, sem rede; clipes só quando cobrem a duração pedida"""
+    tipos = ('video', 'foto') if duracao is not None and duracao <= DURACAO_CLIP_FALLBACK else ('foto',)
+    midias = pool_fallback.escolher(orientacao_atual(), quantidade, tipos)
+    
+    if len(midias) < quantidade:
+        print("⚠️ Pool de fallback sem mídias suficientes - buscando no Pexels")
+        midias += buscar_midia_pexels(['nature', 'landscape'], tipo='foto', quantidade=quantidade - len(midias))
+    
+    return midias
+
+def completar_com_fallback(midias_sincronizadas, sem_midia):
+    """Cobre com o pool local os segmentos em que a busca não achou nada"""
+    for seg in sem_midia:
+        midia = midia_fallback(1, seg['duracao'])
+        if midia:
+            midias_sincronizadas.append(dict(seg, midia=midia[0]))
+    
+    if sem_midia:
+        print(f"📦 {len(sem_midia)} segmentos sem mídia cobertos pelo pool local")
+        midias_sincronizadas.sort(key=lambda item: item['inicio'])
+    
+    return midias_sincronizadas
+
+def buscar_midia_pexels(keywords, tipo='video', quantidade=1):
+    """Busca mídias no Pexels pelo planejador da execução (segmentos de mesmo assunto dividem a busca)"""
+    planejador = execucao().planejador
+    midias = []
+    
+    if tipo == 'video':
+        midias += planejador.obter(keywords, 'video', quantidade)
+    
+    # Se não encontrou vídeos suficientes, buscar fotos
+    if len(midias) < quantidade:
+        midias += planejador.obter(keywords, 'foto', quantidade - len(midias))
+    
+    return [(m['url'], m['tipo']) for m in midias]
+
+def eh_local(midia_info):
+    """Mídias do pool de fallback já estão em disco e não passam por download"""
+    return os.path.isfile(midia_info)
+
+def trecho_local(caminho, destino, segundos):
+    """Vídeo local recortado (sem recodificar) a partir da janela mais movimentada; o próprio arquivo se for o começo"""
+    # Baixado para este job (baixar_midias): já veio recortado
+    if not ESCOLHER_TRECHO or os.path.abspath(caminho).startswith(os.path.abspath(execucao().assets_dir) + os.sep):
+        return caminho
+    inicio = analises.inicio_arquivo(caminho, segundos)
+    if not inicio:
+        return caminho
+    try:
+        recortar(caminho, destino, inicio, segundos + MARGEM_TRECHO)
+        return destino
+    except subprocess.CalledProcessError as e:
+        print(f"⚠️ Falha ao recortar {os.path.basename(caminho)}: {e}")
+        return caminho
+
+def recortar_baixado(caminho, escolher, segundos):
+    """Troca um vídeo baixado inteiro pelo trecho a partir do keyframe que `escolher(moov)` devolver"""
+    try:
+        inicio = escolher(ler_moov(caminho))
+    except (LayoutNaoSuportado, OSError, ValueError):
+        return
+    if not inicio:
+        return
+    temporario = caminho + '.trecho.mp4'
+    try:
+        recortar(caminho, temporario, inicio, segundos + MARGEM_TRECHO)
+        os.replace(temporario, caminho)
+    except subprocess.CalledProcessError as e:
+        print(f"⚠️ Falha ao recortar {os.path.basename(caminho)}: {e}")
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+def baixar_midia(url, filename, segundos=None):
+    """Baixa mídia de uma URL; com `segundos`, vídeos MP4 vêm só com o trecho que o segmento usa"""
+    with tracer.span('download', 'download') as span:
+        try:
+            escolher = partial(analises.inicio, url, segundos) if ESCOLHER_TRECHO and segundos else None
+            download = DownloadParcial(url, span=span)
+            download.baixar(filename, segundos if DOWNLOAD_PARCIAL else None, escolher)
+            if escolher and not download.recortado:
+                # Veio inteiro (DOWNLOAD_PARCIAL=false, servidor sem Range, MP4 fragmentado): recorta aqui
+                recortar_baixado(filename, escolher, segundos)
+            return filename
+        except Exception as e:
+            span.anotar(erro=str(e)[:200])
+            return None
 
-def analisar_roteiro_e_buscar_midias(roteiro, duracao_audio, usar_bing=False):
+def analisar_roteiro_e_buscar_midias(roteiro, duracao_audio, usar_bing=False, segmentos_plano=None):
     """Analisa roteiro e busca mídias sincronizadas"""
     print("📋 Analisando roteiro para sincronização...")
     
-    # Dividir em segmentos
-    segmentos = re.split(r'[.!?]\s+', roteiro)
-    segmentos = [s.strip() for s in segmentos if len(s.strip()) > 20]
+    if segmentos_plano:
+        # Segmentos e keywords já vieram do plano estruturado
+        segmentos = [seg['texto'] for seg in segmentos_plano]
+        keywords_plano = [seg['keywords'] for seg in segmentos_plano]
+    else:
+        # Dividir em segmentos
+        segmentos = re.split(r'[.!?]\s+', roteiro)
+        segmentos = [s.strip() for s in segmentos if len(s.strip()) > 20]
+        keywords_plano = None
     
     print(f"  {len(segmentos)} segmentos encontrados")
     
@@ -273,11 +625,11 @@ def analisar_roteiro_e_buscar_midias(roteiro, duracao_audio, usar_bing=False):
     segmentos_com_tempo = []
     tempo_atual = 0
     
-    for segmento in segmentos:
+    for i, segmento in enumerate(segmentos):
         palavras_segmento = len(segmento.split())
         duracao_segmento = palavras_segmento / palavras_por_segundo
         
-        keywords = extrair_keywords_do_texto(segmento)
+        keywords = keywords_plano[i] if keywords_plano else extrair_keywords_do_texto(segmento)
         
         segmentos_com_tempo.append({
             'texto': segmento[:100],
@@ -291,6 +643,7 @@ def analisar_roteiro_e_buscar_midias(roteiro, duracao_audio, usar_bing=False):
     
     # Buscar mídias
     midias_sincronizadas = []
+    sem_midia = []
     
     for i, seg in enumerate(segmentos_com_tempo):
         print(f"🔍 Seg {i+1}: '{seg['texto'][:50]}...' → {seg['keywords']}")
@@ -303,23 +656,33 @@ def analisar_roteiro_e_buscar_midias(roteiro, duracao_audio, usar_bing=False):
                 'inicio': seg['inicio'],
                 'duracao': seg['duracao'],
                 'texto': seg['texto'],
+                'texto_completo': seg['texto_completo'],
                 'keywords': seg['keywords']
             })
         else:
             print(f"  ⚠️ Sem mídia para seg {i+1}")
+            sem_midia.append({key: seg[key] for key in ('inicio', 'duracao', 'texto', 'texto_completo', 'keywords')})
     
-    print(f"✅ {len(midias_sincronizadas)} mídias encontradas")
+    planejador = execucao().planejador
+    print(f"✅ {len(midias_sincronizadas)} mídias encontradas ({len(planejador.grupos)} assuntos: "
+          f"{planejador.locais} pelo catálogo, {planejador.buscas} buscas no Pexels)")
     
-    # CURADORIA (se ativado)
-    if USAR_CURACAO:
+    # A curadoria só recebe mídias do Pexels; o pool local entra depois
+    return completar_com_fallback(curar_midias(midias_sincronizadas), sem_midia)
+
+def curar_midias(midias_sincronizadas):
+    """Envia as mídias para curadoria no Telegram, se ativada"""
+    if execucao().usar_curacao:
         print("\n" + "="*60)
         print("🎬 MODO CURADORIA ATIVADO")
         print("="*60)
         
         try:
-            curator = TelegramCurator()
-            curator.solicitar_curacao(midias_sincronizadas)
-            midias_aprovadas = curator.aguardar_aprovacao(timeout=CURACAO_TIMEOUT)
+            # O chat e o getUpdates do bot são um só: curadorias de execuções simultâneas vão uma de cada vez
+            with curadoria_exclusiva():
+                curator = TelegramCurator(execucao().curacao_file or CURACAO_FILE, execucao().id)
+                curator.solicitar_curacao(midias_sincronizadas)
+                midias_aprovadas = curator.aguardar_aprovacao(timeout=CURACAO_TIMEOUT)
             
             if midias_aprovadas:
                 print("✅ Mídias aprovadas!")
@@ -331,231 +694,528 @@ def analisar_roteiro_e_buscar_midias(roteiro, duracao_audio, usar_bing=False):
     
     return midias_sincronizadas
 
-def criar_video_short_sincronizado(audio_path, midias_sincronizadas, output_file, duracao_total):
-    """Cria vídeo short com mídias sincronizadas"""
-    print(f"📹 Criando short com {len(midias_sincronizadas)} mídias")
+def dividir_frases(pedacos):
+    """Junta pedaços de texto em streaming e emite cada frase assim que ela termina"""
+    buffer = ''
+    pendente = ''
+    
+    for pedaco in pedacos:
+        buffer += pedaco
+        partes = re.split(r'(?<=[.!?])\s+', buffer)
+        buffer = partes.pop()
+        
+        for parte in partes:
+            frase = (pendente + ' ' + limpar_texto_narracao(parte)).strip()
+            # Frases muito curtas viram um só segmento com a seguinte
+            if len(frase) > 20:
+                yield frase
+                pendente = ''
+            else:
+                pendente = frase
     
-    clips = []
-    tempo_coberto = 0
+    frase = (pendente + ' ' + limpar_texto_narracao(buffer)).strip()
+    if frase:
+        yield frase
+
+async def _frases_do_roteiro(prompt, usar_cache=False):
+    """Adapta o stream síncrono do Gemini para um gerador assíncrono de frases"""
+    loop = asyncio.get_running_loop()
+    fila = asyncio.Queue()
     
-    for i, item in enumerate(midias_sincronizadas):
-        midia_info, midia_tipo = item['midia']
-        inicio = item['inicio']
-        duracao_clip = item['duracao']
-        
+    def produzir():
         try:
-            if midia_tipo == 'video':
-                video_temp = f'{ASSETS_DIR}/v_{i}.mp4'
-                if baixar_midia(midia_info, video_temp):
-                    vclip = VideoFileClip(video_temp, audio=False)
-                    
-                    ratio = 9/16
-                    if vclip.w / vclip.h > ratio:
-                        new_w = int(vclip.h * ratio)
-                        vclip = vclip.crop(x_center=vclip.w/2, width=new_w, height=vclip.h)
-                    else:
-                        new_h = int(vclip.w / ratio)
-                        vclip = vclip.crop(y_center=vclip.h/2, width=vclip.w, height=new_h)
-                    
-                    vclip = vclip.resize((1080, 1920))
-                    vclip = vclip.set_duration(min(duracao_clip, vclip.duration))
-                    vclip = vclip.set_start(inicio)
-                    clips.append(vclip)
-                    tempo_coberto = max(tempo_coberto, inicio + duracao_clip)
-            
-            else:  # foto
-                foto_temp = f'{ASSETS_DIR}/f_{i}.jpg'
-                if baixar_midia(midia_info, foto_temp):
-                    clip = ImageClip(foto_temp).set_duration(duracao_clip)
-                    clip = clip.resize(height=1920)
-                    if clip.w > 1080:
-                        clip = clip.crop(x_center=clip.w/2, width=1080, height=1920)
-                    clip = clip.resize(lambda t: 1 + 0.1 * (t / duracao_clip))
-                    clip = clip.set_start(inicio)
-                    clips.append(clip)
-                    tempo_coberto = max(tempo_coberto, inicio + duracao_clip)
-        
+            for frase in dividir_frases(llm.gerar_stream(prompt, 'roteiro', usar_cache=usar_cache)):
+                loop.call_soon_threadsafe(fila.put_nowait, frase)
+            loop.call_soon_threadsafe(fila.put_nowait, None)
         except Exception as e:
-            print(f"⚠️ Erro mídia {i}: {e}")
+            loop.call_soon_threadsafe(fila.put_nowait, e)
     
-    # Preencher lacunas
-    if tempo_coberto < duracao_total:
-        print(f"⚠️ Preenchendo {duracao_total - tempo_coberto:.1f}s")
-        extras = buscar_midia_pexels(['nature', 'landscape'], tipo='foto', quantidade=3)
-        duracao_restante = duracao_total - tempo_coberto
-        duracao_por_extra = duracao_restante / len(extras) if extras else duracao_restante
+    # Copia o contexto para o tracer e a execução do job valerem dentro da thread
+    produtor = loop.run_in_executor(None, contextvars.copy_context().run, produzir)
+    
+    while True:
+        item = await fila.get()
+        if item is None:
+            break
+        if isinstance(item, Exception):
+            raise item
+        yield item
+    
+    await produtor
+
+def juntar_audios(caminhos, duracoes, destino):
+    """Concatena os áudios das frases com um ffmpeg só (demuxer concat), cada um ocupando a duração dada"""
+    import imageio_ffmpeg
+    
+    lista = destino + '.txt'
+    with open(lista, 'w', encoding='utf-8') as f:
+        for caminho, duracao in zip(caminhos, duracoes):
+            f.write(f"file '{os.path.abspath(caminho)}'\nduration {duracao:.3f}\n")
+    try:
+        # O atraso do codificador mp3 deixa cada arquivo ~50ms mais curto que a duração do cabeçalho; o aresample
+        # completa com silêncio para cada frase começar onde a linha do tempo a colocou
+        subprocess.run([imageio_ffmpeg.get_ffmpeg_exe(), '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+                        '-i', lista, '-af', 'aresample=async=1:first_pts=0', '-c:a', 'libmp3lame', destino],
+                       check=True, stdin=subprocess.DEVNULL, capture_output=True)
+    finally:
+        os.remove(lista)
+
+def produzir_em_streaming(duracao_alvo, titulo, noticia, audio_path):
+    """Gera roteiro em streaming e dispara TTS e busca de mídia para cada frase assim que ela chega.
+    
+    Retorna (roteiro, duração, mídias sincronizadas). Os tempos de cada segmento
+    vêm da duração real do áudio de cada frase.
+    """
+    prompt = _prompt_roteiro(duracao_alvo, titulo, noticia) + "\n\nEscreva APENAS o roteiro de narração."
+    voz = escolher_voz()
+    
+    async def executar():
+        limite_tts = asyncio.Semaphore(TTS_CONCORRENCIA)
         
-        for idx, (midia_info, midia_tipo) in enumerate(extras):
-            try:
-                foto_temp = f'{ASSETS_DIR}/extra_{idx}.jpg'
-                if baixar_midia(midia_info, foto_temp):
-                    clip = ImageClip(foto_temp).set_duration(duracao_por_extra)
-                    clip = clip.resize(height=1920)
-                    if clip.w > 1080:
-                        clip = clip.crop(x_center=clip.w/2, width=1080, height=1920)
-                    clip = clip.set_start(tempo_coberto)
-                    clips.append(clip)
-                    tempo_coberto += duracao_por_extra
-            except:
-                continue
+        async def sintetizar(i, frase):
+            caminho = f'{execucao().assets_dir}/tts_{i}.mp3'
+            async with limite_tts:
+                with tracer.span('tts', 'tts', caracteres=len(frase)) as span:
+                    await edge_tts.Communicate(frase, voz).save(caminho)
+                    span.anotar(bytes=os.path.getsize(caminho))
+            return caminho
+        
+        async def buscar(frase):
+            keywords = await asyncio.to_thread(extrair_keywords_do_texto, frase)
+            midia = await asyncio.to_thread(buscar_midia_pexels, keywords, 'video', 1)
+            return keywords, midia
+        
+        frases = []
+        tarefas = []
+        
+        async for frase in _frases_do_roteiro(prompt):
+            print(f"🧵 Frase {len(frases) + 1}: '{frase[:50]}...' → TTS + mídia")
+            tarefas.append((
+                asyncio.create_task(sintetizar(len(frases), frase)),
+                asyncio.create_task(buscar(frase))
+            ))
+            frases.append(frase)
+        
+        print(f"✅ Roteiro completo: {len(frases)} frases")
+        
+        resultados = []
+        for tarefa_tts, tarefa_busca in tarefas:
+            caminho = await tarefa_tts
+            keywords, midia = await tarefa_busca
+            resultados.append((caminho, keywords, midia))
+        
+        return frases, resultados
     
-    if not clips:
-        return None
+    frases, resultados = asyncio.run(executar())
     
-    video = CompositeVideoClip(clips, size=(1080, 1920))
-    video = video.set_duration(duracao_total)
+    # Linha do tempo com as durações reais: um ffmpeg -i por frase, que termina na hora (nenhum leitor fica aberto)
+    duracoes = [ffmpeg_parse_infos(caminho)['duration'] for caminho, _, _ in resultados]
+    midias_sincronizadas = []
+    sem_midia = []
+    tempo_atual = 0
     
-    audio = AudioFileClip(audio_path)
-    video = video.set_audio(audio)
+    for i, (frase, duracao, (_, keywords, midia)) in enumerate(zip(frases, duracoes, resultados)):
+        if midia:
+            midias_sincronizadas.append({
+                'midia': midia[0],
+                'inicio': tempo_atual,
+                'duracao': duracao,
+                'texto': frase[:100],
+                'texto_completo': frase,
+                'keywords': keywords
+            })
+        else:
+            print(f"  ⚠️ Sem mídia para seg {i+1}")
+            sem_midia.append({'inicio': tempo_atual, 'duracao': duracao, 'texto': frase[:100],
+                              'texto_completo': frase, 'keywords': keywords})
+        tempo_atual += duracao
     
-    video.write_videofile(output_file, fps=30, codec='libx264', audio_codec='aac', preset='medium', bitrate='8000k')
+    juntar_audios([caminho for caminho, _, _ in resultados], duracoes, audio_path)
     
-    return output_file
+    planejador = execucao().planejador
+    print(f"✅ {len(midias_sincronizadas)} mídias encontradas ({len(planejador.grupos)} assuntos: "
+          f"{planejador.locais} pelo catálogo, {planejador.buscas} buscas no Pexels)")
+    
+    roteiro = ' '.join(frases)
+    return roteiro, tempo_atual, completar_com_fallback(curar_midias(midias_sincronizadas), sem_midia)
 
-def criar_video_long_sincronizado(audio_path, midias_sincronizadas, output_file, duracao_total):
-    """Cria vídeo longo com mídias sincronizadas"""
-    print(f"📹 Criando long com {len(midias_sincronizadas)} mídias")
+def _abrir_video_short(caminho, duracao_clip):
+    vclip = VideoFileClip(caminho, audio=False)
     
-    clips = []
+    ratio = 9/16
+    if vclip.w / vclip.h > ratio:
+        new_w = int(vclip.h * ratio)
+        vclip = vclip.crop(x_center=vclip.w/2, width=new_w, height=vclip.h)
+    else:
+        new_h = int(vclip.w / ratio)
+        vclip = vclip.crop(y_center=vclip.h/2, width=vclip.w, height=new_h)
+    
+    vclip = vclip.resize((1080, 1920))
+    return vclip.set_duration(min(duracao_clip, vclip.duration))
+
+def _abrir_foto_short(caminho, duracao_clip, zoom=True):
+    clip = ImageClip(caminho).set_duration(duracao_clip)
+    clip = clip.resize(height=1920)
+    if clip.w > 1080:
+        clip = clip.crop(x_center=clip.w/2, width=1080, height=1920)
+    if zoom:
+        clip = clip.resize(lambda t: 1 + ZOOM_SHORT * (t / duracao_clip))
+    return clip
+
+def _abrir_video_long(caminho, duracao_clip):
+    vclip = VideoFileClip(caminho, audio=False)
+    vclip = vclip.resize(height=1080)
+    if vclip.w < 1920:
+        vclip = vclip.resize(width=1920)
+    vclip = vclip.crop(x_center=vclip.w/2, y_center=vclip.h/2, width=1920, height=1080)
+    return vclip.set_duration(min(duracao_clip, vclip.duration))
+
+def _abrir_foto_long(caminho, duracao_clip, zoom=True):
+    clip = ImageClip(caminho).set_duration(duracao_clip)
+    clip = clip.resize(height=1080)
+    if clip.w < 1920:
+        clip = clip.resize(width=1920)
+    clip = clip.crop(x_center=clip.w/2, y_center=clip.h/2, width=1920, height=1080)
+    if zoom:
+        clip = clip.resize(lambda t: 1 + ZOOM_LONG * (t / duracao_clip))
+    return clip
+
+def fonte_valida(caminho, tipo):
+    """None se a fonte abre no render (imagem decodificável, vídeo com trilha de vídeo e duração); senão o motivo"""
+    try:
+        if tipo == 'foto':
+            with Image.open(caminho) as imagem:
+                imagem.verify()
+        else:
+            infos = ffmpeg_parse_infos(caminho)
+            if not infos.get('video_found') or not infos.get('duration'):
+                return 'sem trilha de vídeo'
+    except Exception as e:
+        return str(e).strip().splitlines()[-1][:200] if str(e).strip() else type(e).__name__
+    return None
+
+def preparar_fonte(midia, duracao, destino):
+    """(caminho local, motivo): baixa ou recorta a mídia e confere se ela abre; motivo None se está pronta"""
+    midia_info, midia_tipo = midia
+    if eh_local(midia_info):
+        caminho = trecho_local(midia_info, destino, duracao) if midia_tipo == 'video' else midia_info
+    else:
+        caminho = baixar_midia(midia_info, destino, duracao if midia_tipo == 'video' else None)
+        if not caminho:
+            return None, 'download falhou'
+    return caminho, fonte_valida(caminho, midia_tipo)
+
+def planejar_segmentos(midias_sincronizadas, duracao_total):
+    """Baixa o que ainda for remoto e devolve os segmentos [{inicio, duracao, caminho, tipo, zoom}], sem abrir fontes.
+    
+    Cada fonte é conferida antes de entrar: a que não baixa ou não abre é
+    trocada por uma do pool local no mesmo intervalo (senão o render deixaria
+    preto o tempo que ela cobria) ou, sem pool, pela fonte vizinha repetida; a
+    falha vai para o trace.
+    """
+    segmentos = []
+    sem_fonte = []
     tempo_coberto = 0
     
     for i, item in enumerate(midias_sincronizadas):
-        midia_info, midia_tipo = item['midia']
-        inicio = item['inicio']
-        duracao_clip = item['duracao']
+        midia = item['midia']
+        caminho, motivo = preparar_fonte(midia, item['duracao'], _destino_midia(i, midia[1]))
         
-        try:
-            if midia_tipo == 'video':
-                video_temp = f'{ASSETS_DIR}/v_{i}.mp4'
-                if baixar_midia(midia_info, video_temp):
-                    vclip = VideoFileClip(video_temp, audio=False)
-                    vclip = vclip.resize(height=1080)
-                    if vclip.w < 1920:
-                        vclip = vclip.resize(width=1920)
-                    vclip = vclip.crop(x_center=vclip.w/2, y_center=vclip.h/2, width=1920, height=1080)
-                    vclip = vclip.set_duration(min(duracao_clip, vclip.duration))
-                    vclip = vclip.set_start(inicio)
-                    clips.append(vclip)
-                    tempo_coberto = max(tempo_coberto, inicio + duracao_clip)
-            
-            else:  # foto
-                foto_temp = f'{ASSETS_DIR}/f_{i}.jpg'
-                if baixar_midia(midia_info, foto_temp):
-                    clip = ImageClip(foto_temp).set_duration(duracao_clip)
-                    clip = clip.resize(height=1080)
-                    if clip.w < 1920:
-                        clip = clip.resize(width=1920)
-                    clip = clip.crop(x_center=clip.w/2, y_center=clip.h/2, width=1920, height=1080)
-                    clip = clip.resize(lambda t: 1 + 0.05 * (t / duracao_clip))
-                    clip = clip.set_start(inicio)
-                    clips.append(clip)
-                    tempo_coberto = max(tempo_coberto, inicio + duracao_clip)
+        if motivo:
+            tracer.registrar('fonte_invalida', 'render', 0, segmento=i, midia=str(midia[0])[:200], motivo=motivo)
+            print(f"⚠️ Mídia {i} inutilizável ({motivo}) - usando o pool local")
+            substitutas = midia_fallback(1, item['duracao'])
+            if substitutas:
+                midia = substitutas[0]
+                caminho, motivo = preparar_fonte(midia, item['duracao'], _destino_midia(i, midia[1], 'r'))
+                if motivo:
+                    tracer.registrar('fonte_invalida', 'render', 0, segmento=i, midia=str(midia[0])[:200],
+                                     motivo=motivo)
+            if not substitutas or motivo:
+                sem_fonte.append(item)
+                continue
         
-        except Exception as e:
-            print(f"⚠️ Erro mídia {i}: {e}")
+        segmentos.append({'inicio': item['inicio'], 'duracao': item['duracao'], 'caminho': caminho,
+                          'tipo': midia[1], 'zoom': midia[1] == 'foto'})
+        tempo_coberto = max(tempo_coberto, item['inicio'] + item['duracao'])
+    
+    for item in sem_fonte:
+        vizinho = min(segmentos, key=lambda seg: abs(seg['inicio'] - item['inicio']), default=None)
+        if vizinho:
+            print(f"♻️ Repetindo a mídia vizinha em {item['inicio']:.1f}s")
+            segmentos.append(dict(vizinho, inicio=item['inicio'], duracao=item['duracao']))
+            tempo_coberto = max(tempo_coberto, item['inicio'] + item['duracao'])
+    segmentos.sort(key=lambda seg: seg['inicio'])
     
     # Preencher lacunas
     if tempo_coberto < duracao_total:
         print(f"⚠️ Preenchendo {duracao_total - tempo_coberto:.1f}s")
-        extras = buscar_midia_pexels(['nature', 'landscape'], tipo='foto', quantidade=3)
+        extras = midia_fallback(3)
         duracao_restante = duracao_total - tempo_coberto
         duracao_por_extra = duracao_restante / len(extras) if extras else duracao_restante
         
         for idx, (midia_info, midia_tipo) in enumerate(extras):
-            try:
-                foto_temp = f'{ASSETS_DIR}/extra_{idx}.jpg'
-                if baixar_midia(midia_info, foto_temp):
-                    clip = ImageClip(foto_temp).set_duration(duracao_por_extra)
-                    clip = clip.resize(height=1080)
-                    if clip.w < 1920:
-                        clip = clip.resize(width=1920)
-                    clip = clip.crop(x_center=clip.w/2, y_center=clip.h/2, width=1920, height=1080)
-                    clip = clip.set_start(tempo_coberto)
-                    clips.append(clip)
-                    tempo_coberto += duracao_por_extra
-            except:
-                continue
+            caminho = midia_info if eh_local(midia_info) else f'{execucao().assets_dir}/extra_{idx}.jpg'
+            if caminho == midia_info or baixar_midia(midia_info, caminho):
+                segmentos.append({'inicio': tempo_coberto, 'duracao': duracao_por_extra, 'caminho': caminho,
+                                  'tipo': 'foto', 'zoom': False})
+                tempo_coberto += duracao_por_extra
     
-    if not clips:
+    return segmentos
+
+def _destino_midia(i, tipo, prefixo=''):
+    return f"{execucao().assets_dir}/{prefixo}{'v' if tipo == 'video' else 'f'}_{i}.{'mp4' if tipo == 'video' else 'jpg'}"
+
+def montar_linha_do_tempo(segmentos, duracao_total, tamanho, abrir_video, abrir_foto):
+    """Linha do tempo do compositor; nenhuma fonte é aberta antes do render"""
+    return LinhaDoTempo([
+        (seg['inicio'], seg['duracao'],
+         partial(abrir_video, seg['caminho'], seg['duracao']) if seg['tipo'] == 'video'
+         else partial(abrir_foto, seg['caminho'], seg['duracao'], zoom=seg['zoom']))
+        for seg in segmentos
+    ], tamanho, duracao_total)
+
+def criar_legendas(midias_sincronizadas, tamanho):
+    """Legendas com o texto de cada segmento narrado; None se desativadas no config ou sem fonte"""
+    atual = execucao()
+    if not atual.config.get('legendas', atual.tipo == 'short'):
         return None
     
-    video = CompositeVideoClip(clips, size=(1920, 1080))
-    video = video.set_duration(duracao_total)
+    segmentos = [(item['inicio'], item['duracao'], item.get('texto_completo') or item['texto'])
+                 for item in midias_sincronizadas if item.get('texto')]
+    if not segmentos:
+        return None
+    
+    fonte = carregar_fonte(round(min(tamanho) * FONTE_RELATIVA))
+    if not fonte:
+        print("⚠️ Nenhuma fonte TrueType encontrada (LEGENDA_FONTE) - vídeo sem legendas")
+        return None
     
+    with tracer.span('legendas', segmentos=len(segmentos)) as span:
+        legendas = Legendas(dividir_falas(segmentos), tamanho, fonte)
+        span.anotar(falas=len(legendas.falas))
+    return legendas
+
+def renderizar(linha, audio_path, output_file, legendas=None, fragmentado=False, **opcoes):
+    """Codifica a linha do tempo com o áudio e fecha todas as fontes ao final"""
     audio = AudioFileClip(audio_path)
+    video = linha.fl(lambda quadro, t: legendas.aplicar(quadro(t), t)) if legendas else linha
     video = video.set_audio(audio)
+    if fragmentado:
+        opcoes['ffmpeg_params'] = ['-movflags', MOVFLAGS_FRAGMENTADO]
     
-    video.write_videofile(output_file, fps=24, codec='libx264', audio_codec='aac', preset='medium', bitrate='5000k')
+    try:
+        with tracer.span('encode', 'render', clips=len(linha.segmentos), duracao=linha.duration,
+                         caminho='compositor') as span, MonitorRecursos(span):
+            # O áudio temporário do moviepy iria para o diretório atual, compartilhado entre execuções
+            video.write_videofile(output_file, codec='libx264', audio_codec='aac', preset='medium',
+                                  temp_audiofile=os.path.join(execucao().assets_dir, 'render_audio.m4a'), **opcoes)
+            span.anotar(bytes=os.path.getsize(output_file), fontes_abertas_pico=linha.pico_abertos,
+                        aberturas=linha.aberturas, falhas=len(linha.falhas))
+    finally:
+        linha.close()
+        audio.close()
     
     return output_file
 
-def fazer_upload_youtube(video_path, titulo, descricao, tags):
-    """Faz upload do vídeo no YouTube"""
+def renderizar_cortes(render, segmentos, duracao_total, audio_path, output_file, legendas=None, fragmentado=False):
+    """Caminho rápido no ffmpeg; None se falhar, para o chamador cair no compositor"""
     try:
-        creds_dict = json.loads(YOUTUBE_CREDENTIALS)
-        credentials = Credentials.from_authorized_user_info(creds_dict)
-        youtube = build('youtube', 'v3', credentials=credentials)
+        with tracer.span('encode', 'render', clips=len(segmentos), duracao=duracao_total,
+                         caminho='cortes') as span, MonitorRecursos(span):
+            render.renderizar(segmentos, duracao_total, audio_path, output_file, execucao().assets_dir, legendas,
+                              fragmentado)
+            span.anotar(bytes=os.path.getsize(output_file), partes=render.partes, reaproveitadas=render.reaproveitadas)
+        if render.reaproveitadas:
+            print(f"♻️ {render.reaproveitadas} de {render.partes} partes reaproveitadas do cache")
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"⚠️ Render por cortes falhou ({e}) - usando o compositor")
+        # Arquivo novo, não o mesmo truncado: um upload em streaming percebe que o começo mudou
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        return None
+    
+    return output_file
+
+def criar_video_sincronizado(audio_path, midias_sincronizadas, output_file, duracao_total, render, abrir_video, abrir_foto,
+                             fragmentado=False):
+    segmentos = planejar_segmentos(midias_sincronizadas, duracao_total)
+    if not segmentos:
+        return None
+    
+    legendas = criar_legendas(midias_sincronizadas, render.tamanho)
+    
+    if RENDER_CORTES and render.aceita(segmentos):
+        print("✂️ Só cortes secos - render direto no ffmpeg")
+        if renderizar_cortes(render, segmentos, duracao_total, audio_path, output_file, legendas, fragmentado):
+            return output_file
+    
+    linha = montar_linha_do_tempo(segmentos, duracao_total, render.tamanho, abrir_video, abrir_foto)
+    return renderizar(linha, audio_path, output_file, legendas, fragmentado, fps=render.fps, bitrate=render.bitrate)
+
+def criar_video_short_sincronizado(audio_path, midias_sincronizadas, output_file, duracao_total, fragmentado=False):
+    """Cria vídeo short com mídias sincronizadas"""
+    print(f"📹 Criando short com {len(midias_sincronizadas)} mídias")
+    
+    render = RenderPorCortes((1080, 1920), 30, '8000k', ZOOM_SHORT, cobrir_fotos=False, cache=cache_segmentos)
+    return criar_video_sincronizado(audio_path, midias_sincronizadas, output_file, duracao_total,
+                                    render, _abrir_video_short, _abrir_foto_short, fragmentado)
+
+def criar_video_long_sincronizado(audio_path, midias_sincronizadas, output_file, duracao_total, fragmentado=False):
+    """Cria vídeo longo com mídias sincronizadas"""
+    print(f"📹 Criando long com {len(midias_sincronizadas)} mídias")
+    
+    render = RenderPorCortes((1920, 1080), 24, '5000k', ZOOM_LONG, cache=cache_segmentos)
+    return criar_video_sincronizado(audio_path, midias_sincronizadas, output_file, duracao_total,
+                                    render, _abrir_video_long, _abrir_foto_long, fragmentado)
+
+def cliente_youtube():
+    creds_dict = json.loads(execucao().credenciais)
+    credentials = Credentials.from_authorized_user_info(creds_dict)
+    if YOUTUBE_DISCOVERY_URL:
+        return build('youtube', 'v3', credentials=credentials, discoveryServiceUrl=YOUTUBE_DISCOVERY_URL,
+                     static_discovery=False, cache_discovery=False)
+    return build('youtube', 'v3', credentials=credentials)
+
+def fazer_upload_youtube(video_path, titulo, descricao, tags, media=None):
+    """Faz upload do vídeo no YouTube; com `media` (ArquivoCrescendo) envia enquanto o render ainda escreve"""
+    try:
+        youtube = cliente_youtube()
         
         body = {
             'snippet': {'title': titulo, 'description': descricao, 'tags': tags, 'categoryId': '27'},
             'status': {'privacyStatus': 'public', 'selfDeclaredMadeForKids': False}
         }
         
-        media = MediaFileUpload(video_path, resumable=True)
+        media = media or MediaFileUpload(video_path, resumable=True)
         request = youtube.videos().insert(part='snippet,status', body=body, media_body=media)
-        response = request.execute()
+        with tracer.span('youtube_upload', 'upload', streaming=isinstance(media, ArquivoCrescendo)) as span:
+            response = request.execute()
+            span.anotar(bytes=os.path.getsize(video_path))
+        cotas.consumir('youtube', YOUTUBE_CUSTO_UPLOAD)
         
         return response['id']
     except Exception as e:
+        if 'quotaExceeded' in str(e):
+            cotas.esgotar('youtube')
         print(f"❌ Erro no upload: {e}")
         raise
 
-def main():
-    """Função principal"""
-    print(f"{'📱' if VIDEO_TYPE == 'short' else '🎬'} Iniciando...")
+def publicar_thumbnail(video_path, titulo, video_id):
+    """Gera a thumbnail a partir dos keyframes do vídeo e envia; falhas não impedem a publicação"""
+    atual = execucao()
+    if not atual.config.get('thumbnail', True):
+        return None
+    
+    try:
+        cotas.garantir('youtube', YOUTUBE_CUSTO_THUMBNAIL)
+        tamanho = (720, 1280) if atual.tipo == 'short' else (1280, 720)
+        with tracer.span('thumbnail_gerar', 'render') as span:
+            caminho, tempo = gerar_thumbnail(video_path, titulo, f'{atual.assets_dir}/thumbnail.jpg', tamanho)
+            span.anotar(quadro=round(tempo, 2), bytes=os.path.getsize(caminho))
+        
+        media = MediaFileUpload(caminho, mimetype='image/jpeg', resumable=True)
+        with tracer.span('youtube_thumbnail', 'upload', bytes=os.path.getsize(caminho)):
+            cliente_youtube().thumbnails().set(videoId=video_id, media_body=media).execute()
+        cotas.consumir('youtube', YOUTUBE_CUSTO_THUMBNAIL)
+        print(f"🖼️ Thumbnail enviada (quadro em {tempo:.1f}s)")
+        return caminho
+    except Exception as e:
+        if 'quotaExceeded' in str(e):
+            cotas.esgotar('youtube')
+        # Canais não verificados não podem usar thumbnail personalizada
+        print(f"⚠️ Thumbnail não enviada: {e}")
+        return None
+
+def preparar_conteudo():
+    """Etapas de I/O: tema, roteiro, áudio e mídias já baixadas. Retorna o que o render e a publicação usam"""
+    atual = execucao()
+    print(f"{'📱' if atual.tipo == 'short' else '🎬'} Iniciando...")
     
-    os.makedirs(VIDEOS_DIR, exist_ok=True)
-    os.makedirs(ASSETS_DIR, exist_ok=True)
+    os.makedirs(atual.videos_dir, exist_ok=True)
+    os.makedirs(atual.assets_dir, exist_ok=True)
     
     # Buscar tema
-    noticia = buscar_noticias()
-    
-    if noticia:
-        titulo_video = noticia['titulo']
-        keywords = titulo_video.split()[:5]
-        print(f"📰 Notícia: {titulo_video}")
-    else:
-        tema = random.choice(config['temas'])
-        print(f"📝 Tema: {tema}")
-        
-        info = gerar_titulo_especifico(tema)
-        titulo_video = info['titulo']
-        keywords = info['keywords']
+    with tracer.span('noticias'):
+        noticia = buscar_noticias()
+    
+    plano = None
+    if MODO_GERACAO == 'estruturado':
+        print("🧩 Gerando plano (título, roteiro e segmentos)...")
+        with tracer.span('plano'):
+            plano = gerar_plano_inedito(noticia, indice_similaridade)
+        if not plano:
+            print("⚠️ Plano estruturado falhou - usando geração clássica")
+    
+    if plano:
+        titulo_video = plano['titulo']
+        roteiro = plano['roteiro']
         
         print(f"🎯 Título: {titulo_video}")
-        print(f"🔍 Keywords: {', '.join(keywords)}")
-    
-    # Gerar roteiro
-    print("✍️ Gerando roteiro...")
-    roteiro = gerar_roteiro(VIDEO_TYPE, titulo_video, noticia)
-    
-    # Criar áudio
-    audio_path = f'{ASSETS_DIR}/audio.mp3'
-    criar_audio(roteiro, audio_path)
-    
-    audio_clip = AudioFileClip(audio_path)
-    duracao = audio_clip.duration
-    audio_clip.close()
+        print(f"🧩 {len(plano['segmentos'])} segmentos planejados")
+    else:
+        if noticia:
+            titulo_video = noticia['titulo']
+            print(f"📰 Notícia: {titulo_video}")
+        else:
+            # Sortear tema até sair um título que ainda não foi publicado
+            for tentativa in range(MAX_TENTATIVAS_TEMA):
+                tema = random.choice(atual.config['temas'])
+                print(f"📝 Tema: {tema}")
+                
+                with tracer.span('titulo'):
+                    info = gerar_titulo_especifico(tema)
+                titulo_video = info['titulo']
+                keywords = info['keywords']
+                
+                repetido = indice_similaridade.consultar(titulo_video, 'titulo')
+                if not repetido:
+                    break
+                print(f"♻️ Título {repetido[0]:.0%} parecido com '{repetido[1]['texto']}' - sorteando outro tema")
+            
+            print(f"🎯 Título: {titulo_video}")
+            print(f"🔍 Keywords: {', '.join(keywords)}")
     
-    print(f"⏱️ {duracao:.1f}s")
+    audio_path = f'{atual.assets_dir}/audio.mp3'
     
-    # Buscar mídias
-    midias_sincronizadas = analisar_roteiro_e_buscar_midias(roteiro, duracao)
+    if not plano and MODO_GERACAO == 'streaming':
+        # Roteiro, áudio e mídias em paralelo, frase a frase
+        print("✍️ Gerando roteiro em streaming...")
+        with tracer.span('roteiro_streaming'):
+            roteiro, duracao, midias_sincronizadas = produzir_em_streaming(atual.tipo, titulo_video, noticia, audio_path)
+        print(f"⏱️ {duracao:.1f}s")
+    else:
+        if not plano:
+            # Gerar roteiro
+            print("✍️ Gerando roteiro...")
+            with tracer.span('roteiro'):
+                roteiro = gerar_roteiro(atual.tipo, titulo_video, noticia)
+                
+                repetido = indice_similaridade.consultar(roteiro, 'roteiro')
+                if repetido:
+                    print(f"♻️ Roteiro {repetido[0]:.0%} parecido com o de '{repetido[1]['texto']}' - gerando novamente")
+                    roteiro = gerar_roteiro(atual.tipo, titulo_video, noticia)
+        
+        # Criar áudio
+        with tracer.span('audio'):
+            criar_audio(roteiro, audio_path)
+            
+            audio_clip = AudioFileClip(audio_path)
+            duracao = audio_clip.duration
+            audio_clip.close()
+        
+        print(f"⏱️ {duracao:.1f}s")
+        
+        # Buscar mídias
+        with tracer.span('midias'):
+            midias_sincronizadas = analisar_roteiro_e_buscar_midias(
+                roteiro, duracao, segmentos_plano=plano['segmentos'] if plano else None
+            )
     
     # Complementar se necessário
     if len(midias_sincronizadas) < 3:
         print("⚠️ Complementando mídias...")
-        extras = buscar_midia_pexels(['nature', 'landscape'], tipo='foto', quantidade=5)
+        extras = midia_fallback(5)
         tempo_restante = duracao - sum([m['duracao'] for m in midias_sincronizadas])
         duracao_extra = tempo_restante / len(extras) if extras else 0
         
@@ -567,62 +1227,227 @@ def main():
             })
             tempo_restante -= duracao_extra
     
-    # Montar vídeo
-    print("🎥 Montando vídeo...")
+    if VALIDAR_MIDIAS:
+        with tracer.span('preflight', midias=len(midias_sincronizadas)) as span:
+            span.anotar(trocadas=validar_midias(midias_sincronizadas))
+    
+    with tracer.span('downloads', midias=len(midias_sincronizadas)):
+        baixar_midias(midias_sincronizadas)
+    
+    return {
+        'noticia': noticia,
+        'plano': plano,
+        'titulo_video': titulo_video,
+        'roteiro': roteiro,
+        'duracao': duracao,
+        'audio_path': audio_path,
+        'midias_sincronizadas': midias_sincronizadas,
+    }
+
+def validar_midias(midias_sincronizadas):
+    """Confere em paralelo as mídias remotas antes do download e troca as quebradas ou grandes demais.
+    
+    A substituta é o próximo candidato do mesmo assunto no planejador (e é
+    conferida também); sem candidato, ou depois de TENTATIVAS_SUBSTITUTA
+    rodadas, o segmento vai para o pool local, e uma foto que o fallback
+    buscar no Pexels passa pela mesma conferência. Se nada sobrar, o segmento
+    repete a mídia (já conferida) do vizinho mais próximo em vez de abrir um
+    buraco na timeline. Retorna quantas foram trocadas.
+    """
+    planejador = execucao().planejador
+    pendentes = [item for item in midias_sincronizadas if not eh_local(item['midia'][0])]
+    trocadas = 0
+    
+    # Rodadas com substitutas do planejador, uma do pool de fallback e uma para conferir o que ele trouxe da rede
+    for rodada in range(TENTATIVAS_SUBSTITUTA + 2):
+        motivos = verificador.verificar_todas([item['midia'] for item in pendentes])
+        recusadas = [(item, motivo) for item, motivo in zip(pendentes, motivos) if motivo]
+        # Mídias que não estão mais em jogo: locais, aprovadas agora ou em rodadas anteriores
+        conferidas = [item for item in midias_sincronizadas if all(item is not outro for outro, _ in recusadas)]
+        pendentes = []
+        
+        for item, motivo in recusadas:
+            url, tipo = item['midia']
+            print(f"🚫 Mídia recusada ({motivo}): {url[:80]}")
+            trocadas += 1
+            substituta = planejador.substituir(url) if rodada < TENTATIVAS_SUBSTITUTA else None
+            if substituta:
+                item['midia'] = (substituta['url'], substituta['tipo'])
+                pendentes.append(item)
+                continue
+            
+            fallback = midia_fallback(1, item['duracao']) if rodada <= TENTATIVAS_SUBSTITUTA else None
+            if fallback:
+                item['midia'] = fallback[0]
+                if not eh_local(fallback[0][0]):
+                    pendentes.append(item)
+                continue
+            
+            vizinho = min(conferidas, key=lambda outro: abs(outro['inicio'] - item['inicio']), default=None)
+            if vizinho:
+                print(f"🔁 Segmento em {item['inicio']:.1f}s repete a mídia do vizinho em {vizinho['inicio']:.1f}s")
+                item['midia'] = vizinho['midia']
+            else:
+                midias_sincronizadas.remove(item)
+        
+        if not pendentes:
+            break
+    
+    if trocadas:
+        print(f"🔁 {trocadas} mídias trocadas antes do download")
+    return trocadas
+
+def baixar_midias(midias_sincronizadas):
+    """Baixa as mídias remotas para a pasta do job; o render passa a ler só arquivos locais"""
+    pasta = execucao().assets_dir
+    
+    for i, item in enumerate(midias_sincronizadas):
+        midia_info, midia_tipo = item['midia']
+        if eh_local(midia_info):
+            continue
+        
+        caminho = f"{pasta}/{'v' if midia_tipo == 'video' else 'f'}_{i}.{'mp4' if midia_tipo == 'video' else 'jpg'}"
+        if baixar_midia(midia_info, caminho, item['duracao'] if midia_tipo == 'video' else None):
+            item['midia_id'] = id_midia(midia_info)
+            item['midia'] = (caminho, midia_tipo)
+        else:
+            print(f"⚠️ Falha ao baixar mídia {i}")
+
+def caminho_video():
+    atual = execucao()
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    video_path = f'{VIDEOS_DIR}/{VIDEO_TYPE}_{timestamp}.mp4'
+    prefixo = f'{atual.canal}_' if atual.canal else ''
+    return f'{atual.videos_dir}/{prefixo}{atual.tipo}_{timestamp}.mp4'
+
+def renderizar_video(conteudo, video_path=None, fragmentado=False):
+    """Etapa de CPU: monta e codifica o vídeo. Retorna o caminho do arquivo ou None"""
+    atual = execucao()
+    print("🎥 Montando vídeo...")
+    video_path = video_path or caminho_video()
+    midias_sincronizadas = conteudo['midias_sincronizadas']
     
-    if VIDEO_TYPE == 'short':
-        resultado = criar_video_short_sincronizado(audio_path, midias_sincronizadas, video_path, duracao)
-    else:
-        resultado = criar_video_long_sincronizado(audio_path, midias_sincronizadas, video_path, duracao)
+    with tracer.span('montagem', midias=len(midias_sincronizadas)):
+        criar_video = criar_video_short_sincronizado if atual.tipo == 'short' else criar_video_long_sincronizado
+        return criar_video(conteudo['audio_path'], midias_sincronizadas, video_path, conteudo['duracao'], fragmentado)
+
+def renderizar_e_enviar(renderizar_arquivo, video_path, titulo, descricao, tags):
+    """Render e upload ao mesmo tempo: o upload acompanha o MP4 fragmentado enquanto ele é escrito.
+    
+    `renderizar_arquivo()` escreve video_path (fragmentado) e retorna falso se
+    falhar. Retorna (video_path, video_id), ou (None, None) sem vídeo; nesse
+    caso a sessão de upload fica incompleta e nada é publicado. Se o render
+    recomeçar o arquivo (cortes caindo no compositor), o que já subiu é
+    descartado e o vídeo pronto vai pelo upload normal.
+    """
+    midia = ArquivoCrescendo(video_path)
+    contexto = contextvars.copy_context()
+    resultado = {}
+    
+    def enviar():
+        try:
+            resultado['id'] = contexto.run(fazer_upload_youtube, video_path, titulo, descricao, tags, midia)
+        except Exception as e:
+            resultado['erro'] = e
     
-    if not resultado:
-        print("❌ Erro na criação")
-        return
+    envio = threading.Thread(target=enviar, name='upload_streaming', daemon=True)
+    envio.start()
+    try:
+        pronto = renderizar_arquivo()
+    except BaseException as e:
+        midia.abortar(e)
+        envio.join()
+        raise
     
-    # Upload
+    if not pronto:
+        midia.abortar(RuntimeError('render não produziu vídeo'))
+        envio.join()
+        return None, None
+    
+    midia.concluir()
+    envio.join()
+    erro = resultado.get('erro')
+    if isinstance(erro, RenderInterrompido):
+        print(f"⚠️ Upload em streaming descartado ({erro}) - enviando o arquivo pronto")
+        return video_path, fazer_upload_youtube(video_path, titulo, descricao, tags)
+    if erro:
+        raise erro
+    return video_path, resultado['id']
+
+def renderizar_em_worker(atual, conteudo):
+    """Ponto de entrada do processo de render do agendador: devolve o vídeo e os spans para o trace do job"""
+    tracer_worker = Tracer()
+    with usar_execucao(atual), usar_tracer(tracer_worker):
+        return renderizar_video(conteudo), tracer_worker.exportar()
+
+def metadados_upload(conteudo):
+    """Título, descrição e tags do vídeo no YouTube"""
+    atual = execucao()
+    titulo_video = conteudo['titulo_video']
     titulo = titulo_video[:60] if len(titulo_video) <= 60 else titulo_video[:57] + '...'
-    if VIDEO_TYPE == 'short':
+    if atual.tipo == 'short':
         titulo += ' #shorts'
     
-    descricao = roteiro[:300] + '...\n\n🔔 Inscreva-se!\n#' + ('shorts' if VIDEO_TYPE == 'short' else 'curiosidades')
-    tags = ['curiosidades', 'fatos'] if not noticia else ['noticias', 'informacao']
-    if VIDEO_TYPE == 'short':
+    descricao = conteudo['roteiro'][:300] + '...\n\n🔔 Inscreva-se!\n#' + ('shorts' if atual.tipo == 'short' else 'curiosidades')
+    tags = ['curiosidades', 'fatos'] if not conteudo['noticia'] else ['noticias', 'informacao']
+    if atual.tipo == 'short':
         tags.append('shorts')
+    if conteudo['plano']:
+        tags += [tag for tag in conteudo['plano']['tags'] if tag not in tags]
+    return titulo, descricao, tags
+
+def publicar(conteudo, video_path, video_id=None):
+    """Etapas finais de I/O: upload (se ainda não foi em streaming), log, índices e limpeza da pasta do job"""
+    atual = execucao()
+    titulo_video = conteudo['titulo_video']
+    roteiro = conteudo['roteiro']
+    duracao = conteudo['duracao']
+    midias_sincronizadas = conteudo['midias_sincronizadas']
+    titulo, descricao, tags = metadados_upload(conteudo)
     
-    print("📤 Upload...")
-    video_id = fazer_upload_youtube(video_path, titulo, descricao, tags)
+    if video_id is None:
+        print("📤 Upload...")
+        with tracer.span('upload'):
+            video_id = fazer_upload_youtube(video_path, titulo, descricao, tags)
     
-    url = f'https://youtube.com/{"shorts" if VIDEO_TYPE == "short" else "watch?v="}{video_id}'
+    with tracer.span('thumbnail'):
+        publicar_thumbnail(video_path, titulo_video, video_id)
+    
+    url = f'https://youtube.com/{"shorts" if atual.tipo == "short" else "watch?v="}{video_id}'
     
     # Log
     log_entry = {
         'data': datetime.now().isoformat(),
-        'tipo': VIDEO_TYPE,
+        'tipo': atual.tipo,
         'tema': titulo_video,
         'titulo': titulo,
         'duracao': duracao,
         'video_id': video_id,
-        'url': url
+        'url': url,
+        'trace': dict(tracer.resumo(), arquivo=tracer.caminho())
     }
+    if atual.canal:
+        log_entry['canal'] = atual.canal
     
-    log_file = 'videos_gerados.json'
-    logs = []
-    
-    if os.path.exists(log_file):
-        with open(log_file, 'r', encoding='utf-8') as f:
-            logs = json.load(f)
-    
-    logs.append(log_entry)
-    
-    with open(log_file, 'w', encoding='utf-8') as f:
-        json.dump(logs, f, indent=2, ensure_ascii=False)
+    with _lock_indices:
+        run_log = RunLog()
+        run_log.registrar(log_entry)
+        atualizar_feed(log_entry, run_log)
+        
+        indice_similaridade.adicionar(titulo_video, 'titulo', video_id)
+        indice_similaridade.adicionar(roteiro, 'roteiro', video_id)
+        indice_similaridade.salvar()
+        
+        midias_usadas.registrar(item['midia_id'] for item in midias_sincronizadas if item.get('midia_id'))
+        midias_usadas.salvar()
+        pool_fallback.salvar()
+        analises.salvar()
     
     print(f"✅ Publicado!\n🔗 {url}")
+    llm.imprimir_estatisticas()
+    imprimir_etapas(log_entry['trace'])
     
     # Notificar Telegram
-    if USAR_CURACAO:
+    if atual.usar_curacao:
         try:
             curator = TelegramCurator()
             curator.notificar_publicacao({
@@ -633,12 +1458,102 @@ def main():
         except:
             pass
     
-    # Limpar
-    for file in os.listdir(ASSETS_DIR):
+    limpar_assets()
+    return log_entry
+
+def limpar_assets():
+    """Apaga a área de rascunho da execução; a pasta compartilhada (sem área) nunca é varrida"""
+    atual = execucao()
+    if atual.area:
+        atual.area.limpar()
+
+def estimar_custos(atual=None):
+    """Cota que um job deve consumir por provedor: estimativa pelo tamanho do vídeo (assuntos, no
+    Pexels) ou o maior consumo das últimas execuções do mesmo tipo, o que for maior"""
+    atual = atual or execucao()
+    if atual.tipo == 'short':
+        segmentos = 8
+    else:
+        segmentos = atual.config.get('duracao_minutos', 10) * 10
+    
+    # O planejador faz até PAGINAS_POR_GRUPO buscas por assunto (muitas respondidas pelo catálogo), não por
+    # segmento; a margem cobre substitutas, fotos do fallback e a volta à página 1. O Gemini repete chamadas
+    # quando o tema sai repetido
+    assuntos = max(3, -(-segmentos // SEGMENTOS_POR_ASSUNTO))
+    custos = {
+        'pexels': assuntos * PAGINAS_POR_GRUPO + 5,
+        'gemini': {'estruturado': 2, 'classico': 3, 'streaming': 3}.get(MODO_GERACAO, 3),
+        'youtube': YOUTUBE_CUSTO_UPLOAD + (YOUTUBE_CUSTO_THUMBNAIL if atual.config.get('thumbnail', True) else 0),
+    }
+    
+    for entrada in RunLog().por_tipo(atual.tipo, limite=10):
+        chamadas = entrada.get('trace', {}).get('chamadas', {})
+        for provedor in ('pexels', 'gemini'):
+            custos[provedor] = max(custos[provedor], chamadas.get(provedor, {}).get('chamadas', 0))
+    
+    return custos
+
+def aguardar_cotas(custos, espera_max=COTA_ESPERA_MAX):
+    """Espera a cota liberar para um job com esses custos; False se não der dentro de espera_max"""
+    while True:
+        espera, provedor = cotas.admitir(custos)
+        if espera == 0:
+            return True
+        if espera is None or espera > espera_max:
+            if espera is None:
+                quando = 'após os jobs em andamento'
+            elif espera == float('inf'):
+                quando = 'nunca: o custo passa do limite'
+            else:
+                quando = f'em {espera / 60:.0f} min'
+            print(f"🚫 Cota de {provedor} insuficiente para {custos[provedor]} - libera {quando}")
+            return False
+        print(f"⏳ Cota de {provedor} insuficiente - aguardando {espera:.0f}s")
+        time.sleep(espera + 1)
+
+def main():
+    """Função principal"""
+    custos = estimar_custos()
+    if not aguardar_cotas(custos):
+        print("⏭️ Execução cancelada antes de começar")
+        return
+    
+    # Rascunhos numa área só desta execução: outra rodando na mesma máquina não é afetada
+    atual = Execucao(VIDEO_TYPE, config, videos_dir=VIDEOS_DIR, usar_curacao=USAR_CURACAO,
+                     credenciais=YOUTUBE_CREDENTIALS, area=AreaTrabalho(VIDEO_TYPE))
+    with atual.area, usar_execucao(atual), reservas_midias(atual), cotas.reservar(custos):
+        conteudo = preparar_conteudo()
+        
+        # Não gasta CPU com um vídeo que não poderia ser enviado
         try:
-            os.remove(os.path.join(ASSETS_DIR, file))
-        except:
-            pass
+            cotas.garantir('youtube', YOUTUBE_CUSTO_UPLOAD)
+        except CotaEsgotada as e:
+            print(f"🚫 Render cancelado, o upload não caberia na cota: {e}")
+            return
+        
+        video_id = None
+        if UPLOAD_STREAMING:
+            print("📤 Upload em streaming durante o render...")
+            destino = caminho_video()
+            with tracer.span('render_upload'):
+                video_path, video_id = renderizar_e_enviar(partial(renderizar_video, conteudo, destino, True),
+                                                           destino, *metadados_upload(conteudo))
+        else:
+            video_path = renderizar_video(conteudo)
+        if not video_path:
+            print("❌ Erro na criação")
+            return
+        
+        publicar(conteudo, video_path, video_id)
+
+def imprimir_etapas(resumo):
+    print(f"⏱️ Total {resumo['total']:.0f}s: " + ', '.join(f"{etapa} {segundos:.0f}s" for etapa, segundos in resumo['etapas'].items()))
+    for nome, c in resumo['chamadas'].items():
+        print(f"  📡 {nome}: {c['chamadas']}x, {c['segundos']:.1f}s, {c['bytes'] / 2**20:.1f} MB, {c['retries']} retries")
 
 if __name__ == '__main__':
-    main()
+    try:
+        main()
+    finally:
+        # Grava o trace mesmo quando a execução falha no meio
+        print(f"🧭 Trace: {tracer.salvar(metadados={'tipo': VIDEO_TYPE, 'modo': MODO_GERACAO})}")
@@ -0,0 +1,132 @@
+import os
+import bisect
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+LEGENDA_FONTE = os.environ.get('LEGENDA_FONTE', 'DejaVuSans-Bold.ttf')
+PALAVRAS_POR_FALA = int(os.environ.get('LEGENDA_PALAVRAS', '6'))
+# Tamanho da fonte e largura máxima relativos ao quadro
+FONTE_RELATIVA = 0.07
+LARGURA_MAXIMA = 0.86
+
+
+def dividir_falas(segmentos, palavras=PALAVRAS_POR_FALA):
+    """[(inicio, duracao, texto)] → [(inicio, fim, texto)] com até `palavras` palavras cada.
+
+    O tempo do segmento é dividido entre as falas pelo número de palavras, a
+    mesma conta que sincroniza as mídias com a narração.
+    """
+    falas = []
+    for inicio, duracao, texto in segmentos:
+        termos = texto.split()
+        if not termos or duracao <= 0:
+            continue
+        por_palavra = duracao / len(termos)
+        for i in range(0, len(termos), palavras):
+            pedaco = termos[i:i + palavras]
+            falas.append((inicio + i * por_palavra, inicio + (i + len(pedaco)) * por_palavra, ' '.join(pedaco)))
+    return falas
+
+
+def carregar_fonte(tamanho, fonte=LEGENDA_FONTE):
+    """Fonte TrueType para as legendas, ou None se não houver nenhuma no sistema"""
+    for candidata in (fonte, 'DejaVuSans-Bold.ttf', 'LiberationSans-Bold.ttf'):
+        try:
+            return ImageFont.truetype(candidata, tamanho)
+        except OSError:
+            continue
+    return None
+
+
+class Legendas:
+    """Legendas rasterizadas uma vez por fala e sobrepostas só na janela de cada uma.
+
+    Cada fala vira um sprite RGBA (texto branco com contorno preto, quebrado em
+    linhas para caber em LARGURA_MAXIMA do quadro) guardado com o RGB já
+    multiplicado pelo alfa. No compositor, aplicar() mistura o sprite ativo só
+    na região que ele ocupa; no render por cortes, exportar() grava os mesmos
+    sprites em PNG para o filtro overlay do ffmpeg, então as legendas ficam
+    iguais nos dois caminhos.
+    """
+
+    def __init__(self, falas, tamanho, fonte):
+        self.tamanho = tamanho
+        self.fonte = fonte
+        self.contorno = max(2, fonte.size // 12)
+        largura, altura = tamanho
+        # Short: acima da área dos botões; long: perto da borda inferior
+        self.base = int(altura * (0.72 if altura > largura else 0.9))
+
+        self.falas = []
+        self.sprites = {}
+        for inicio, fim, texto in sorted(falas):
+            if texto not in self.sprites:
+                self.sprites[texto] = self._rasterizar(texto)
+            self.falas.append((inicio, fim, texto))
+        self._inicios = [inicio for inicio, _, _ in self.falas]
+
+    def ativa(self, t):
+        """Texto da fala que cobre t, ou None"""
+        i = bisect.bisect_right(self._inicios, t) - 1
+        if i >= 0 and t < self.falas[i][1]:
+            return self.falas[i][2]
+        return None
+
+    def aplicar(self, quadro, t):
+        texto = self.ativa(t)
+        if texto is None:
+            return quadro
+
+        x, y, rgb, alfa, _ = self.sprites[texto]
+        altura, largura = alfa.shape[:2]
+        # O quadro pode ser o buffer de uma fonte (ImageClip) ou o fundo preto: nunca alterar no lugar
+        quadro = quadro.copy()
+        regiao = quadro[y:y + altura, x:x + largura].astype(np.uint16)
+        quadro[y:y + altura, x:x + largura] = ((regiao * (255 - alfa) + rgb) // 255).astype(np.uint8)
+        return quadro
+
+    def exportar(self, pasta):
+        """Grava os sprites em PNG: {texto: (x, y, caminho)}"""
+        os.makedirs(pasta, exist_ok=True)
+        caminhos = {}
+        for i, (texto, (x, y, _, _, imagem)) in enumerate(self.sprites.items()):
+            caminho = os.path.join(pasta, f'legenda_{i:04d}.png')
+            imagem.save(caminho)
+            caminhos[texto] = (x, y, caminho)
+        return caminhos
+
+    def _rasterizar(self, texto):
+        largura_quadro, altura_quadro = self.tamanho
+        linhas = self._quebrar(texto, largura_quadro * LARGURA_MAXIMA)
+
+        medidor = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+        espaco = int(self.fonte.size * 0.15)
+        caixas = [medidor.textbbox((0, 0), linha, font=self.fonte, stroke_width=self.contorno) for linha in linhas]
+        largura = max(caixa[2] - caixa[0] for caixa in caixas)
+        altura = sum(caixa[3] - caixa[1] for caixa in caixas) + espaco * (len(linhas) - 1)
+
+        imagem = Image.new('RGBA', (largura, altura), (0, 0, 0, 0))
+        desenho = ImageDraw.Draw(imagem)
+        y = 0
+        for linha, caixa in zip(linhas, caixas):
+            x = (largura - (caixa[2] - caixa[0])) // 2 - caixa[0]
+            desenho.text((x, y - caixa[1]), linha, font=self.fonte, fill=(255, 255, 255, 255),
+                         stroke_width=self.contorno, stroke_fill=(0, 0, 0, 255))
+            y += caixa[3] - caixa[1] + espaco
+
+        pixels = np.asarray(imagem, dtype=np.uint16)
+        alfa = pixels[:, :, 3:4]
+        posicao_x = (largura_quadro - largura) // 2
+        posicao_y = min(max(0, self.base - altura // 2), altura_quadro - altura)
+        return posicao_x, posicao_y, pixels[:, :, :3] * alfa, alfa, imagem
+
+    def _quebrar(self, texto, largura_maxima):
+        linhas = []
+        for palavra in texto.split():
+            tentativa = f'{linhas[-1]} {palavra}' if linhas else palavra
+            if linhas and self.fonte.getlength(tentativa) <= largura_maxima:
+                linhas[-1] = tentativa
+            else:
+                linhas.append(palavra)
+        return linhas
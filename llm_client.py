@@ -0,0 +1,263 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import requests
+
+from tracing import tracer
+from quota import cotas
+
+GEMINI_ENDPOINT = os.environ.get('GEMINI_ENDPOINT', 'https://generativelanguage.googleapis.com')
+GEMINI_MODELO = os.environ.get('GEMINI_MODELO', 'gemini-2.5-flash')
+GEMINI_RPM = float(os.environ.get('GEMINI_RPM', '10'))
+GEMINI_TIMEOUT = float(os.environ.get('GEMINI_TIMEOUT', '90'))
+GEMINI_CACHE_DIR = os.environ.get('GEMINI_CACHE_DIR', os.path.join('.cache', 'gemini'))
+GEMINI_CACHE_DIAS = int(os.environ.get('GEMINI_CACHE_DIAS', '30'))
+MAX_TENTATIVAS = 5
+BACKOFF_INICIAL = 2.0
+
+
+class ErroGemini(Exception):
+    """Falha definitiva ao chamar o Gemini (após as tentativas)"""
+
+
+class TokenBucket:
+    """Limitador de taxa: no máximo `taxa_por_minuto` requisições, com rajada de até `capacidade`"""
+
+    def __init__(self, taxa_por_minuto, capacidade=None):
+        self.taxa = taxa_por_minuto / 60.0
+        self.capacidade = capacidade or max(1.0, taxa_por_minuto)
+        self.tokens = self.capacidade
+        self.atualizado = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consumir(self, quantidade=1):
+        """Bloqueia até haver tokens disponíveis; retorna o tempo esperado"""
+        esperado = 0.0
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado) * self.taxa)
+                self.atualizado = agora
+                if self.tokens >= quantidade:
+                    self.tokens -= quantidade
+                    return esperado
+                espera = (quantidade - self.tokens) / self.taxa
+            time.sleep(espera)
+            esperado += espera
+
+
+class GeminiClient:
+    """Camada única de chamadas ao Gemini (API REST generateContent).
+
+    Cache persistente por hash do prompt (só para chamadas determinísticas, como
+    extrair keywords: título, roteiro e plano precisam de texto novo a cada
+    tentativa e passam usar_cache=False), token bucket para o limite de RPM,
+    backoff exponencial em 429/5xx/timeouts e contadores de latência por
+    tipo de chamada. Aponte GEMINI_ENDPOINT para um servidor local para testar.
+    """
+
+    def __init__(self, api_key=None, modelo=GEMINI_MODELO, endpoint=GEMINI_ENDPOINT,
+                 cache_dir=GEMINI_CACHE_DIR, rpm=GEMINI_RPM):
+        self.api_key = api_key or os.environ.get('GEMINI_API_KEY')
+        self.modelo = modelo
+        self.endpoint = endpoint.rstrip('/')
+        self.cache_dir = cache_dir
+        self.limitador = TokenBucket(rpm)
+        self.session = requests.Session()
+        self.contadores = {}
+        self._lock = threading.Lock()
+
+    def gerar(self, prompt, nome='gemini', usar_cache=True):
+        """Gera texto para o prompt; `nome` identifica a chamada nos contadores.
+
+        Com usar_cache=False o cache não é lido nem gravado.
+        """
+        chave = self._chave(prompt)
+
+        if usar_cache:
+            texto = self._ler_cache(chave)
+            if texto is not None:
+                self._contar(nome, cache=True)
+                return texto
+
+        inicio = time.perf_counter()
+        response, tentativas = self._requisitar(nome, prompt, 'generateContent', inicio)
+
+        try:
+            texto = _texto_da_resposta(response.json())
+        except ErroGemini:
+            self._contar(nome, segundos=time.perf_counter() - inicio, tentativas=tentativas, erro=True)
+            raise
+
+        self._contar(nome, segundos=time.perf_counter() - inicio, tentativas=tentativas,
+                     bytes_=len(response.content))
+        if usar_cache:
+            self._gravar_cache(chave, prompt, texto)
+        return texto
+
+    def gerar_stream(self, prompt, nome='gemini', usar_cache=True):
+        """Como gerar(), mas produz os pedaços de texto à medida que o modelo responde (SSE)"""
+        chave = self._chave(prompt)
+
+        if usar_cache:
+            texto = self._ler_cache(chave)
+            if texto is not None:
+                self._contar(nome, cache=True)
+                yield texto
+                return
+
+        inicio = time.perf_counter()
+        response, tentativas = self._requisitar(nome, prompt, 'streamGenerateContent', inicio, stream=True)
+
+        partes = []
+        recebidos = 0
+        try:
+            for linha in response.iter_lines(decode_unicode=True):
+                recebidos += len(linha.encode('utf-8')) if linha else 0
+                if not linha or not linha.startswith('data:'):
+                    continue
+                pedaco = _texto_da_resposta(json.loads(linha[5:]), obrigatorio=False)
+                if pedaco:
+                    partes.append(pedaco)
+                    yield pedaco
+        except (requests.RequestException, ValueError) as e:
+            self._contar(nome, segundos=time.perf_counter() - inicio, tentativas=tentativas, erro=True)
+            raise ErroGemini(f"{nome}: stream interrompido: {e}")
+        finally:
+            response.close()
+
+        self._contar(nome, segundos=time.perf_counter() - inicio, tentativas=tentativas, bytes_=recebidos)
+        if usar_cache:
+            self._gravar_cache(chave, prompt, ''.join(partes))
+
+    def estatisticas(self):
+        with self._lock:
+            return {nome: dict(c) for nome, c in self.contadores.items()}
+
+    def imprimir_estatisticas(self):
+        for nome, c in self.estatisticas().items():
+            media = c['segundos'] / c['chamadas'] if c['chamadas'] else 0
+            print(f"  🤖 {nome}: {c['chamadas']} chamadas, {c['cache']} do cache, "
+                  f"{c['tentativas_extras']} retries, média {media:.1f}s, máx {c['maximo']:.1f}s")
+
+    def _requisitar(self, nome, prompt, metodo, inicio, stream=False):
+        """Faz a requisição com rate limit e backoff; retorna (response, tentativas)"""
+        url = f"{self.endpoint}/v1beta/models/{self.modelo}:{metodo}"
+        params = {'key': self.api_key}
+        if stream:
+            params['alt'] = 'sse'
+        corpo = {'contents': [{'parts': [{'text': prompt}]}]}
+
+        tentativas = 0
+        espera = BACKOFF_INICIAL
+
+        while True:
+            tentativas += 1
+            self.limitador.consumir()
+
+            try:
+                response = self.session.post(url, params=params, json=corpo, timeout=GEMINI_TIMEOUT, stream=stream)
+                if response.status_code != 429:
+                    cotas.consumir('gemini')
+                elif 'PerDay' in response.text:
+                    # Cota diária acabou: repetir só gasta tempo até a renovação
+                    cotas.esgotar('gemini')
+                    self._contar(nome, segundos=time.perf_counter() - inicio, tentativas=tentativas, erro=True)
+                    raise ErroGemini(f"{nome}: cota diária do Gemini esgotada")
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise _ErroTransitorio(f"HTTP {response.status_code}", _retry_delay(response))
+            except (requests.ConnectionError, requests.Timeout, _ErroTransitorio) as e:
+                retry_after = getattr(e, 'retry_after', None)
+                if tentativas >= MAX_TENTATIVAS:
+                    self._contar(nome, segundos=time.perf_counter() - inicio, tentativas=tentativas, erro=True)
+                    raise ErroGemini(f"{nome}: {e} (após {tentativas} tentativas)")
+
+                atraso = max(espera, retry_after or 0)
+                print(f"⏳ Gemini ({nome}): {e} - nova tentativa em {atraso:.0f}s")
+                time.sleep(atraso)
+                espera *= 2
+                continue
+
+            if response.status_code != 200:
+                self._contar(nome, segundos=time.perf_counter() - inicio, tentativas=tentativas, erro=True)
+                raise ErroGemini(f"{nome}: HTTP {response.status_code}: {response.text[:300]}")
+
+            return response, tentativas
+
+    def _chave(self, prompt):
+        return hashlib.sha256(f"{self.modelo}\n{prompt}".encode('utf-8')).hexdigest()
+
+    def _caminho_cache(self, chave):
+        return os.path.join(self.cache_dir, chave[:2], f"{chave}.json")
+
+    def _ler_cache(self, chave):
+        caminho = self._caminho_cache(chave)
+        try:
+            if time.time() - os.path.getmtime(caminho) > GEMINI_CACHE_DIAS * 86400:
+                return None
+            with open(caminho, 'r', encoding='utf-8') as f:
+                # Entradas vazias gravadas antes de _gravar_cache recusá-las
+                return json.load(f)['texto'] or None
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _gravar_cache(self, chave, prompt, texto):
+        # Resposta vazia (bloqueio, fim prematuro) não pode virar a resposta de todas as próximas chamadas
+        if not texto.strip():
+            return
+        caminho = self._caminho_cache(chave)
+        try:
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            temporario = caminho + '.tmp'
+            with open(temporario, 'w', encoding='utf-8') as f:
+                json.dump({'modelo': self.modelo, 'prompt': prompt[:200], 'texto': texto}, f, ensure_ascii=False)
+            os.replace(temporario, caminho)
+        except OSError as e:
+            print(f"⚠️ Não foi possível gravar cache do Gemini: {e}")
+
+    def _contar(self, nome, segundos=0.0, tentativas=0, cache=False, erro=False, bytes_=0):
+        if not cache:
+            atributos = {'tipo': nome, 'tentativas': tentativas, 'bytes': bytes_}
+            if erro:
+                atributos['erro'] = True
+            tracer.registrar('gemini', 'gemini', segundos, **atributos)
+
+        with self._lock:
+            c = self.contadores.setdefault(nome, {
+                'chamadas': 0, 'cache': 0, 'tentativas_extras': 0, 'erros': 0, 'segundos': 0.0, 'maximo': 0.0
+            })
+            if cache:
+                c['cache'] += 1
+                return
+            c['chamadas'] += 1
+            c['tentativas_extras'] += max(0, tentativas - 1)
+            c['erros'] += 1 if erro else 0
+            c['segundos'] += segundos
+            c['maximo'] = max(c['maximo'], segundos)
+
+
+class _ErroTransitorio(Exception):
+    def __init__(self, mensagem, retry_after=None):
+        super().__init__(mensagem)
+        self.retry_after = retry_after
+
+
+def _texto_da_resposta(dados, obrigatorio=True):
+    try:
+        partes = dados['candidates'][0]['content']['parts']
+    except (KeyError, IndexError):
+        if obrigatorio:
+            raise ErroGemini(f"Resposta sem conteúdo: {json.dumps(dados)[:300]}")
+        return ''
+    return ''.join(parte.get('text', '') for parte in partes)
+
+
+def _retry_delay(response):
+    """Extrai o retryDelay ('37s') que a API devolve em erros de cota, se houver"""
+    if response.headers.get('Retry-After', '').isdigit():
+        return float(response.headers['Retry-After'])
+    match = re.search(r'"retryDelay"\s*:\s*"(\d+(?:\.\d+)?)s"', response.text)
+    return float(match.group(1)) if match else None
@@ -0,0 +1,292 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+
+import requests
+
+from quota import cotas, CotaEsgotada
+from media_planner import normalizar_termos
+
+CATALOGO_FILE = os.environ.get('CATALOGO_FILE', os.path.join('.cache', 'catalogo_midias.sqlite'))
+PEXELS_API_URL = os.environ.get('PEXELS_API_URL', 'https://api.pexels.com')
+CONFIG_FILE = 'config.json'
+ORIENTACOES = ('portrait', 'landscape')
+# Um tema é colhido de novo depois disso; itens sem recolheita por 2x esse prazo saem do catálogo
+VALIDADE_DIAS = int(os.environ.get('CATALOGO_VALIDADE_DIAS', '30'))
+PAGINAS_POR_TEMA = int(os.environ.get('CATALOGO_PAGINAS', '1'))
+POR_PAGINA = 80
+# A colheita divide a cota horária do Pexels com a geração que roda logo depois
+BUSCAS_POR_COLHEITA = int(os.environ.get('CATALOGO_BUSCAS_POR_COLHEITA', '40'))
+# Fração das palavras da busca que precisam aparecer na descrição da mídia
+COBERTURA_MINIMA = 0.5
+LIMITE_RESULTADOS = 30
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS midias (
+    media_id TEXT NOT NULL,
+    orientacao TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    tema TEXT NOT NULL,
+    duracao REAL,
+    largura INTEGER,
+    altura INTEGER,
+    descricao TEXT NOT NULL,
+    arquivos TEXT NOT NULL,
+    colhido INTEGER NOT NULL,
+    UNIQUE (media_id, orientacao)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS midias_fts USING fts5(descricao, content='midias', content_rowid='rowid');
+CREATE TRIGGER IF NOT EXISTS midias_ai AFTER INSERT ON midias BEGIN
+    INSERT INTO midias_fts(rowid, descricao) VALUES (new.rowid, new.descricao);
+END;
+CREATE TRIGGER IF NOT EXISTS midias_ad AFTER DELETE ON midias BEGIN
+    INSERT INTO midias_fts(midias_fts, rowid, descricao) VALUES ('delete', old.rowid, old.descricao);
+END;
+CREATE TABLE IF NOT EXISTS colheitas (
+    tema TEXT NOT NULL,
+    orientacao TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    colhido INTEGER NOT NULL,
+    itens INTEGER NOT NULL,
+    PRIMARY KEY (tema, orientacao, tipo)
+);
+"""
+
+
+class CatalogoMidias:
+    """Metadados de mídias do Pexels colhidos por tema, num SQLite com índice FTS5.
+
+    colher() busca cada tema de config['temas'] (no idioma do tema, com
+    locale=pt-BR) e guarda ID, arquivos disponíveis, duração, dimensões,
+    orientação e a descrição (slug da página, alt e tags, em inglês como as
+    keywords). buscar() responde uma busca por keywords só com o índice local,
+    ordenado por quantas palavras batem e pelo bm25; lista vazia quer dizer
+    que a busca tem que ir à API.
+    """
+
+    def __init__(self, arquivo=CATALOGO_FILE):
+        self.arquivo = arquivo
+        self._conexao = None
+        self._lock = threading.Lock()
+
+    def buscar(self, busca, tipo, orientacao, limite=LIMITE_RESULTADOS):
+        """Itens {'id', 'tipo', 'duracao', 'largura', 'altura', 'arquivos'} mais relevantes para a busca"""
+        termos = normalizar_termos(busca)
+        if not termos:
+            return []
+
+        consulta = ' OR '.join(f'"{termo}"*' for termo in sorted(termos))
+        with self._lock:
+            conexao = self._conectar(criar=False)
+            if conexao is None:
+                return []
+            linhas = conexao.execute("""
+                SELECT m.media_id, m.duracao, m.largura, m.altura, m.descricao, m.arquivos
+                FROM midias_fts JOIN midias m ON m.rowid = midias_fts.rowid
+                WHERE midias_fts MATCH ? AND m.tipo = ? AND m.orientacao = ?
+                ORDER BY bm25(midias_fts) LIMIT ?
+            """, (consulta, tipo, orientacao, limite * 10)).fetchall()
+
+        # O prefixo do FTS também casa 'starfish' com 'star': a cobertura conta só palavras inteiras
+        resultados = []
+        for ordem, (media_id, duracao, largura, altura, descricao, arquivos) in enumerate(linhas):
+            cobertura = len(termos & normalizar_termos(descricao)) / len(termos)
+            if cobertura >= COBERTURA_MINIMA:
+                resultados.append((-cobertura, ordem, {'id': media_id, 'tipo': tipo, 'duracao': duracao,
+                                                       'largura': largura, 'altura': altura,
+                                                       'arquivos': json.loads(arquivos)}))
+        resultados.sort(key=lambda r: r[:2])
+        return [item for _, _, item in resultados[:limite]]
+
+    def colher(self, temas, api_key, orientacoes=ORIENTACOES, forcar=False, max_buscas=BUSCAS_POR_COLHEITA):
+        """Busca no Pexels os temas ainda não colhidos (ou vencidos); retorna quantas buscas fez.
+
+        Para sem erro ao atingir max_buscas ou a cota: o que faltou fica para
+        a próxima colheita, que recomeça pelos temas pendentes.
+        """
+        session = requests.Session()
+        session.headers['Authorization'] = api_key or ''
+        agora = int(time.time())
+        vencimento = agora - VALIDADE_DIAS * 86400
+        buscas = 0
+
+        with self._lock:
+            conexao = self._conectar(criar=True)
+            colhidos = {(tema, orientacao, tipo): colhido for tema, orientacao, tipo, colhido
+                        in conexao.execute('SELECT tema, orientacao, tipo, colhido FROM colheitas')}
+
+        pendentes = [(tema, orientacao, tipo) for tema in temas for orientacao in orientacoes
+                     for tipo in ('video', 'foto')
+                     if forcar or colhidos.get((tema, orientacao, tipo), 0) <= vencimento]
+        # Nunca colhidos primeiro, depois os mais antigos
+        pendentes.sort(key=lambda chave: colhidos.get(chave, 0))
+
+        for i, (tema, orientacao, tipo) in enumerate(pendentes):
+            if buscas + PAGINAS_POR_TEMA > max_buscas:
+                print(f"⏸️ Limite de {max_buscas} buscas por colheita - {len(pendentes) - i} pendentes ficam para a próxima")
+                break
+            try:
+                cotas.garantir('pexels', PAGINAS_POR_TEMA)
+                itens = []
+                for pagina in range(1, PAGINAS_POR_TEMA + 1):
+                    buscas += 1
+                    resultado = _buscar(session, tema, tipo, orientacao, pagina)
+                    itens += resultado
+                    if len(resultado) < POR_PAGINA:
+                        break
+            except CotaEsgotada as e:
+                print(f"🚫 Colheita interrompida: {e}")
+                break
+            except (requests.RequestException, ValueError) as e:
+                print(f"⚠️ Catálogo: busca '{tema}' ({orientacao}/{tipo}) falhou: {e}")
+                continue
+
+            self._gravar(tema, orientacao, tipo, itens, int(time.time()))
+            print(f"📚 {tema} ({orientacao}/{tipo}): {len(itens)} itens")
+
+        with self._lock:
+            conexao.execute('DELETE FROM midias WHERE colhido < ?', (agora - 2 * VALIDADE_DIAS * 86400,))
+            conexao.commit()
+        return buscas
+
+    def status(self):
+        """{(orientacao, tipo): itens} e quantos temas já foram colhidos"""
+        with self._lock:
+            conexao = self._conectar(criar=False)
+            if conexao is None:
+                return {}, 0
+            contagem = {(orientacao, tipo): total for orientacao, tipo, total in conexao.execute(
+                'SELECT orientacao, tipo, COUNT(*) FROM midias GROUP BY orientacao, tipo')}
+            temas = conexao.execute('SELECT COUNT(DISTINCT tema) FROM colheitas').fetchone()[0]
+        return contagem, temas
+
+    def _gravar(self, tema, orientacao, tipo, itens, colhido):
+        with self._lock:
+            conexao = self._conectar(criar=True)
+            with conexao:
+                conexao.execute('DELETE FROM midias WHERE tema = ? AND orientacao = ? AND tipo = ?',
+                                (tema, orientacao, tipo))
+                for item in itens:
+                    # Mídia que já veio de outro tema: fica com a colheita mais recente
+                    conexao.execute('DELETE FROM midias WHERE media_id = ? AND orientacao = ?',
+                                    (item['media_id'], orientacao))
+                    conexao.execute("""
+                        INSERT INTO midias (media_id, orientacao, tipo, tema, duracao, largura, altura,
+                                            descricao, arquivos, colhido)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (item['media_id'], orientacao, tipo, tema, item['duracao'], item['largura'],
+                          item['altura'], item['descricao'], json.dumps(item['arquivos']), colhido))
+                conexao.execute('INSERT OR REPLACE INTO colheitas VALUES (?, ?, ?, ?, ?)',
+                                (tema, orientacao, tipo, colhido, len(itens)))
+
+    def _conectar(self, criar):
+        if self._conexao is None:
+            if not criar and not os.path.exists(self.arquivo):
+                return None
+            os.makedirs(os.path.dirname(self.arquivo) or '.', exist_ok=True)
+            # Uma conexão por processo, usada sob o lock (buscas em threads no roteiro em streaming)
+            self._conexao = sqlite3.connect(self.arquivo, check_same_thread=False)
+            self._conexao.executescript(ESQUEMA)
+        return self._conexao
+
+
+def _descricao(url, *textos):
+    """Texto indexado: palavras do slug da página no Pexels mais alt/tags"""
+    match = re.search(r'/(?:video|photo)/([^/?#]+?)(?:-\d+)?/?$', url or '')
+    slug = match.group(1).replace('-', ' ') if match else ''
+    return ' '.join(filter(None, (slug,) + textos))
+
+
+def _buscar(session, tema, tipo, orientacao, pagina):
+    """Uma página de resultados do tema, já no formato das linhas do catálogo"""
+    if tipo == 'video':
+        url = f'{PEXELS_API_URL}/videos/search'
+    else:
+        url = f'{PEXELS_API_URL}/v1/search'
+    params = {'query': tema, 'per_page': POR_PAGINA, 'page': pagina, 'orientation': orientacao, 'locale': 'pt-BR'}
+
+    response = session.get(url, params=params, timeout=15)
+    cotas.consumir('pexels')
+    if response.status_code == 429:
+        reset = response.headers.get('X-Ratelimit-Reset', '')
+        cotas.esgotar('pexels', int(reset) if reset.isdigit() else None)
+        raise CotaEsgotada('pexels: 429 na colheita')
+    response.raise_for_status()
+    dados = response.json()
+
+    itens = []
+    if tipo == 'video':
+        for video in dados.get('videos', []):
+            arquivos = [{'link': f['link'], 'width': f['width'], 'height': f['height']}
+                        for f in video.get('video_files', []) if f.get('width') and f.get('height')]
+            if arquivos:
+                tags = ' '.join(t if isinstance(t, str) else t.get('name', '') for t in video.get('tags') or [])
+                itens.append({'media_id': f"video:{video['id']}", 'duracao': video.get('duration'),
+                              'largura': video.get('width'), 'altura': video.get('height'),
+                              'descricao': _descricao(video.get('url'), tags), 'arquivos': arquivos})
+    else:
+        for foto in dados.get('photos', []):
+            itens.append({'media_id': f"foto:{foto['id']}", 'duracao': None,
+                          'largura': foto.get('width'), 'altura': foto.get('height'),
+                          'descricao': _descricao(foto.get('url'), foto.get('alt')),
+                          'arquivos': [{'link': foto['src']['large2x'], 'width': foto.get('width'),
+                                        'height': foto.get('height')}]})
+    return itens
+
+
+def _temas(arquivos_config):
+    temas = []
+    for arquivo in arquivos_config:
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            temas += [tema for tema in json.load(f).get('temas', []) if tema not in temas]
+    return temas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Catálogo offline de mídias do Pexels por tema')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('colher', help='Busca e indexa os temas pendentes ou vencidos')
+    p.add_argument('--config', action='append', help=f'config(s) com "temas" (padrão: {CONFIG_FILE})')
+    p.add_argument('--orientacao', choices=ORIENTACOES, action='append', help='padrão: as duas orientações')
+    p.add_argument('--max-buscas', type=int, default=BUSCAS_POR_COLHEITA)
+    p.add_argument('--forcar', action='store_true', help='colhe de novo mesmo os temas em dia')
+
+    p = sub.add_parser('buscar', help='Consulta o catálogo como o pipeline faria')
+    p.add_argument('busca')
+    p.add_argument('--tipo', choices=['video', 'foto'], default='video')
+    p.add_argument('--orientacao', choices=ORIENTACOES, default='portrait')
+
+    sub.add_parser('status', help='Itens por orientação e tipo')
+
+    args = parser.parse_args(argv)
+    catalogo = CatalogoMidias()
+
+    if args.comando == 'colher':
+        temas = _temas(args.config or [CONFIG_FILE])
+        buscas = catalogo.colher(temas, os.environ.get('PEXELS_API_KEY'), args.orientacao or ORIENTACOES,
+                                 args.forcar, args.max_buscas)
+        print(f"✅ Colheita: {buscas} buscas no Pexels para {len(temas)} temas")
+    elif args.comando == 'buscar':
+        inicio = time.perf_counter()
+        itens = catalogo.buscar(args.busca, args.tipo, args.orientacao)
+        print(f"🔎 {len(itens)} itens em {(time.perf_counter() - inicio) * 1000:.1f} ms")
+        for item in itens:
+            duracao = f" {item['duracao']}s" if item['duracao'] else ''
+            print(f"  {item['id']} {item['largura']}x{item['altura']}{duracao}")
+        return
+
+    contagem, temas = catalogo.status()
+    print(f"📚 {temas} temas colhidos")
+    for orientacao in ORIENTACOES:
+        print(f"  {orientacao}: {contagem.get((orientacao, 'video'), 0)} vídeos, "
+              f"{contagem.get((orientacao, 'foto'), 0)} fotos")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,94 @@
+import os
+import re
+import json
+from datetime import date
+
+MIDIAS_USADAS_FILE = 'midias_usadas.json'
+REUSO_APOS_DIAS = int(os.environ.get('REUSO_MIDIA_DIAS', '30'))
+
+# Preenchido durante a busca: URL do arquivo -> ID da mídia no Pexels
+_IDS_POR_URL = {}
+
+
+def id_midia(url, tipo=None):
+    """ID estável de uma mídia do Pexels ('video:123', 'foto:456'); a própria URL se não reconhecer"""
+    if url in _IDS_POR_URL:
+        return _IDS_POR_URL[url]
+
+    match = re.search(r'/video-files/(\d+)/', url)
+    if match:
+        return f'video:{match.group(1)}'
+
+    match = re.search(r'/photos/(\d+)/', url)
+    if match:
+        return f'foto:{match.group(1)}'
+
+    return url
+
+
+def associar_url(url, media_id):
+    _IDS_POR_URL[url] = media_id
+
+
+class IndiceMidiasUsadas:
+    """IDs de mídias já publicadas com o dia do último uso.
+
+    A checagem por candidato é um lookup em dict. Entradas mais antigas que a
+    janela de reuso são descartadas a cada gravação, então o arquivo não cresce
+    além do que foi usado nos últimos REUSO_APOS_DIAS dias.
+    """
+
+    def __init__(self, arquivo=MIDIAS_USADAS_FILE, reuso_apos_dias=REUSO_APOS_DIAS):
+        self.arquivo = arquivo
+        self.reuso_apos_dias = reuso_apos_dias
+        self.usadas = {}
+        # media_id -> execução que a escolheu; liberar() solta as de uma execução quando ela termina
+        self.reservadas = {}
+
+        if os.path.exists(arquivo):
+            try:
+                with open(arquivo, 'r', encoding='utf-8') as f:
+                    self.usadas = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Índice de mídias usadas inválido: {e}")
+
+    def recente(self, media_id):
+        """True se a mídia foi usada dentro da janela de reuso ou já foi escolhida nesta execução"""
+        if media_id in self.reservadas:
+            return True
+        ultimo_uso = self.usadas.get(media_id)
+        return ultimo_uso is not None and date.today().toordinal() - ultimo_uso < self.reuso_apos_dias
+
+    def reservada(self, media_id):
+        return media_id in self.reservadas
+
+    def dias_desde_uso(self, media_id):
+        ultimo_uso = self.usadas.get(media_id)
+        if ultimo_uso is None:
+            return float('inf')
+        return date.today().toordinal() - ultimo_uso
+
+    def reservar(self, media_id, dono=None):
+        """Marca como escolhida pela execução `dono` (não persiste até a publicação)"""
+        self.reservadas[media_id] = dono
+
+    def liberar(self, dono):
+        """Solta as reservas de uma execução que publicou ou falhou; retorna quantas eram"""
+        soltas = [media_id for media_id, quem in list(self.reservadas.items()) if quem == dono]
+        for media_id in soltas:
+            self.reservadas.pop(media_id, None)
+        return len(soltas)
+
+    def registrar(self, media_ids):
+        hoje = date.today().toordinal()
+        for media_id in media_ids:
+            self.usadas[media_id] = hoje
+
+    def salvar(self):
+        limite = date.today().toordinal() - self.reuso_apos_dias
+        self.usadas = {media_id: dia for media_id, dia in self.usadas.items() if dia > limite}
+
+        temporario = self.arquivo + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(self.usadas, f, separators=(',', ':'))
+        os.replace(temporario, self.arquivo)
@@ -0,0 +1,179 @@
+import re
+import random
+import threading
+
+# Fração mínima de termos em comum (Jaccard) para dois segmentos dividirem a mesma busca
+SIMILARIDADE_MINIMA = 0.5
+# Buscas por grupo: a primeira página sorteada e mais páginas só quando o pool esvazia
+PAGINAS_POR_GRUPO = 3
+PAGINA_INICIAL_MAXIMA = 3
+
+
+def normalizar_termos(texto):
+    """Palavras do texto em minúsculas e sem o plural simples ('Stars' e 'star' contam igual)"""
+    termos = set()
+    for palavra in re.findall(r'\w+', texto.lower()):
+        if len(palavra) > 3 and palavra.endswith('s') and not palavra.endswith('ss'):
+            palavra = palavra[:-1]
+        termos.add(palavra)
+    return frozenset(termos)
+
+
+def termos_busca(keywords):
+    """Conjunto normalizado das palavras das 3 primeiras keywords"""
+    return normalizar_termos(' '.join(keywords[:3]))
+
+
+def similaridade(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _Grupo:
+    def __init__(self, termos, busca, tipo):
+        self.termos = termos
+        self.busca = busca
+        self.tipo = tipo
+        self.candidatos = []
+        self.paginas = []
+        self.proxima = 1
+        self.consultou_local = False
+        self.esgotado = False
+        self.segmentos = 0
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        estado = self.__dict__.copy()
+        del estado['lock']
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self.lock = threading.Lock()
+
+
+class PlanejadorMidias:
+    """Buscas no Pexels de uma execução, agrupadas por assunto.
+
+    Segmentos com keywords equivalentes ou sobrepostas ("space, galaxy, stars"
+    e "galaxy, stars, nebula") caem no mesmo grupo: uma busca só, com o
+    resultado inteiro guardado como pool, e cada segmento recebe um item
+    diferente dele. A próxima página só é pedida quando o pool acaba, então
+    as chamadas crescem com o número de assuntos, não de segmentos. Pedidos
+    simultâneos (roteiro em streaming) para o mesmo grupo esperam a busca em
+    andamento em vez de repeti-la. Com `local` (catálogo offline), cada grupo
+    consulta primeiro o catálogo e só vai à API quando ele não tem resultado
+    ou o que tinha acabou.
+    """
+
+    def __init__(self, buscar, escolher, local=None):
+        self.buscar = buscar
+        self.escolher = escolher
+        self.local = local
+        self.grupos = []
+        self.entregues = set()
+        self.buscas = 0
+        self.locais = 0
+        self.pedidos = 0
+        self._lock = threading.Lock()
+
+    def obter(self, keywords, tipo='video', quantidade=1):
+        """Até `quantidade` candidatos ({'id', 'url', 'tipo'}) ainda não entregues nesta execução"""
+        if isinstance(keywords, str):
+            keywords = [keywords]
+
+        with self._lock:
+            self.pedidos += 1
+            grupo = self._grupo(keywords, tipo)
+
+        return self._entregar(grupo, quantidade)
+
+    def substituir(self, url):
+        """Outro candidato do mesmo assunto para uma mídia entregue que não serve (None se acabaram)
+
+        O item recusado continua em `entregues`, então não volta em outro pedido.
+        """
+        with self._lock:
+            grupo = next((g for g in self.grupos if any(c['url'] == url for c in g.candidatos)), None)
+        if grupo is None:
+            return None
+        novas = self._entregar(grupo, 1)
+        return novas[0] if novas else None
+
+    def _entregar(self, grupo, quantidade):
+        escolhidas = []
+        with grupo.lock:
+            while len(escolhidas) < quantidade:
+                with self._lock:
+                    disponiveis = [c for c in grupo.candidatos if c['id'] not in self.entregues]
+                    novas = self.escolher(disponiveis, quantidade - len(escolhidas))
+                    self.entregues.update(c['id'] for c in novas)
+                escolhidas += novas
+                if len(escolhidas) >= quantidade or not self._buscar(grupo):
+                    break
+        return escolhidas
+
+    def _grupo(self, keywords, tipo):
+        termos = termos_busca(keywords)
+        melhor, nota = None, SIMILARIDADE_MINIMA
+        for grupo in self.grupos:
+            if grupo.tipo == tipo and similaridade(grupo.termos, termos) >= nota:
+                melhor, nota = grupo, similaridade(grupo.termos, termos)
+        if melhor is None:
+            melhor = _Grupo(termos, ' '.join(keywords[:3]), tipo)
+            self.grupos.append(melhor)
+        melhor.segmentos += 1
+        return melhor
+
+    def _buscar(self, grupo):
+        """Próxima página do grupo; False quando não há mais o que buscar"""
+        if self.local and not grupo.consultou_local:
+            grupo.consultou_local = True
+            # Já vem ordenado por relevância: sem embaralhar
+            candidatos = self.local(grupo.busca, grupo.tipo)
+            if candidatos:
+                with self._lock:
+                    self.locais += 1
+                self._acrescentar(grupo, candidatos)
+                return True
+
+        if grupo.esgotado or len(grupo.paginas) >= PAGINAS_POR_GRUPO:
+            return False
+
+        primeira = not grupo.paginas
+        pagina = random.randint(1, PAGINA_INICIAL_MAXIMA) if primeira else grupo.proxima
+        candidatos = self._pagina(grupo, pagina)
+
+        # Assunto com poucos resultados: a página sorteada pode estar além do fim
+        if not candidatos and primeira and pagina > 1:
+            pagina = 1
+            candidatos = self._pagina(grupo, pagina)
+
+        if not candidatos:
+            grupo.esgotado = True
+            return False
+        grupo.proxima = pagina + 1
+        random.shuffle(candidatos)
+        self._acrescentar(grupo, candidatos)
+        return True
+
+    def _acrescentar(self, grupo, candidatos):
+        conhecidos = {c['id'] for c in grupo.candidatos}
+        grupo.candidatos += [c for c in candidatos if c['id'] not in conhecidos]
+
+    def _pagina(self, grupo, pagina):
+        grupo.paginas.append(pagina)
+        with self._lock:
+            self.buscas += 1
+        return self.buscar(grupo.busca, grupo.tipo, pagina)
+
+    def __getstate__(self):
+        # Vai junto com a Execucao para o processo de render; locks não atravessam processos
+        estado = self.__dict__.copy()
+        del estado['_lock']
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._lock = threading.Lock()
@@ -0,0 +1,106 @@
+import os
+import sys
+import argparse
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Verificações simultâneas no total e por host (o CDN do Pexels derruba rajadas de um cliente só)
+CONCORRENCIA = int(os.environ.get('PREFLIGHT_CONCORRENCIA', '16'))
+POR_HOST = int(os.environ.get('PREFLIGHT_POR_HOST', '4'))
+TIMEOUT = float(os.environ.get('PREFLIGHT_TIMEOUT', '10'))
+# Acima disso a mídia não é baixada a tempo (vídeos 4K de minutos com o moov no fim descem inteiros)
+TAMANHO_MAXIMO = {
+    'video': int(os.environ.get('PREFLIGHT_MAX_VIDEO_MB', '400')) * 2**20,
+    'foto': int(os.environ.get('PREFLIGHT_MAX_FOTO_MB', '30')) * 2**20,
+}
+TIPOS_ESPERADOS = {'video': 'video/', 'foto': 'image/'}
+# CDNs que não declaram o tipo: deixa passar e o download decide
+TIPOS_GENERICOS = {'', 'application/octet-stream', 'binary/octet-stream'}
+
+
+class VerificadorMidias:
+    """Confere URLs de mídia antes do download, sem baixar o conteúdo.
+
+    Cada URL recebe um HEAD (seguindo redirecionamentos); servidores que não
+    aceitam HEAD ou não dizem o tamanho recebem um GET de um byte só (Range
+    0-0), cujo Content-Range traz o total. A mídia passa se responde 2xx, o
+    Content-Type bate com o tipo (vídeo/imagem) e o tamanho cabe no limite.
+    verificar_todas() roda as verificações em paralelo, com no máximo
+    POR_HOST conexões abertas em cada host.
+    """
+
+    def __init__(self, concorrencia=CONCORRENCIA, por_host=POR_HOST, timeout=TIMEOUT):
+        self.concorrencia = concorrencia
+        self.por_host = por_host
+        self.timeout = timeout
+        self.sessao = requests.Session()
+        # O pool do urllib3 é por host: com o mesmo tamanho do limite, nenhuma conexão é descartada
+        adaptador = HTTPAdapter(pool_connections=concorrencia, pool_maxsize=por_host)
+        self.sessao.mount('http://', adaptador)
+        self.sessao.mount('https://', adaptador)
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def verificar(self, url, tipo):
+        """None se a mídia pode ser usada; senão o motivo"""
+        with self._limite(url):
+            try:
+                return self._verificar(url, tipo)
+            except requests.RequestException as e:
+                return f'sem resposta ({type(e).__name__})'
+
+    def verificar_todas(self, midias):
+        """Motivo (ou None) de cada (url, tipo), na mesma ordem"""
+        if not midias:
+            return []
+        with ThreadPoolExecutor(min(self.concorrencia, len(midias))) as executor:
+            return list(executor.map(lambda midia: self.verificar(*midia), midias))
+
+    def _verificar(self, url, tipo):
+        response = self.sessao.head(url, allow_redirects=True, timeout=self.timeout)
+        tamanho = response.headers.get('Content-Length')
+        if response.status_code in (403, 405, 501) or response.ok and not tamanho:
+            response = self.sessao.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=self.timeout)
+            response.close()
+            faixa = response.headers.get('Content-Range', '')
+            tamanho = faixa.rpartition('/')[2] if response.status_code == 206 else response.headers.get('Content-Length')
+
+        if not response.ok:
+            return f'HTTP {response.status_code}'
+
+        conteudo = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if conteudo not in TIPOS_GENERICOS and not conteudo.startswith(TIPOS_ESPERADOS[tipo]):
+            return f'tipo {conteudo}'
+
+        if tamanho and tamanho.isdigit():
+            if int(tamanho) == 0:
+                return 'arquivo vazio'
+            if int(tamanho) > TAMANHO_MAXIMO[tipo]:
+                return f'{int(tamanho) / 2**20:.0f} MB'
+        return None
+
+    def _limite(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.Semaphore(self.por_host)
+            return self._hosts[host]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Confere URLs de mídia (HEAD) sem baixar')
+    parser.add_argument('urls', nargs='+')
+    parser.add_argument('--tipo', choices=list(TIPOS_ESPERADOS), default='video')
+    args = parser.parse_args(argv)
+
+    motivos = VerificadorMidias().verificar_todas([(url, args.tipo) for url in args.urls])
+    for url, motivo in zip(args.urls, motivos):
+        print(f"{'❌' if motivo else '✅'} {url}{f' - {motivo}' if motivo else ''}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
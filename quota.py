@@ -0,0 +1,360 @@
+import os
+import sys
+import json
+import time
+import fcntl
+import atexit
+import threading
+import argparse
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+COTAS_FILE = os.environ.get('COTAS_FILE', os.path.join('.cache', 'cotas.json'))
+
+# Limites dos planos em uso; ajuste pelas variáveis de ambiente se o plano mudar
+PEXELS_LIMITE_HORA = int(os.environ.get('PEXELS_LIMITE_HORA', '200'))
+GEMINI_RPD = int(os.environ.get('GEMINI_RPD', '250'))
+YOUTUBE_COTA_DIA = int(os.environ.get('YOUTUBE_COTA_DIA', '10000'))
+YOUTUBE_CUSTO_UPLOAD = 1600
+YOUTUBE_CUSTO_THUMBNAIL = 50
+# O consumo é somado em memória e gravado no máximo a cada N segundos (e no fim do processo)
+INTERVALO_GRAVACAO = float(os.environ.get('COTAS_INTERVALO_GRAVACAO', '5'))
+
+_reserva_atual = contextvars.ContextVar('reserva_atual', default=None)
+
+
+def _gravidade(espera):
+    """Ordem das respostas de admitir(): 0 < None (sem previsão) < espera conhecida, a maior pior"""
+    if espera is None:
+        return (1, 0)
+    return (2 if espera else 0, espera)
+
+
+class CotaEsgotada(Exception):
+    """A cota de um provedor não comporta a operação"""
+
+
+def _fuso_pacifico():
+    # As cotas diárias do Google zeram à meia-noite do horário do Pacífico
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo('America/Los_Angeles')
+    except Exception:
+        return timezone(timedelta(hours=-8))
+
+
+class Limite:
+    """Limite de um provedor: janela móvel de `segundos` ou diária (zera à meia-noite do Pacífico)"""
+
+    def __init__(self, limite, segundos=None, diaria=False):
+        self.limite = limite
+        self.segundos = segundos
+        self.diaria = diaria
+
+    def inicio_janela(self, agora):
+        if not self.diaria:
+            return agora - self.segundos
+        local = datetime.fromtimestamp(agora, _fuso_pacifico())
+        return local.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+    def proxima_renovacao(self, agora):
+        local = datetime.fromtimestamp(agora, _fuso_pacifico())
+        amanha = (local + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return amanha.timestamp()
+
+
+LIMITES = {
+    'pexels': Limite(PEXELS_LIMITE_HORA, segundos=3600),
+    'gemini': Limite(GEMINI_RPD, diaria=True),
+    'youtube': Limite(YOUTUBE_COTA_DIA, diaria=True),
+}
+
+
+class Reserva:
+    """Custo estimado de um job ainda não consumido; abatido à medida que o job usa a cota"""
+
+    def __init__(self, custos):
+        self.restante = {provedor: custo for provedor, custo in custos.items() if custo > 0}
+
+    def abater(self, provedor, custo):
+        if provedor in self.restante:
+            self.restante[provedor] = max(0, self.restante[provedor] - custo)
+
+
+class RegistroCotas:
+    """Livro-razão persistente do consumo por provedor, com reservas dos jobs em andamento.
+
+    O consumo fica em baldes de um minuto por provedor em .cache/cotas.json
+    (restaurado entre execuções do workflow); baldes fora da maior janela são
+    descartados a cada gravação. Cota livre = limite - consumo na janela -
+    reservas dos outros jobs.
+
+    Vários processos gravam o mesmo arquivo (agendador, workers de render,
+    outra execução na máquina): cada um guarda o que consumiu desde a última
+    gravação e, sob um lock de arquivo, soma isso ao que está em disco, então
+    nenhum consumo se perde. As gravações são agrupadas a cada
+    INTERVALO_GRAVACAO segundos, e o que faltar é gravado na saída do processo.
+    """
+
+    def __init__(self, arquivo=COTAS_FILE, limites=LIMITES):
+        self.arquivo = arquivo
+        self.limites = limites
+        self.consumo = {provedor: {} for provedor in limites}
+        self.pendente = {provedor: {} for provedor in limites}
+        self.esgotado_ate = {}
+        self.reservas = []
+        self._lock = threading.Lock()
+
+        if os.path.exists(arquivo):
+            try:
+                self.consumo, self.esgotado_ate = self._ler_disco()
+            except (OSError, ValueError, AttributeError) as e:
+                print(f"⚠️ Registro de cotas inválido: {e}")
+        self._gravado_em = time.time()
+        atexit.register(self.gravar)
+
+    def consumir(self, provedor, custo=1):
+        """Registra consumo real (chamado a cada requisição) e abate da reserva do job atual"""
+        agora = time.time()
+        with self._lock:
+            minuto = int(agora // 60)
+            for baldes in (self.consumo.setdefault(provedor, {}), self.pendente.setdefault(provedor, {})):
+                baldes[minuto] = baldes.get(minuto, 0) + custo
+            reserva = _reserva_atual.get()
+            if reserva:
+                reserva.abater(provedor, custo)
+            if agora - self._gravado_em >= INTERVALO_GRAVACAO:
+                self._salvar(agora)
+
+    def gravar(self):
+        """Grava já o consumo pendente (também roda na saída do processo)"""
+        with self._lock:
+            self._salvar(time.time())
+
+    def esgotar(self, provedor, ate=None):
+        """Marca o provedor como sem cota (ex.: 429/quotaExceeded) até `ate` ou a próxima renovação"""
+        agora = time.time()
+        limite = self.limites[provedor]
+        ate = ate or (limite.proxima_renovacao(agora) if limite.diaria else agora + limite.segundos)
+        with self._lock:
+            self.esgotado_ate[provedor] = ate
+            self._salvar(agora)
+        print(f"🚫 Cota de {provedor} esgotada até {datetime.fromtimestamp(ate):%d/%m %H:%M}")
+
+    def admitir(self, custos):
+        """Quanto esperar antes de um job com esses custos poder começar.
+
+        0 = pode começar; N > 0 = segundos até a janela liberar cota suficiente;
+        None = depende de reservas de outros jobs terminarem; inf = nunca cabe.
+        Retorna (espera, provedor que limita).
+        """
+        agora = time.time()
+        pior = (0, None)
+        with self._lock:
+            # Admissão decide pelo consumo de todos os processos, não só o que este já leu
+            self._salvar(agora)
+            # Em ordem de nome: a resposta não depende da ordem em que o chamador montou os custos
+            for provedor, custo in sorted(custos.items()):
+                espera = self._espera(provedor, custo, agora)
+                if espera == float('inf'):
+                    # Nunca cabe: rejeitar vale mais que esperar as reservas de outro provedor
+                    return espera, provedor
+                if _gravidade(espera) > _gravidade(pior[0]):
+                    pior = (espera, provedor)
+        return pior
+
+    def abrir_reserva(self, custos):
+        """Separa os custos estimados de um job até liberar(); o consumo do job vai abatendo dela"""
+        reserva = Reserva(custos)
+        with self._lock:
+            self.reservas.append(reserva)
+        return reserva
+
+    def liberar(self, reserva):
+        with self._lock:
+            if reserva in self.reservas:
+                self.reservas.remove(reserva)
+
+    @contextmanager
+    def reservar(self, custos):
+        """abrir_reserva() ativa no contexto atual; o que sobrar é liberado ao sair"""
+        reserva = self.abrir_reserva(custos)
+        try:
+            with self.usar_reserva(reserva):
+                yield reserva
+        finally:
+            self.liberar(reserva)
+
+    @contextmanager
+    def usar_reserva(self, reserva):
+        """Ativa uma reserva já feita, por exemplo em outra thread (etapas do agendador)"""
+        token = _reserva_atual.set(reserva)
+        try:
+            yield reserva
+        finally:
+            _reserva_atual.reset(token)
+
+    def garantir(self, provedor, custo):
+        """Levanta CotaEsgotada se a operação não cabe (contando a reserva do próprio job)"""
+        agora = time.time()
+        with self._lock:
+            reserva = _reserva_atual.get()
+            disponivel = self._livre(provedor, agora, reserva)
+            if reserva:
+                disponivel += reserva.restante.get(provedor, 0)
+        if disponivel < custo:
+            raise CotaEsgotada(f"{provedor}: {disponivel:.0f} livres, {custo} necessários")
+
+    def resumo(self):
+        agora = time.time()
+        with self._lock:
+            return {provedor: {'usado': self._usado(provedor, agora), 'limite': limite.limite,
+                               'reservado': sum(r.restante.get(provedor, 0) for r in self.reservas)}
+                    for provedor, limite in self.limites.items()}
+
+    def _usado(self, provedor, agora):
+        inicio = self.limites[provedor].inicio_janela(agora)
+        return sum(custo for minuto, custo in self.consumo.get(provedor, {}).items() if (minuto + 1) * 60 > inicio)
+
+    def _livre(self, provedor, agora, propria=None):
+        if self.esgotado_ate.get(provedor, 0) > agora:
+            return 0
+        reservado = sum(r.restante.get(provedor, 0) for r in self.reservas if r is not propria)
+        return self.limites[provedor].limite - self._usado(provedor, agora) - reservado
+
+    def _espera(self, provedor, custo, agora):
+        limite = self.limites[provedor]
+        if custo > limite.limite:
+            return float('inf')
+
+        esgotado = self.esgotado_ate.get(provedor, 0)
+        if esgotado > agora:
+            return esgotado - agora
+
+        falta = custo - self._livre(provedor, agora)
+        if falta <= 0:
+            return 0
+
+        # Reservas só saem quando os outros jobs terminam
+        reservado = sum(r.restante.get(provedor, 0) for r in self.reservas)
+        if self.limites[provedor].limite - self._usado(provedor, agora) >= custo:
+            return None if reservado else 0
+
+        if limite.diaria:
+            return limite.proxima_renovacao(agora) - agora
+
+        # Janela móvel: espera os baldes mais antigos saírem até liberar o que falta
+        liberado = 0
+        inicio = limite.inicio_janela(agora)
+        for minuto, gasto in sorted(self.consumo[provedor].items()):
+            if (minuto + 1) * 60 <= inicio:
+                continue
+            liberado += gasto
+            if liberado >= falta:
+                return (minuto + 1) * 60 + limite.segundos - agora
+        return None
+
+    def _ler_disco(self):
+        with open(self.arquivo, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+        consumo = {provedor: {} for provedor in self.limites}
+        for provedor, baldes in dados.get('consumo', {}).items():
+            consumo[provedor] = {int(minuto): custo for minuto, custo in baldes.items()}
+        return consumo, dict(dados.get('esgotado_ate', {}))
+
+    def _salvar(self, agora):
+        """Soma o consumo pendente ao que está em disco (sob lock de arquivo) e passa a usar o total"""
+        try:
+            os.makedirs(os.path.dirname(self.arquivo) or '.', exist_ok=True)
+            with open(self.arquivo + '.lock', 'a') as trava:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+                try:
+                    consumo, esgotado_ate = self._ler_disco()
+                except (OSError, ValueError, AttributeError):
+                    consumo, esgotado_ate = {provedor: {} for provedor in self.limites}, {}
+
+                for provedor, baldes in self.pendente.items():
+                    total = consumo.setdefault(provedor, {})
+                    for minuto, custo in baldes.items():
+                        total[minuto] = total.get(minuto, 0) + custo
+                for provedor, ate in self.esgotado_ate.items():
+                    esgotado_ate[provedor] = max(esgotado_ate.get(provedor, 0), ate)
+
+                maior_janela = 86400 * 2
+                consumo = {provedor: {m: c for m, c in baldes.items() if m * 60 > agora - maior_janela}
+                           for provedor, baldes in consumo.items()}
+                esgotado_ate = {p: ate for p, ate in esgotado_ate.items() if ate > agora}
+
+                temporario = self.arquivo + '.tmp'
+                with open(temporario, 'w', encoding='utf-8') as f:
+                    json.dump({'consumo': consumo, 'esgotado_ate': esgotado_ate}, f, separators=(',', ':'))
+                os.replace(temporario, self.arquivo)
+        except OSError as e:
+            print(f"⚠️ Não foi possível gravar o registro de cotas: {e}")
+            return
+
+        self.consumo = consumo
+        self.esgotado_ate = esgotado_ate
+        self.pendente = {provedor: {} for provedor in self.limites}
+        self._gravado_em = agora
+
+cotas = RegistroCotas()
+
+
+def verificar_admissao():
+    """Confere que admitir() dá a mesma resposta em qualquer ordem de custos; lista as falhas"""
+    import shutil
+    import tempfile
+
+    pasta = tempfile.mkdtemp(prefix='cotas_')
+    # atexit roda na ordem inversa: o gravar() do registro temporário acontece antes de apagar a pasta
+    atexit.register(shutil.rmtree, pasta, True)
+    registro = RegistroCotas(os.path.join(pasta, 'cotas.json'))
+    registro.abrir_reserva({'pexels': 150})
+    registro.esgotado_ate['youtube'] = time.time() + 600
+
+    casos = [
+        # Pexels esperando reservas de outros jobs não pode esconder um custo de Gemini que nunca cabe
+        ({'pexels': 100, 'gemini': 10**6}, 'gemini', lambda espera: espera == float('inf')),
+        # Espera conhecida (YouTube bloqueado) vale mais que "sem previsão" (reservas do Pexels)
+        ({'pexels': 100, 'youtube': 1600}, 'youtube', lambda espera: espera is not None and 0 < espera <= 600),
+        ({'pexels': 100, 'gemini': 10}, 'pexels', lambda espera: espera is None),
+    ]
+    falhas = []
+    for custos, esperado, valida in casos:
+        for ordem in (custos, dict(reversed(list(custos.items())))):
+            espera, provedor = registro.admitir(ordem)
+            if provedor != esperado or not valida(espera):
+                falhas.append(f'admitir({ordem}) = ({espera}, {provedor}), esperado {esperado}')
+    return falhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Registro de cotas dos provedores')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    sub.add_parser('status', help='Consumo na janela atual de cada provedor')
+    p = sub.add_parser('esgotar', help='Marca um provedor como sem cota até a renovação')
+    p.add_argument('provedor', choices=list(LIMITES))
+    sub.add_parser('verificar', help='Confere a admissão com os custos em qualquer ordem (sai com erro se falhar)')
+    args = parser.parse_args(argv)
+
+    if args.comando == 'verificar':
+        falhas = verificar_admissao()
+        for falha in falhas:
+            print(f"❌ {falha}")
+        print("✅ Admissão independe da ordem dos custos" if not falhas else f"❌ {len(falhas)} falhas")
+        return 1 if falhas else 0
+
+    if args.comando == 'esgotar':
+        cotas.esgotar(args.provedor)
+
+    agora = time.time()
+    for provedor, uso in cotas.resumo().items():
+        bloqueio = cotas.esgotado_ate.get(provedor, 0)
+        aviso = f" (bloqueado até {datetime.fromtimestamp(bloqueio):%d/%m %H:%M})" if bloqueio > agora else ''
+        print(f"📊 {provedor}: {uso['usado']}/{uso['limite']}{aviso}")
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
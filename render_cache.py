@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+CACHE_DIR = os.environ.get('CACHE_SEGMENTOS_DIR', os.path.join('.cache', 'segmentos'))
+# Um long de 10 min a 5 Mbit/s ocupa ~375 MB em partes
+LIMITE = int(os.environ.get('CACHE_SEGMENTOS_MB', '1024')) * 2**20
+EXTENSAO = '.parte'
+
+
+class CacheSegmentos:
+    """Partes de vídeo já codificadas, endereçadas pelo hash do que as produziu.
+
+    A chave junta o conteúdo da mídia (hash do arquivo, já que cada execução
+    baixa para uma pasta própria), a transformação, a duração em quadros e o
+    perfil de saída; qualquer mudança em um deles gera outra chave. Um acerto
+    vira um hard link (ou cópia) no destino e renova o mtime da entrada, que é
+    o critério de remoção: acima de LIMITE, saem as menos usadas recentemente.
+    Gravações vão para um temporário e entram com os.replace, então execuções
+    simultâneas podem dividir o mesmo diretório.
+    """
+
+    def __init__(self, diretorio=CACHE_DIR, limite=LIMITE):
+        self.diretorio = diretorio
+        self.limite = limite
+        self.acertos = 0
+        self.faltas = 0
+        self._digests = {}
+
+    def chave(self, *partes):
+        return hashlib.sha256(json.dumps(partes, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def digest(self, caminho):
+        """Hash do conteúdo do arquivo, lembrado enquanto tamanho e mtime não mudam"""
+        estado = os.stat(caminho)
+        marca = (os.path.abspath(caminho), estado.st_size, estado.st_mtime_ns)
+        if marca not in self._digests:
+            # Em blocos: hashlib.file_digest só existe a partir do Python 3.11 e os workflows usam 3.10
+            digest = hashlib.sha256()
+            with open(caminho, 'rb') as f:
+                for bloco in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(bloco)
+            self._digests[marca] = digest.hexdigest()
+        return self._digests[marca]
+
+    def obter(self, chave, destino):
+        """Coloca a parte em `destino`; False se ela não está no cache"""
+        caminho = self._caminho(chave)
+        try:
+            os.utime(caminho)
+            _ligar(caminho, destino)
+        except OSError:
+            self.faltas += 1
+            return False
+        self.acertos += 1
+        return True
+
+    def guardar(self, chave, origem):
+        caminho = self._caminho(chave)
+        try:
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            descritor, temporario = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(caminho))
+            os.close(descritor)
+            shutil.copyfile(origem, temporario)
+            os.replace(temporario, caminho)
+        except OSError as e:
+            print(f"⚠️ Não foi possível guardar parte no cache: {e}")
+            return
+        self.podar()
+
+    def podar(self):
+        """Remove as entradas menos usadas recentemente até caber no limite; retorna quantas saíram"""
+        entradas = self.entradas()
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        removidas = 0
+        for caminho, tamanho, _ in sorted(entradas, key=lambda entrada: entrada[2]):
+            if total <= self.limite:
+                break
+            try:
+                os.remove(caminho)
+            except OSError:
+                continue
+            total -= tamanho
+            removidas += 1
+        return removidas
+
+    def entradas(self):
+        """(caminho, tamanho, mtime) de cada parte guardada"""
+        entradas = []
+        for raiz, _, arquivos in os.walk(self.diretorio):
+            for arquivo in arquivos:
+                if not arquivo.endswith(EXTENSAO):
+                    continue
+                caminho = os.path.join(raiz, arquivo)
+                try:
+                    estado = os.stat(caminho)
+                except OSError:
+                    continue
+                entradas.append((caminho, estado.st_size, estado.st_mtime))
+        return entradas
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, chave[:2], chave + EXTENSAO)
+
+
+def _ligar(origem, destino):
+    """Hard link quando origem e destino estão no mesmo sistema de arquivos; cópia quando não"""
+    if os.path.exists(destino):
+        os.remove(destino)
+    try:
+        os.link(origem, destino)
+    except OSError:
+        shutil.copyfile(origem, destino)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cache de partes de vídeo codificadas')
+    parser.add_argument('comando', choices=['status', 'podar', 'limpar'])
+    args = parser.parse_args(argv)
+
+    cache = CacheSegmentos()
+    if args.comando == 'podar':
+        print(f"🧹 {cache.podar()} partes removidas")
+    elif args.comando == 'limpar':
+        shutil.rmtree(cache.diretorio, ignore_errors=True)
+        print(f"🧹 {cache.diretorio} apagado")
+
+    entradas = cache.entradas()
+    mais_antiga = min((mtime for _, _, mtime in entradas), default=None)
+    print(f"📦 {len(entradas)} partes, {sum(tamanho for _, tamanho, _ in entradas) / 2**20:.1f} MB "
+          f"de {cache.limite / 2**20:.0f} MB")
+    if mais_antiga:
+        print(f"🕰️ Uso mais antigo: {time.strftime('%Y-%m-%d %H:%M', time.localtime(mais_antiga))}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
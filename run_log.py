@@ -0,0 +1,233 @@
+import os
+import sys
+import json
+import argparse
+
+LOG_FILE = 'videos_gerados.jsonl'
+INDICE_FILE = 'videos_gerados.idx.jsonl'
+LOG_LEGADO = 'videos_gerados.json'
+
+
+class RunLog:
+    """Log de execuções em JSON Lines (append-only) com índice por data/tipo/video_id.
+
+    O índice também é append-only: uma linha por entrada do log com o offset,
+    onde ela termina, dia, tipo e video_id. registrar() acrescenta uma linha a
+    cada arquivo, então o custo de gravação não cresce com o histórico; as
+    tabelas por dia/tipo/vídeo são montadas em memória ao carregar.
+    """
+
+    def __init__(self, log_file=LOG_FILE, indice_file=INDICE_FILE):
+        self.log_file = log_file
+        self.indice_file = indice_file
+
+        if not os.path.exists(self.log_file) and os.path.exists(LOG_LEGADO):
+            migrar(LOG_LEGADO, self.log_file, self.indice_file)
+
+        self.indice = self._carregar_indice()
+
+    def registrar(self, entrada):
+        """Acrescenta uma entrada ao final do log (O(1)) e atualiza o índice"""
+        linha = json.dumps(entrada, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+        with open(self.log_file, 'ab') as f:
+            offset = f.tell()
+            f.write(linha.encode('utf-8'))
+            tamanho = f.tell()
+
+        registro = self._indexar(entrada, offset, tamanho)
+        with open(self.indice_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+        return offset
+
+    def ultimos(self, n=10):
+        """Retorna as últimas N entradas (mais recente primeiro)"""
+        offsets = self.indice['offsets'][-n:] if n > 0 else []
+        return self._ler(reversed(offsets))
+
+    def por_tipo(self, tipo, limite=None):
+        """Retorna as entradas de um tipo (short/long), mais recente primeiro"""
+        offsets = self.indice['tipos'].get(tipo, [])
+        if limite:
+            offsets = offsets[-limite:]
+        return self._ler(reversed(offsets))
+
+    def por_periodo(self, inicio, fim):
+        """Retorna as entradas entre duas datas YYYY-MM-DD (inclusive), em ordem cronológica"""
+        offsets = []
+        for dia in sorted(self.indice['dias']):
+            if inicio <= dia <= fim:
+                offsets.extend(self.indice['dias'][dia])
+        return self._ler(offsets)
+
+    def por_video_id(self, video_id):
+        """Retorna a entrada de um vídeo publicado ou None"""
+        offset = self.indice['video_ids'].get(video_id)
+        if offset is None:
+            return None
+        return self._ler([offset])[0]
+
+    def todos(self):
+        """Itera sobre todas as entradas em ordem cronológica"""
+        if not os.path.exists(self.log_file):
+            return
+        with open(self.log_file, 'r', encoding='utf-8') as f:
+            for linha in f:
+                if linha.strip():
+                    yield json.loads(linha)
+
+    def total(self):
+        return len(self.indice['offsets'])
+
+    def reconstruir_indice(self):
+        """Reconstrói o índice inteiro a partir do log"""
+        self.indice = self._indice_vazio()
+        registros = self._indexar_a_partir_de(0)
+        temporario = self.indice_file + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(registro, ensure_ascii=False, separators=(',', ':')) + '\n'
+                         for registro in registros)
+        os.replace(temporario, self.indice_file)
+
+    def _ler(self, offsets):
+        offsets = list(offsets)
+        if not offsets:
+            return []
+        entradas = []
+        with open(self.log_file, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                entradas.append(json.loads(f.readline().decode('utf-8')))
+        return entradas
+
+    def _indice_vazio(self):
+        return {'tamanho': 0, 'offsets': [], 'dias': {}, 'tipos': {}, 'video_ids': {}}
+
+    def _carregar_indice(self):
+        """Carrega o índice e indexa apenas o que foi acrescentado ao log desde a última gravação"""
+        self.indice = self._indice_vazio()
+        valido = os.path.exists(self.indice_file)
+        if valido:
+            with open(self.indice_file, 'r', encoding='utf-8') as f:
+                for linha in f:
+                    try:
+                        registro = json.loads(linha)
+                        self._registrar_no_indice(registro)
+                    except (ValueError, KeyError) as e:
+                        # Linha cortada por uma gravação interrompida: o resto vem do log
+                        print(f"⚠️ Índice do log inválido, reconstruindo: {e}")
+                        valido = False
+                        break
+
+        tamanho_log = os.path.getsize(self.log_file) if os.path.exists(self.log_file) else 0
+        if not valido and not tamanho_log and not os.path.exists(self.indice_file):
+            return self.indice
+        if not valido or self.indice['tamanho'] > tamanho_log:
+            self.reconstruir_indice()
+        elif self.indice['tamanho'] < tamanho_log:
+            registros = self._indexar_a_partir_de(self.indice['tamanho'])
+            with open(self.indice_file, 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(registro, ensure_ascii=False, separators=(',', ':')) + '\n'
+                             for registro in registros)
+
+        return self.indice
+
+    def _indexar_a_partir_de(self, posicao):
+        registros = []
+        if not os.path.exists(self.log_file):
+            return registros
+        with open(self.log_file, 'rb') as f:
+            f.seek(posicao)
+            while True:
+                offset = f.tell()
+                linha = f.readline()
+                if not linha:
+                    break
+                if linha.strip():
+                    registros.append(self._indexar(json.loads(linha.decode('utf-8')), offset, f.tell()))
+        return registros
+
+    def _indexar(self, entrada, offset, fim):
+        """Indexa uma entrada do log; retorna a linha do arquivo de índice correspondente"""
+        registro = {'offset': offset, 'fim': fim, 'dia': entrada.get('data', '')[:10],
+                    'tipo': entrada.get('tipo', ''), 'video_id': entrada.get('video_id')}
+        self._registrar_no_indice(registro)
+        return registro
+
+    def _registrar_no_indice(self, registro):
+        offset = registro['offset']
+        self.indice['offsets'].append(offset)
+        self.indice['dias'].setdefault(registro['dia'], []).append(offset)
+        self.indice['tipos'].setdefault(registro['tipo'], []).append(offset)
+        if registro['video_id']:
+            self.indice['video_ids'][registro['video_id']] = offset
+        self.indice['tamanho'] = registro['fim']
+
+
+def migrar(legado=LOG_LEGADO, log_file=LOG_FILE, indice_file=INDICE_FILE):
+    """Migração única do videos_gerados.json (lista JSON) para JSON Lines"""
+    with open(legado, 'r', encoding='utf-8') as f:
+        entradas = json.load(f)
+
+    with open(log_file, 'w', encoding='utf-8') as f:
+        for entrada in entradas:
+            f.write(json.dumps(entrada, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+    if os.path.exists(indice_file):
+        os.remove(indice_file)
+
+    print(f"✅ {len(entradas)} entradas migradas de {legado} para {log_file}")
+    return RunLog(log_file, indice_file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Consulta o log de vídeos gerados')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p = sub.add_parser('ultimos', help='Últimas N entradas')
+    p.add_argument('n', type=int, nargs='?', default=10)
+
+    p = sub.add_parser('tipo', help='Entradas de um tipo (short/long)')
+    p.add_argument('tipo')
+    p.add_argument('-n', '--limite', type=int)
+
+    p = sub.add_parser('periodo', help='Entradas entre duas datas (YYYY-MM-DD)')
+    p.add_argument('inicio')
+    p.add_argument('fim')
+
+    p = sub.add_parser('video', help='Entrada de um video_id')
+    p.add_argument('video_id')
+
+    sub.add_parser('migrar', help=f'Migra {LOG_LEGADO} para {LOG_FILE}')
+    sub.add_parser('reindexar', help='Reconstrói o índice a partir do log')
+
+    args = parser.parse_args(argv)
+
+    if args.comando == 'migrar':
+        migrar()
+        return
+
+    run_log = RunLog()
+
+    if args.comando == 'reindexar':
+        run_log.reconstruir_indice()
+        print(f"✅ Índice reconstruído: {run_log.total()} entradas")
+        return
+
+    if args.comando == 'ultimos':
+        entradas = run_log.ultimos(args.n)
+    elif args.comando == 'tipo':
+        entradas = run_log.por_tipo(args.tipo, args.limite)
+    elif args.comando == 'periodo':
+        entradas = run_log.por_periodo(args.inicio, args.fim)
+    else:
+        entrada = run_log.por_video_id(args.video_id)
+        entradas = [entrada] if entrada else []
+
+    for entrada in entradas:
+        print(json.dumps(entrada, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,286 @@
+"""Agendador multi-canal: vários canais num só processo, com pools compartilhados.
+
+Cada canal aponta para um config.json próprio, um tipo de vídeo e horários
+(UTC). Jobs vencidos entram numa fila justa (rodízio entre canais) e passam por
+três etapas: preparar (I/O: Gemini, TTS, busca, download) num pool de threads,
+renderizar num pool de processos do tamanho dos núcleos e publicar de novo no
+pool de I/O. Cliente do Gemini, caches em disco e índices são os mesmos para
+todos os canais; cada job tem a própria Execucao, área de rascunho e trace.
+
+Uso:
+    python scheduler.py canais.json                  # roda continuamente
+    python scheduler.py canais.json --agora          # um job por canal e sai
+    python scheduler.py canais.json --agora fatos-shorts
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import traceback
+import multiprocessing
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import generate_video as g
+from tracing import Tracer, usar_tracer
+from quota import cotas, YOUTUBE_CUSTO_UPLOAD
+from workspace import AreaTrabalho
+
+INTERVALO_VERIFICACAO = 30
+# Jobs que só caberiam na cota depois disso são rejeitados em vez de adiados (segundos)
+COTA_ESPERA_MAX = int(os.environ.get('COTA_ESPERA_MAX_AGENDADOR', str(12 * 3600)))
+
+
+class Job:
+    def __init__(self, id_, canal, execucao):
+        self.id = id_
+        self.canal = canal['nome']
+        self.execucao = execucao
+        self.tracer = None
+        self.criado = time.time()
+        self.espera_fila = 0.0
+        self.conteudo = None
+        self.nao_antes = 0.0
+        self.reserva = None
+
+
+class FilaJusta:
+    """Uma fila por canal, atendidas em rodízio; canais cujo próximo job não pode iniciar são pulados"""
+
+    def __init__(self):
+        self.filas = {}
+        self.ordem = deque()
+
+    def colocar(self, job):
+        if job.canal not in self.filas:
+            self.filas[job.canal] = deque()
+            self.ordem.append(job.canal)
+        self.filas[job.canal].append(job)
+
+    def proximo(self, pode_iniciar):
+        for _ in range(len(self.ordem)):
+            canal = self.ordem[0]
+            self.ordem.rotate(-1)
+            if self.filas[canal] and pode_iniciar(self.filas[canal][0]):
+                return self.filas[canal].popleft()
+        return None
+
+    def devolver(self, job):
+        """Recoloca um job adiado na frente da fila do canal"""
+        self.filas[job.canal].appendleft(job)
+
+    def __len__(self):
+        return sum(len(fila) for fila in self.filas.values())
+
+
+class Agendador:
+    def __init__(self, canais, workers_io=4, workers_cpu=None):
+        self.canais = {canal['nome']: canal for canal in canais}
+        self.workers_io = workers_io
+        self.workers_cpu = workers_cpu or os.cpu_count() or 1
+        self.io = ThreadPoolExecutor(self.workers_io, thread_name_prefix='io')
+        # spawn: o processo principal tem threads (pools, token bucket) e fork não é seguro
+        self.cpu = ProcessPoolExecutor(self.workers_cpu, mp_context=multiprocessing.get_context('spawn'))
+
+        self.fila = FilaJusta()
+        self.ativos = {}
+        self.concluidos = []
+        self.falhas = []
+        self.ultima_verificacao = datetime.now(timezone.utc)
+        self._configs = {}
+        self._proximo_id = 1
+        self._lock = threading.Lock()
+        self._mudou = threading.Condition(self._lock)
+
+    def enfileirar(self, nome_canal):
+        canal = self.canais[nome_canal]
+        with self._lock:
+            job = Job(self._proximo_id, canal, self._execucao(canal, self._proximo_id))
+            self._proximo_id += 1
+            self.fila.colocar(job)
+            print(f"🗓️ Job {job.id} ({job.canal}) na fila - {len(self.fila)} aguardando")
+        self._despachar()
+        return job
+
+    def agendar_vencidos(self, agora=None):
+        """Enfileira um job para cada horário de canal que passou desde a última verificação"""
+        agora = agora or datetime.now(timezone.utc)
+        inicio, self.ultima_verificacao = self.ultima_verificacao, agora
+
+        for nome, canal in self.canais.items():
+            for horario in canal.get('horarios', []):
+                hora, minuto = map(int, horario.split(':'))
+                dia = inicio.date()
+                while dia <= agora.date():
+                    momento = datetime(dia.year, dia.month, dia.day, hora, minuto, tzinfo=timezone.utc)
+                    if inicio < momento <= agora:
+                        self.enfileirar(nome)
+                    dia += timedelta(days=1)
+
+    def executar(self, continuo=True):
+        """Laço principal; sem `continuo`, retorna quando fila e jobs em andamento acabam"""
+        try:
+            while True:
+                if continuo:
+                    self.agendar_vencidos()
+                # Jobs adiados por cota voltam a ser avaliados a cada volta
+                self._despachar()
+                with self._lock:
+                    if not continuo and not self.ativos and not len(self.fila):
+                        break
+                    self._mudou.wait(INTERVALO_VERIFICACAO)
+        finally:
+            self.io.shutdown(wait=True)
+            self.cpu.shutdown(wait=True)
+
+        print(f"🏁 {len(self.concluidos)} jobs publicados, {len(self.falhas)} falharam")
+        return not self.falhas
+
+    def _execucao(self, canal, job_id):
+        caminho = canal.get('config', g.CONFIG_FILE)
+        if caminho not in self._configs:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                self._configs[caminho] = json.load(f)
+
+        return g.Execucao(
+            tipo=canal.get('tipo', 'short'),
+            config=self._configs[caminho],
+            videos_dir=g.VIDEOS_DIR,
+            usar_curacao=canal.get('curadoria', False) and g.CURACAO_DISPONIVEL,
+            credenciais=os.environ.get(canal.get('credenciais_env', 'YOUTUBE_CREDENTIALS')),
+            canal=canal['nome'],
+        )
+
+    def _pode_iniciar(self, job):
+        if job.nao_antes > time.time():
+            return False
+        limite = self.canais[job.canal].get('max_simultaneos', 1)
+        return sum(1 for ativo in self.ativos.values() if ativo.canal == job.canal) < limite
+
+    def _admitir(self, job):
+        """Reserva a cota estimada do job; se não couber, adia (True) ou rejeita (False)"""
+        custos = g.estimar_custos(job.execucao)
+        espera, provedor = cotas.admitir(custos)
+        if espera == 0:
+            job.reserva = cotas.abrir_reserva(custos)
+            return True
+
+        if espera is not None and espera > COTA_ESPERA_MAX:
+            print(f"🚫 Job {job.id} ({job.canal}) rejeitado: cota de {provedor} não comporta {custos[provedor]}")
+            self.falhas.append(job.id)
+            self._mudou.notify_all()
+            return False
+
+        # Sem previsão (reservas de outros jobs): tenta de novo na próxima verificação
+        job.nao_antes = time.time() + (espera or INTERVALO_VERIFICACAO)
+        print(f"⏳ Job {job.id} ({job.canal}) adiado {job.nao_antes - time.time():.0f}s pela cota de {provedor}")
+        self.fila.devolver(job)
+        return False
+
+    def _despachar(self):
+        # Admite no máximo um job por worker; o resto espera na fila justa
+        with self._lock:
+            while len(self.ativos) < self.workers_io + self.workers_cpu:
+                job = self.fila.proximo(self._pode_iniciar)
+                if not job:
+                    break
+                if not self._admitir(job):
+                    continue
+                self.ativos[job.id] = job
+                # A área de rascunho só é criada quando o job começa, não enquanto espera na fila
+                job.execucao.usar_area(AreaTrabalho(f"{job.canal}_{job.id}"))
+                job.tracer = Tracer(nome=f"{job.canal}_{job.id}")
+                job.espera_fila = time.time() - job.criado
+                print(f"▶️ Job {job.id} ({job.canal}) iniciado após {job.espera_fila:.0f}s na fila")
+                self.io.submit(self._preparar, job)
+
+    def _preparar(self, job):
+        try:
+            with g.usar_execucao(job.execucao), usar_tracer(job.tracer), cotas.usar_reserva(job.reserva):
+                with job.tracer.span('job_preparar'):
+                    job.conteudo = g.preparar_conteudo()
+                # Não ocupa um processo de render com um vídeo que não poderia ser enviado
+                cotas.garantir('youtube', YOUTUBE_CUSTO_UPLOAD)
+            futuro = self.cpu.submit(g.renderizar_em_worker, job.execucao, job.conteudo)
+        except Exception as e:
+            self._finalizar(job, e)
+            return
+
+        inicio_render = time.perf_counter()
+        futuro.add_done_callback(lambda f: self.io.submit(self._publicar, job, f, inicio_render))
+
+    def _publicar(self, job, futuro, inicio_render):
+        try:
+            with g.usar_execucao(job.execucao), usar_tracer(job.tracer), cotas.usar_reserva(job.reserva):
+                job.tracer.registrar('job_render', 'etapa', time.perf_counter() - inicio_render)
+                video_path, spans = futuro.result()
+                job.tracer.importar(spans)
+                if not video_path:
+                    raise RuntimeError('render não produziu vídeo')
+                with job.tracer.span('job_publicar'):
+                    g.publicar(job.conteudo, video_path)
+        except Exception as e:
+            self._finalizar(job, e)
+            return
+
+        self._finalizar(job)
+
+    def _finalizar(self, job, erro=None):
+        if erro:
+            print(f"❌ Job {job.id} ({job.canal}) falhou: {erro}")
+            traceback.print_exception(type(erro), erro, erro.__traceback__)
+
+        try:
+            job.tracer.salvar(metadados={'canal': job.canal, 'tipo': job.execucao.tipo, 'job': job.id,
+                                         'espera_fila': round(job.espera_fila, 1),
+                                         'erro': str(erro) if erro else None})
+        except OSError as e:
+            print(f"⚠️ Não foi possível gravar o trace do job {job.id}: {e}")
+        if job.execucao.area:
+            job.execucao.area.limpar()
+        cotas.liberar(job.reserva)
+        g.midias_usadas.liberar(job.execucao.id)
+
+        with self._lock:
+            del self.ativos[job.id]
+            (self.falhas if erro else self.concluidos).append(job.id)
+            self._mudou.notify_all()
+        self._despachar()
+
+
+def carregar_canais(caminho):
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Agendador multi-canal de vídeos')
+    parser.add_argument('canais', nargs='?', default='canais.json', help='arquivo com canais e horários')
+    parser.add_argument('--agora', nargs='*', metavar='CANAL',
+                        help='enfileira um job por canal (ou só os listados) e sai quando terminar')
+    parser.add_argument('--workers-io', type=int, help='threads de busca/download/TTS/upload')
+    parser.add_argument('--workers-cpu', type=int, help='processos de render (padrão: núcleos)')
+    args = parser.parse_args(argv)
+
+    definicao = carregar_canais(args.canais)
+    agendador = Agendador(
+        definicao['canais'],
+        workers_io=args.workers_io or definicao.get('workers_io', 4),
+        workers_cpu=args.workers_cpu or definicao.get('workers_cpu'),
+    )
+    print(f"🗓️ {len(agendador.canais)} canais, {agendador.workers_io} workers de I/O, "
+          f"{agendador.workers_cpu} de render")
+
+    if args.agora is not None:
+        for nome in args.agora or list(agendador.canais):
+            agendador.enfileirar(nome)
+        return agendador.executar(continuo=False)
+
+    return agendador.executar(continuo=True)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main(sys.argv[1:]) else 1)
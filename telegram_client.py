@@ -0,0 +1,141 @@
+import os
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+
+# Limites da Bot API: ~1 mensagem/s por chat e ~30 mensagens/s no total
+INTERVALO_POR_CHAT = float(os.environ.get('TELEGRAM_INTERVALO_CHAT', '1.0'))
+LIMITE_GLOBAL_POR_SEGUNDO = int(os.environ.get('TELEGRAM_LIMITE_GLOBAL', '30'))
+MAX_TENTATIVAS = 4
+BACKOFF_INICIAL = 1.0
+
+
+class TelegramClient:
+    """Cliente da Bot API com sessão keep-alive e fila de envio com rate limit"""
+
+    def __init__(self, bot_token):
+        self.base_url = f"{TELEGRAM_API_URL}/bot{bot_token}"
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._fila = queue.Queue()
+        self._ultimo_envio_chat = {}
+        self._envios_recentes = deque()
+        self._pausa_ate = 0.0
+
+        # answerCallbackQuery e afins não passam pela fila (não contam no limite do chat)
+        self._disparos = ThreadPoolExecutor(max_workers=2, thread_name_prefix='telegram-disparo')
+
+        self._worker = threading.Thread(target=self._processar_fila, name='telegram-fila', daemon=True)
+        self._worker.start()
+
+    def chamar(self, metodo, dados=None, timeout=15):
+        """Chama um método da API com retry em 429 (retry_after), 5xx e falhas de rede"""
+        url = f"{self.base_url}/{metodo}"
+        espera = BACKOFF_INICIAL
+
+        for tentativa in range(1, MAX_TENTATIVAS + 1):
+            self._respeitar_pausa()
+
+            try:
+                response = self.session.post(url, json=dados or {}, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if tentativa == MAX_TENTATIVAS:
+                    print(f"❌ Telegram {metodo}: {e}")
+                    return None
+                print(f"⚠️ Telegram {metodo}: {e} - nova tentativa em {espera:.0f}s")
+                time.sleep(espera)
+                espera *= 2
+                continue
+
+            try:
+                result = response.json()
+            except ValueError:
+                result = {'ok': False, 'description': response.text[:200]}
+
+            if result.get('ok'):
+                return result
+
+            if response.status_code == 429:
+                retry_after = result.get('parameters', {}).get('retry_after', espera)
+                print(f"⏳ Telegram pediu para aguardar {retry_after}s ({metodo})")
+                self._pausa_ate = max(self._pausa_ate, time.time() + float(retry_after))
+                continue
+
+            if response.status_code >= 500 and tentativa < MAX_TENTATIVAS:
+                print(f"⚠️ Telegram {metodo}: HTTP {response.status_code} - nova tentativa em {espera:.0f}s")
+                time.sleep(espera)
+                espera *= 2
+                continue
+
+            print(f"⚠️ Erro Telegram {metodo}: {result}")
+            return None
+
+        return None
+
+    def enfileirar(self, metodo, dados):
+        """Coloca um envio na fila e retorna um Future com o resultado"""
+        futuro = Future()
+        self._fila.put((metodo, dados, futuro))
+        return futuro
+
+    def enviar(self, metodo, dados):
+        """Envia pela fila respeitando a ordem e os limites, aguardando o resultado"""
+        return self.enfileirar(metodo, dados).result()
+
+    def disparar(self, metodo, dados):
+        """Chama um método sem bloquear quem chamou"""
+        return self._disparos.submit(self.chamar, metodo, dados, 5)
+
+    def aguardar_fila(self):
+        """Bloqueia até que todos os envios pendentes tenham sido feitos"""
+        self._fila.join()
+
+    def _processar_fila(self):
+        """Worker único: mantém a ordem das mensagens e aplica os limites de taxa"""
+        while True:
+            metodo, dados, futuro = self._fila.get()
+            try:
+                chat_id = dados.get('chat_id')
+                self._aguardar_vez(chat_id)
+                resultado = self.chamar(metodo, dados)
+                futuro.set_result(resultado)
+            except Exception as e:
+                print(f"❌ Erro na fila do Telegram: {e}")
+                futuro.set_result(None)
+            finally:
+                self._fila.task_done()
+
+    def _aguardar_vez(self, chat_id):
+        """Espera o intervalo mínimo por chat e a janela global de 1s"""
+        agora = time.time()
+
+        if chat_id is not None:
+            proximo = self._ultimo_envio_chat.get(chat_id, 0) + INTERVALO_POR_CHAT
+            if proximo > agora:
+                time.sleep(proximo - agora)
+
+        while self._envios_recentes and time.time() - self._envios_recentes[0] >= 1:
+            self._envios_recentes.popleft()
+        if len(self._envios_recentes) >= LIMITE_GLOBAL_POR_SEGUNDO:
+            time.sleep(max(0, 1 - (time.time() - self._envios_recentes[0])))
+
+        agora = time.time()
+        self._envios_recentes.append(agora)
+        if chat_id is not None:
+            self._ultimo_envio_chat[chat_id] = agora
+
+    def _respeitar_pausa(self):
+        """Aguarda o retry_after informado pelo Telegram, se houver"""
+        restante = self._pausa_ate - time.time()
+        if restante > 0:
+            time.sleep(restante)
@@ -3,35 +3,59 @@ import json
 import requests
 import time
 import sys
+import fcntl
+from contextlib import contextmanager
 from datetime import datetime
+from telegram_client import TelegramClient
+from quota import cotas
 
 TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHAT_ID = os.environ.get('TELEGRAM_CHAT_ID')
 CURACAO_FILE = 'curacao_pendente.json'
+# Trava compartilhada por todas as execuções: o bot é um só e dois getUpdates simultâneos se atrapalham (409)
+CURACAO_LOCK = os.environ.get('CURACAO_LOCK', os.path.join('.cache', 'curacao.lock'))
+# Espera entre getUpdates que falham (o long polling só segura o laço quando a chamada dá certo)
+ESPERA_ERRO_INICIAL = 3
+ESPERA_ERRO_MAXIMA = 60
+
+@contextmanager
+def curadoria_exclusiva(arquivo=CURACAO_LOCK):
+    """Uma curadoria por vez entre execuções e processos; as outras esperam a vez"""
+    os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+    with open(arquivo, 'a') as trava:
+        try:
+            fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("⏳ Outra curadoria em andamento - aguardando a vez...")
+            fcntl.flock(trava, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(trava, fcntl.LOCK_UN)
 
 class TelegramCurator:
-    def __init__(self):
+    def __init__(self, arquivo=CURACAO_FILE, execucao_id=None):
+        # Cada execução tem o próprio arquivo de curadoria (na área de rascunho dela)
+        self.arquivo = arquivo
+        # Vai no callback_data dos botões: cliques em mensagens de outra execução são ignorados
+        self.execucao_id = execucao_id or ''
         self.bot_token = TELEGRAM_BOT_TOKEN
         self.chat_id = TELEGRAM_CHAT_ID
-        self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
-        self.update_id_offset = self._obter_ultimo_update_id()
+        self.cliente = TelegramClient(self.bot_token)
+        # Só quem faz polling precisa do offset; o getUpdates com offset negativo descarta updates pendentes
+        self.update_id_offset = None
+        self.espera_erro = 0
         
     def _obter_ultimo_update_id(self):
         """Obtém o último update_id para não processar mensagens antigas"""
-        try:
-            url = f"{self.base_url}/getUpdates"
-            response = requests.get(url, params={'offset': -1}, timeout=5)
-            result = response.json()
-            
-            if result.get('ok') and result.get('result'):
-                return result['result'][0]['update_id'] + 1
-            return 0
-        except:
-            return 0
+        result = self.cliente.chamar('getUpdates', {'offset': -1}, timeout=5)
+        
+        if result and result.get('result'):
+            return result['result'][0]['update_id'] + 1
+        return 0
         
     def enviar_mensagem(self, texto, reply_markup=None):
         """Envia mensagem de texto"""
-        url = f"{self.base_url}/sendMessage"
         data = {
             'chat_id': self.chat_id,
             'text': texto,
@@ -41,21 +65,10 @@ class TelegramCurator:
         if reply_markup:
             data['reply_markup'] = json.dumps(reply_markup)
         
-        try:
-            response = requests.post(url, json=data, timeout=10)
-            result = response.json()
-            if result.get('ok'):
-                return result
-            else:
-                print(f"⚠️ Erro ao enviar mensagem: {result}")
-                return None
-        except Exception as e:
-            print(f"❌ Erro ao enviar mensagem: {e}")
-            return None
+        return self.cliente.enviar('sendMessage', data)
     
     def enviar_foto(self, foto_url, caption, reply_markup=None):
         """Envia foto com legenda"""
-        url = f"{self.base_url}/sendPhoto"
         data = {
             'chat_id': self.chat_id,
             'photo': foto_url,
@@ -66,21 +79,10 @@ class TelegramCurator:
         if reply_markup:
             data['reply_markup'] = json.dumps(reply_markup)
         
-        try:
-            response = requests.post(url, json=data, timeout=15)
-            result = response.json()
-            if result.get('ok'):
-                return result
-            else:
-                print(f"⚠️ Erro ao enviar foto: {result}")
-                return None
-        except Exception as e:
-            print(f"❌ Erro ao enviar foto: {e}")
-            return None
+        return self.cliente.enviar('sendPhoto', data)
     
     def enviar_video(self, video_url, caption, reply_markup=None):
         """Envia vídeo com legenda"""
-        url = f"{self.base_url}/sendVideo"
         data = {
             'chat_id': self.chat_id,
             'video': video_url,
@@ -91,21 +93,12 @@ class TelegramCurator:
         if reply_markup:
             data['reply_markup'] = json.dumps(reply_markup)
         
-        try:
-            response = requests.post(url, json=data, timeout=15)
-            result = response.json()
-            if result.get('ok'):
-                return result
-            else:
-                print(f"⚠️ Erro ao enviar vídeo: {result}")
-                return None
-        except Exception as e:
-            print(f"❌ Erro ao enviar vídeo: {e}")
-            return None
+        return self.cliente.enviar('sendVideo', data)
     
     def solicitar_curacao(self, segmentos_com_midias):
         """Inicia curadoria interativa segmento por segmento"""
         print("📱 Iniciando curadoria interativa no Telegram...")
+        self.update_id_offset = self._obter_ultimo_update_id()
         
         # Salvar dados da curadoria
         curacao_data = {
@@ -118,7 +111,7 @@ class TelegramCurator:
             'ultimo_envio': None
         }
         
-        with open(CURACAO_FILE, 'w', encoding='utf-8') as f:
+        with open(self.arquivo, 'w', encoding='utf-8') as f:
             json.dump(curacao_data, f, indent=2, ensure_ascii=False)
         
         # Enviar cabeçalho
@@ -134,8 +127,6 @@ class TelegramCurator:
             f"• <b>/retomar</b> - Se bot travou, força próximo segmento"
         )
         
-        time.sleep(2)
-        
         # Enviar primeiro segmento
         self._enviar_proximo_segmento()
         
@@ -143,11 +134,11 @@ class TelegramCurator:
     
     def _enviar_proximo_segmento(self):
         """Envia o próximo segmento para aprovação"""
-        if not os.path.exists(CURACAO_FILE):
+        if not os.path.exists(self.arquivo):
             print("❌ Arquivo de curadoria não existe")
             return False
         
-        with open(CURACAO_FILE, 'r', encoding='utf-8') as f:
+        with open(self.arquivo, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
         segmento_atual = data['segmento_atual']
@@ -182,11 +173,11 @@ class TelegramCurator:
         keyboard = {
             'inline_keyboard': [
                 [
-                    {'text': '✅ Aprovar', 'callback_data': f'aprovar_{num}'},
-                    {'text': '❌ Buscar outra', 'callback_data': f'buscar_{num}'}
+                    {'text': '✅ Aprovar', 'callback_data': f'aprovar_{num}_{self.execucao_id}'},
+                    {'text': '❌ Buscar outra', 'callback_data': f'buscar_{num}_{self.execucao_id}'}
                 ],
                 [
-                    {'text': '🔗 Enviar minha URL', 'callback_data': f'url_{num}'}
+                    {'text': '🔗 Enviar minha URL', 'callback_data': f'url_{num}_{self.execucao_id}'}
                 ]
             ]
         }
@@ -203,7 +194,7 @@ class TelegramCurator:
         if resultado:
             # Registrar timestamp do envio
             data['ultimo_envio'] = datetime.now().isoformat()
-            with open(CURACAO_FILE, 'w', encoding='utf-8') as f:
+            with open(self.arquivo, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=2, ensure_ascii=False)
             
             print(f"✅ Segmento {num}/{total} enviado com sucesso")
@@ -214,15 +205,15 @@ class TelegramCurator:
     
     def _finalizar_curacao(self):
         """Finaliza a curadoria"""
-        if not os.path.exists(CURACAO_FILE):
+        if not os.path.exists(self.arquivo):
             return
             
-        with open(CURACAO_FILE, 'r', encoding='utf-8') as f:
+        with open(self.arquivo, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
         data['status'] = 'aprovado'
         
-        with open(CURACAO_FILE, 'w', encoding='utf-8') as f:
+        with open(self.arquivo, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
         
         self.enviar_mensagem(
@@ -252,11 +243,11 @@ class TelegramCurator:
                 print(f"⏰ Timeout atingido após {tempo_decorrido/60:.1f} minutos")
                 print("⚠️ Cancelando curadoria automaticamente...")
                 
-                if os.path.exists(CURACAO_FILE):
-                    with open(CURACAO_FILE, 'r', encoding='utf-8') as f:
+                if os.path.exists(self.arquivo):
+                    with open(self.arquivo, 'r', encoding='utf-8') as f:
                         data = json.load(f)
                     data['status'] = 'timeout'
-                    with open(CURACAO_FILE, 'w', encoding='utf-8') as f:
+                    with open(self.arquivo, 'w', encoding='utf-8') as f:
                         json.dump(data, f, indent=2, ensure_ascii=False)
                 
                 self.enviar_mensagem(
@@ -276,8 +267,8 @@ class TelegramCurator:
                 ultima_verificacao = tempo_decorrido
             
             # Verificar se bot travou
-            if os.path.exists(CURACAO_FILE):
-                with open(CURACAO_FILE, 'r', encoding='utf-8') as f:
+            if os.path.exists(self.arquivo):
+                with open(self.arquivo, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                 
                 if data.get('ultimo_envio'):
@@ -302,8 +293,8 @@ class TelegramCurator:
                         print(f"⚠️ Possível travamento detectado - {minutos_travado}min sem resposta")
             
             # Verificar status
-            if os.path.exists(CURACAO_FILE):
-                with open(CURACAO_FILE, 'r', encoding='utf-8') as f:
+            if os.path.exists(self.arquivo):
+                with open(self.arquivo, 'r', encoding='utf-8') as f:
                     data = json.load(f)
                 
                 if data['status'] == 'aprovado':
@@ -322,26 +313,25 @@ class TelegramCurator:
                     
                     sys.exit(1)
             
-            # Processar atualizações do Telegram
+            # Processar atualizações do Telegram (long polling de até 3s)
             self._processar_atualizacoes()
-            
-            time.sleep(3)
     
     def _processar_atualizacoes(self):
         """Processa mensagens e callbacks do Telegram"""
-        url = f"{self.base_url}/getUpdates"
         params = {
             'offset': self.update_id_offset,
-            'timeout': 1
+            'timeout': 3
         }
         
         try:
-            response = requests.get(url, params=params, timeout=5)
-            result = response.json()
+            result = self.cliente.chamar('getUpdates', params, timeout=10)
             
-            if not result.get('ok'):
+            if not result:
+                # 409 (outro poller), 401, 400...: chamar() volta na hora, sem o long polling segurar o laço
+                self._aguardar_apos_erro()
                 return
             
+            self.espera_erro = 0
             updates = result.get('result', [])
             
             for update in updates:
@@ -354,13 +344,19 @@ class TelegramCurator:
                     self._processar_callback(update['callback_query'])
         
         except Exception as e:
-            pass
+            print(f"❌ Erro ao processar atualizações do Telegram: {e}")
+            self._aguardar_apos_erro()
+    
+    def _aguardar_apos_erro(self):
+        """Backoff exponencial entre getUpdates que falham, até ESPERA_ERRO_MAXIMA"""
+        self.espera_erro = min(max(self.espera_erro * 2, ESPERA_ERRO_INICIAL), ESPERA_ERRO_MAXIMA)
+        time.sleep(self.espera_erro)
     
     def _processar_mensagem(self, message):
         """Processa mensagens de texto"""
         text = message.get('text', '')
         
-        if not os.path.exists(CURACAO_FILE):
+        if not os.path.exists(self.arquivo):
             if text == '/start':
                 self.enviar_mensagem(
                     "👋 <b>Olá! Sou o Curador de Vídeos</b>\n\n"
@@ -370,7 +366,7 @@ class TelegramCurator:
                 )
             return
         
-        with open(CURACAO_FILE, 'r', encoding='utf-8') as f:
+        with open(self.arquivo, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
         print(f"📩 Comando recebido: {text}")
@@ -379,7 +375,7 @@ class TelegramCurator:
             print("🛑 COMANDO /CANCELAR RECEBIDO - CANCELANDO TUDO")
             
             data['status'] = 'cancelado'
-            with open(CURACAO_FILE, 'w', encoding='utf-8') as f:
+            with open(self.arquivo, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=2, ensure_ascii=False)
             
             self.enviar_mensagem(
@@ -416,7 +412,7 @@ class TelegramCurator:
         elif text == '/pular':
             print("⏭️ Usuário pulou - aprovando todos restantes")
             data['status'] = 'aprovado'
-            with open(CURACAO_FILE, 'w', encoding='utf-8') as f:
+            with open(self.arquivo, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=2, ensure_ascii=False)
             
             self.enviar_mensagem("⏭️ <b>Todos os segmentos restantes aprovados!</b>")
@@ -432,8 +428,6 @@ class TelegramCurator:
                 f"Forçando envio do segmento {atual + 1}/{total}..."
             )
             
-            time.sleep(1)
-            
             if self._enviar_proximo_segmento():
                 self.enviar_mensagem("✅ Segmento reenviado!")
             else:
@@ -446,29 +440,33 @@ class TelegramCurator:
         """Processa cliques nos botões"""
         callback_data = callback['data']
         callback_id = callback['id']
+        acao, _, resto = callback_data.partition('_')
+        num, _, dono = resto.partition('_')
         
-        if not os.path.exists(CURACAO_FILE):
+        if dono != self.execucao_id:
+            # Botão de uma curadoria anterior (ou de outra execução): não mexe nesta
             self._responder_callback(callback_id, "⚠️ Curadoria expirada")
             return
         
-        with open(CURACAO_FILE, 'r', encoding='utf-8') as f:
+        if not os.path.exists(self.arquivo):
+            self._responder_callback(callback_id, "⚠️ Curadoria expirada")
+            return
+        
+        with open(self.arquivo, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
         print(f"🖱️ Botão clicado: {callback_data}")
         
         self._responder_callback(callback_id, "✅ Processando...")
         
-        if callback_data.startswith('aprovar_'):
-            num = int(callback_data.split('_')[1])
-            self._aprovar_segmento(data, num)
+        if acao == 'aprovar':
+            self._aprovar_segmento(data, int(num))
         
-        elif callback_data.startswith('buscar_'):
-            num = int(callback_data.split('_')[1])
-            self._buscar_nova_midia(data, num)
+        elif acao == 'buscar':
+            self._buscar_nova_midia(data, int(num))
         
-        elif callback_data.startswith('url_'):
-            num = int(callback_data.split('_')[1])
-            self._solicitar_url(data, num)
+        elif acao == 'url':
+            self._solicitar_url(data, int(num))
     
     def _aprovar_segmento(self, data, num):
         """Aprova o segmento atual"""
@@ -490,13 +488,11 @@ class TelegramCurator:
             print(f"📍 Era o último segmento ({num}/{total})")
         
         # Salvar
-        with open(CURACAO_FILE, 'w', encoding='utf-8') as f:
+        with open(self.arquivo, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
         
         self.enviar_mensagem(f"✅ <b>Segmento {num} aprovado!</b>")
         
-        time.sleep(2)
-        
         # Enviar próximo ou finalizar
         enviado = self._enviar_proximo_segmento()
         print(f"📤 Tentativa de envio do próximo: {enviado}")
@@ -534,11 +530,10 @@ class TelegramCurator:
                 # NÃO incrementar segmento_atual - reenviar o mesmo
                 data['segmento_atual'] = idx
                 
-                with open(CURACAO_FILE, 'w', encoding='utf-8') as f:
+                with open(self.arquivo, 'w', encoding='utf-8') as f:
                     json.dump(data, f, indent=2, ensure_ascii=False)
                 
                 print(f"✅ Nova mídia encontrada")
-                time.sleep(2)
                 self._enviar_proximo_segmento()
             else:
                 self.enviar_mensagem("⚠️ Não encontrei outra. Tente 🔗!")
@@ -556,7 +551,7 @@ class TelegramCurator:
         data['aguardando_url'] = True
         data['url_segmento'] = idx
         
-        with open(CURACAO_FILE, 'w', encoding='utf-8') as f:
+        with open(self.arquivo, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2, ensure_ascii=False)
         
         self.enviar_mensagem(
@@ -613,15 +608,13 @@ class TelegramCurator:
                 
                 data['aguardando_url'] = False
                 
-                with open(CURACAO_FILE, 'w', encoding='utf-8') as f:
+                with open(self.arquivo, 'w', encoding='utf-8') as f:
                     json.dump(data, f, indent=2, ensure_ascii=False)
                 
                 print(f"✅ URL aplicada ao segmento {num}")
                 
                 self.enviar_mensagem(f"✅ <b>Mídia customizada aplicada!</b>")
                 
-                time.sleep(2)
-                
                 enviado = self._enviar_proximo_segmento()
                 print(f"📤 Tentativa de envio: {enviado}")
             else:
@@ -637,8 +630,9 @@ class TelegramCurator:
             PEXELS_API_KEY = os.environ.get('PEXELS_API_KEY')
             headers = {'Authorization': PEXELS_API_KEY}
             
-            url = f'https://api.pexels.com/videos/videos/{video_id}'
+            url = f"{os.environ.get('PEXELS_API_URL', 'https://api.pexels.com')}/videos/videos/{video_id}"
             response = requests.get(url, headers=headers, timeout=10)
+            cotas.consumir('pexels')
             
             if response.status_code == 200:
                 video = response.json()
@@ -664,8 +658,9 @@ class TelegramCurator:
             PEXELS_API_KEY = os.environ.get('PEXELS_API_KEY')
             headers = {'Authorization': PEXELS_API_KEY}
             
-            url = f'https://api.pexels.com/v1/photos/{foto_id}'
+            url = f"{os.environ.get('PEXELS_API_URL', 'https://api.pexels.com')}/v1/photos/{foto_id}"
             response = requests.get(url, headers=headers, timeout=10)
+            cotas.consumir('pexels')
             
             if response.status_code == 200:
                 foto = response.json()
@@ -677,15 +672,11 @@ class TelegramCurator:
     
     def _responder_callback(self, callback_id, texto):
         """Responde ao callback do botão"""
-        url = f"{self.base_url}/answerCallbackQuery"
-        try:
-            requests.post(url, json={
-                'callback_query_id': callback_id,
-                'text': texto,
-                'show_alert': False
-            }, timeout=5)
-        except:
-            pass
+        self.cliente.disparar('answerCallbackQuery', {
+            'callback_query_id': callback_id,
+            'text': texto,
+            'show_alert': False
+        })
     
     def notificar_publicacao(self, video_info):
         """Notifica publicação"""
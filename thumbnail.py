@@ -0,0 +1,160 @@
+import io
+import os
+import re
+import sys
+import argparse
+import subprocess
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageOps
+
+from legendas import carregar_fonte
+
+LARGURA_AMOSTRA = 320
+# Keyframes perto do começo e do fim costumam ser transição ou tela preta
+MARGEM_BORDAS = 0.05
+LOTE = 16
+PESOS = {'nitidez': 0.45, 'exposicao': 0.25, 'cor': 0.30}
+
+
+def _ffmpeg():
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def amostrar_keyframes(video_path, largura=LARGURA_AMOSTRA):
+    """Decodifica só os keyframes, já reduzidos: (tempos, quadros uint8 (n, h, w, 3))"""
+    processo = subprocess.run([
+        _ffmpeg(), '-hide_banner', '-skip_frame', 'nokey', '-i', video_path, '-an', '-vsync', '0',
+        '-vf', f'scale={largura}:-2,showinfo', '-f', 'rawvideo', '-pix_fmt', 'rgb24', 'pipe:1'
+    ], capture_output=True, check=True, stdin=subprocess.DEVNULL)
+
+    tempos = [float(t) for t in re.findall(r'pts_time:\s*([\d.]+)', processo.stderr.decode('utf-8', 'ignore'))]
+    if not tempos or not processo.stdout:
+        return [], np.zeros((0, 0, largura, 3), dtype=np.uint8)
+
+    altura = len(processo.stdout) // (len(tempos) * largura * 3)
+    quadros = np.frombuffer(processo.stdout, dtype=np.uint8)[:len(tempos) * altura * largura * 3]
+    return tempos, quadros.reshape(len(tempos), altura, largura, 3)
+
+
+def pontuar(quadros):
+    """Nitidez (variância do laplaciano), exposição e colorido de cada quadro, combinados em [0, 1]"""
+    nitidez, brilho, cor = [], [], []
+
+    # Em lotes para não alocar float32 de todos os keyframes de um vídeo longo de uma vez
+    for inicio in range(0, len(quadros), LOTE):
+        q = quadros[inicio:inicio + LOTE].astype(np.float32) / 255
+        r, g, b = q[..., 0], q[..., 1], q[..., 2]
+        cinza = 0.299 * r + 0.587 * g + 0.114 * b
+
+        laplaciano = (cinza[:, :-2, 1:-1] + cinza[:, 2:, 1:-1] + cinza[:, 1:-1, :-2] + cinza[:, 1:-1, 2:]
+                      - 4 * cinza[:, 1:-1, 1:-1])
+        nitidez.append(laplaciano.reshape(len(q), -1).var(axis=1))
+        brilho.append(cinza.reshape(len(q), -1).mean(axis=1))
+
+        # Colorido de Hasler e Süsstrunk
+        rg = (r - g).reshape(len(q), -1)
+        yb = (0.5 * (r + g) - b).reshape(len(q), -1)
+        cor.append(np.hypot(rg.std(axis=1), yb.std(axis=1)) + 0.3 * np.hypot(rg.mean(axis=1), yb.mean(axis=1)))
+
+    nitidez, brilho, cor = np.concatenate(nitidez), np.concatenate(brilho), np.concatenate(cor)
+    exposicao = np.clip(1 - np.abs(brilho - 0.5) * 2, 0, 1)
+
+    def normalizar(valores):
+        return valores / valores.max() if valores.max() > 0 else valores
+
+    return (PESOS['nitidez'] * normalizar(nitidez) + PESOS['exposicao'] * exposicao
+            + PESOS['cor'] * normalizar(cor))
+
+
+def escolher_quadro(video_path):
+    """Tempo do melhor keyframe e as notas de todos: (tempo, [(tempo, nota)])"""
+    tempos, quadros = amostrar_keyframes(video_path)
+    if not tempos:
+        return 0.0, []
+
+    notas = pontuar(quadros)
+    fim = tempos[-1]
+    candidatos = [i for i, t in enumerate(tempos) if MARGEM_BORDAS * fim <= t <= (1 - MARGEM_BORDAS) * fim]
+    melhor = max(candidatos or range(len(tempos)), key=lambda i: notas[i])
+    return tempos[melhor], list(zip(tempos, notas.round(3).tolist()))
+
+
+def extrair_quadro(video_path, tempo):
+    """Quadro em resolução cheia; como tempo é de um keyframe, o seek não decodifica nada antes dele"""
+    processo = subprocess.run([
+        _ffmpeg(), '-hide_banner', '-loglevel', 'error', '-ss', f'{tempo:.3f}', '-i', video_path,
+        '-frames:v', '1', '-f', 'image2pipe', '-vcodec', 'png', 'pipe:1'
+    ], capture_output=True, check=True, stdin=subprocess.DEVNULL)
+    return Image.open(io.BytesIO(processo.stdout)).convert('RGB')
+
+
+def compor(quadro, titulo, tamanho):
+    """Quadro recortado no tamanho da thumbnail, com o título sobre um degradê escuro na parte de baixo"""
+    largura, altura = tamanho
+    imagem = ImageOps.fit(quadro, tamanho, Image.LANCZOS)
+
+    # Degradê: transparente até 45% da altura, 80% de preto na base
+    rampa = np.clip((np.arange(altura) / altura - 0.45) / 0.55, 0, 1) * 0.8
+    pixels = np.asarray(imagem, dtype=np.float32) * (1 - rampa)[:, None, None]
+    imagem = Image.fromarray(pixels.astype(np.uint8))
+
+    fonte = carregar_fonte(round(min(tamanho) * 0.1))
+    if not fonte:
+        print("⚠️ Nenhuma fonte TrueType encontrada - thumbnail sem título")
+        return imagem
+
+    desenho = ImageDraw.Draw(imagem)
+    linhas = []
+    for palavra in titulo.split():
+        tentativa = f'{linhas[-1]} {palavra}' if linhas else palavra
+        if linhas and fonte.getlength(tentativa) <= largura * 0.9:
+            linhas[-1] = tentativa
+        else:
+            linhas.append(palavra)
+    linhas = linhas[:3]
+
+    contorno = max(2, fonte.size // 10)
+    altura_linha = int(fonte.size * 1.15)
+    y = altura - int(altura * 0.06) - altura_linha * len(linhas)
+    for linha in linhas:
+        x = (largura - fonte.getlength(linha)) / 2
+        desenho.text((x, y), linha, font=fonte, fill=(255, 255, 255), stroke_width=contorno, stroke_fill=(0, 0, 0))
+        y += altura_linha
+
+    return imagem
+
+
+def gerar_thumbnail(video_path, titulo, destino, tamanho, tempo=None):
+    """Grava a thumbnail JPEG a partir do keyframe mais nítido/exposto/colorido (ou do `tempo` dado)"""
+    if tempo is None:
+        tempo, _ = escolher_quadro(video_path)
+    imagem = compor(extrair_quadro(video_path, tempo), titulo, tamanho)
+    # O YouTube aceita thumbnails de até 2 MB
+    for qualidade in (90, 80, 70):
+        imagem.save(destino, 'JPEG', quality=qualidade, optimize=True)
+        if os.path.getsize(destino) < 2 * 2**20:
+            break
+    return destino, tempo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Thumbnail a partir dos keyframes de um vídeo')
+    parser.add_argument('video')
+    parser.add_argument('titulo')
+    parser.add_argument('--saida', default='thumbnail.jpg')
+    parser.add_argument('--tamanho', default='1280x720', help='LARGURAxALTURA (short: 720x1280)')
+    args = parser.parse_args(argv)
+
+    tempo, notas = escolher_quadro(args.video)
+    for t, nota in notas:
+        print(f"  {t:8.2f}s  {nota:.3f}{'  ◀' if t == tempo else ''}")
+
+    largura, altura = map(int, args.tamanho.split('x'))
+    gerar_thumbnail(args.video, args.titulo, args.saida, (largura, altura), tempo)
+    print(f"🖼️ {args.saida} (quadro em {tempo:.2f}s)")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,94 @@
+import bisect
+import threading
+
+import numpy as np
+from moviepy.editor import VideoClip
+
+
+class LinhaDoTempo(VideoClip):
+    """Linha do tempo que abre cada fonte só quando o cursor entra na janela dela.
+
+    Substitui o CompositeVideoClip com todas as fontes abertas de antemão: cada
+    segmento é (inicio, duracao, abrir), onde abrir() devolve o clip já
+    recortado/redimensionado com tempo local começando em 0. A fonte é fechada
+    assim que o cursor passa do fim da janela, então o número de leitores ffmpeg
+    e a memória de quadros ficam constantes, qualquer que seja o número de
+    segmentos. Como no CompositeVideoClip, o segmento posterior fica por cima e
+    o que não cobre a tela fica preto.
+    """
+
+    def __init__(self, segmentos, tamanho, duracao):
+        VideoClip.__init__(self, duration=duracao)
+        self.size = tamanho
+        self.make_frame = self._quadro
+
+        self.segmentos = sorted(segmentos, key=lambda s: s[0])
+        self._inicios = [inicio for inicio, _, _ in self.segmentos]
+        self._fundo = np.zeros((tamanho[1], tamanho[0], 3), dtype=np.uint8)
+        self.abertos = {}
+        self.falhas = set()
+        self.pico_abertos = 0
+        self.aberturas = 0
+        self._lock = threading.Lock()
+
+    def _quadro(self, t):
+        with self._lock:
+            ativos = self._ativos(t)
+
+            for indice in list(self.abertos):
+                if indice not in ativos:
+                    self._fechar(indice)
+
+            for indice in reversed(ativos):
+                inicio = self.segmentos[indice][0]
+                clip = self._abrir(indice)
+                if clip is None or t - inicio >= clip.duration:
+                    continue
+                return self._encaixar(clip.get_frame(t - inicio))
+
+            return self._fundo
+
+    def _ativos(self, t):
+        """Índices dos segmentos cuja janela contém t, em ordem de camada"""
+        ultimo = bisect.bisect_right(self._inicios, t)
+        return [i for i in range(ultimo) if t < self.segmentos[i][0] + self.segmentos[i][1]]
+
+    def _abrir(self, indice):
+        if indice in self.abertos:
+            return self.abertos[indice]
+        if indice in self.falhas:
+            return None
+
+        try:
+            clip = self.segmentos[indice][2]()
+        except Exception as e:
+            print(f"⚠️ Erro ao abrir mídia {indice}: {e}")
+            self.falhas.add(indice)
+            return None
+
+        self.abertos[indice] = clip
+        self.aberturas += 1
+        self.pico_abertos = max(self.pico_abertos, len(self.abertos))
+        return clip
+
+    def _fechar(self, indice):
+        clip = self.abertos.pop(indice)
+        try:
+            clip.close()
+        except Exception:
+            pass
+
+    def _encaixar(self, quadro):
+        """Posiciona o quadro no canto superior esquerdo, cortando o excesso e completando com preto"""
+        largura, altura = self.size
+        quadro = quadro[:altura, :largura, :3]
+        if quadro.shape[:2] == (altura, largura):
+            return quadro
+        fundo = self._fundo.copy()
+        fundo[:quadro.shape[0], :quadro.shape[1]] = quadro
+        return fundo
+
+    def close(self):
+        with self._lock:
+            for indice in list(self.abertos):
+                self._fechar(indice)
@@ -0,0 +1,177 @@
+import os
+import re
+import sys
+import json
+import zlib
+import base64
+import unicodedata
+import numpy as np
+from run_log import RunLog
+
+INDICE_FILE = 'indice_similaridade.json'
+NUM_PERMUTACOES = 64
+SEMENTE = 20251213
+PRIMO = (1 << 31) - 1
+
+# Jaccard estimado acima do qual um texto é considerado repetido
+LIMIARES = {
+    'titulo': float(os.environ.get('SIMILARIDADE_TITULO', '0.5')),
+    'roteiro': float(os.environ.get('SIMILARIDADE_ROTEIRO', '0.3')),
+}
+
+STOPWORDS = set(
+    'a o as os e de da do das dos em no na nos nas um uma uns umas que para por com sem '
+    'sobre mais como seu sua seus suas pelo pela pelos pelas ao aos se te voce shorts'.split()
+)
+
+_rng = np.random.RandomState(SEMENTE)
+_A = _rng.randint(1, PRIMO, size=NUM_PERMUTACOES).astype(np.uint64)
+_B = _rng.randint(0, PRIMO, size=NUM_PERMUTACOES).astype(np.uint64)
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos, pontuação e stopwords"""
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return [p for p in re.findall(r'[a-z0-9]+', texto) if p not in STOPWORDS]
+
+
+def shingles(texto, tipo='titulo'):
+    """Trigramas de caracteres por palavra (títulos) ou trigramas de palavras (roteiros)"""
+    palavras = normalizar(texto)
+    if tipo == 'roteiro':
+        return {' '.join(palavras[i:i + 3]) for i in range(max(1, len(palavras) - 2))}
+
+    conjunto = set()
+    for palavra in palavras:
+        palavra = f' {palavra} '
+        for i in range(len(palavra) - 2):
+            conjunto.add(palavra[i:i + 3])
+    return conjunto
+
+
+def assinatura(texto, tipo='titulo'):
+    """Assinatura MinHash (NUM_PERMUTACOES valores uint32)"""
+    conjunto = shingles(texto, tipo)
+    if not conjunto:
+        return np.full(NUM_PERMUTACOES, PRIMO, dtype=np.uint32)
+
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) % PRIMO for s in conjunto),
+                         dtype=np.uint64, count=len(conjunto))
+    valores = (np.outer(hashes, _A) + _B) % PRIMO
+    return valores.min(axis=0).astype(np.uint32)
+
+
+class IndiceSimilaridade:
+    """Índice MinHash de títulos e roteiros publicados para evitar vídeos repetidos.
+
+    As assinaturas ficam numa matriz numpy por tipo; a consulta compara a
+    assinatura nova com todas de uma vez, o que leva bem menos de 1ms para
+    milhares de vídeos.
+    """
+
+    def __init__(self, arquivo=INDICE_FILE):
+        self.arquivo = arquivo
+        self.itens = {'titulo': [], 'roteiro': []}
+        self.matrizes = {}
+        self._carregar()
+
+    def consultar(self, texto, tipo='titulo', limiar=None):
+        """Retorna (similaridade, item) do publicado mais parecido acima do limiar, ou None"""
+        limiar = LIMIARES[tipo] if limiar is None else limiar
+        matriz = self._matriz(tipo)
+        if matriz is None:
+            return None
+
+        similaridades = (matriz == assinatura(texto, tipo)).mean(axis=1)
+        melhor = int(similaridades.argmax())
+        if similaridades[melhor] >= limiar:
+            return float(similaridades[melhor]), self.itens[tipo][melhor]
+        return None
+
+    def adicionar(self, texto, tipo='titulo', ref=None):
+        """Inserção incremental após uma publicação"""
+        self.itens[tipo].append({
+            'ref': ref,
+            'texto': texto[:80],
+            'assinatura': assinatura(texto, tipo)
+        })
+        self.matrizes.pop(tipo, None)
+
+    def reconstruir(self, run_log=None):
+        """Refaz as assinaturas de títulos a partir do log (roteiros só existem no índice)"""
+        run_log = run_log or RunLog()
+        self.itens['titulo'] = []
+        self.matrizes.pop('titulo', None)
+        for entrada in run_log.todos():
+            self.adicionar(entrada.get('tema') or entrada.get('titulo', ''), 'titulo', entrada.get('video_id'))
+
+    def salvar(self):
+        dados = {
+            'num_permutacoes': NUM_PERMUTACOES,
+            'semente': SEMENTE,
+            'itens': {
+                tipo: [
+                    {
+                        'ref': item['ref'],
+                        'texto': item['texto'],
+                        'assinatura': base64.b64encode(item['assinatura'].tobytes()).decode('ascii')
+                    }
+                    for item in itens
+                ]
+                for tipo, itens in self.itens.items()
+            }
+        }
+        temporario = self.arquivo + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temporario, self.arquivo)
+
+    def _carregar(self):
+        if not os.path.exists(self.arquivo):
+            return
+
+        with open(self.arquivo, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+
+        if dados.get('num_permutacoes') != NUM_PERMUTACOES or dados.get('semente') != SEMENTE:
+            print("⚠️ Parâmetros do índice de similaridade mudaram - reconstruindo títulos")
+            self.reconstruir()
+            return
+
+        for tipo, itens in dados['itens'].items():
+            self.itens[tipo] = [
+                {
+                    'ref': item['ref'],
+                    'texto': item['texto'],
+                    'assinatura': np.frombuffer(base64.b64decode(item['assinatura']), dtype=np.uint32)
+                }
+                for item in itens
+            ]
+
+    def _matriz(self, tipo):
+        if not self.itens[tipo]:
+            return None
+        if tipo not in self.matrizes:
+            self.matrizes[tipo] = np.vstack([item['assinatura'] for item in self.itens[tipo]])
+        return self.matrizes[tipo]
+
+
+if __name__ == '__main__':
+    comando = sys.argv[1] if len(sys.argv) > 1 else ''
+
+    if comando == 'reconstruir':
+        indice = IndiceSimilaridade()
+        indice.reconstruir()
+        indice.salvar()
+        print(f"✅ Índice reconstruído: {len(indice.itens['titulo'])} títulos, "
+              f"{len(indice.itens['roteiro'])} roteiros")
+    elif comando == 'consultar' and len(sys.argv) > 2:
+        resultado = IndiceSimilaridade().consultar(' '.join(sys.argv[2:]))
+        if resultado:
+            print(f"♻️ {resultado[0]:.0%} parecido com: {resultado[1]['texto']}")
+        else:
+            print("✅ Nenhum título parecido")
+    else:
+        print("Uso: python title_index.py reconstruir | consultar <título>")
+        sys.exit(1)
@@ -0,0 +1,374 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+
+TRACE_DIR = os.environ.get('TRACE_DIR', 'traces')
+# Grava também <trace>.chrome.json, que abre em chrome://tracing ou ui.perfetto.dev
+TRACE_CHROME = os.environ.get('TRACE_CHROME', 'false').lower() == 'true'
+INTERVALO_AMOSTRAGEM = 0.5
+
+_span_atual = contextvars.ContextVar('span_atual', default=None)
+_tracer_atual = contextvars.ContextVar('tracer_atual', default=None)
+
+
+class Span:
+    """Um trecho cronometrado: etapa do pipeline ou chamada externa"""
+
+    __slots__ = ('id', 'pai', 'nome', 'categoria', 'inicio', 'duracao', 'thread', 'atributos')
+
+    def __init__(self, id_, pai, nome, categoria, inicio, atributos):
+        self.id = id_
+        self.pai = pai
+        self.nome = nome
+        self.categoria = categoria
+        self.inicio = inicio
+        self.duracao = None
+        self.thread = threading.get_ident()
+        self.atributos = atributos
+
+    def anotar(self, **atributos):
+        """Acrescenta atributos (bytes, tentativas...) ao span em andamento"""
+        self.atributos.update(atributos)
+
+    def somar(self, chave, valor):
+        self.atributos[chave] = self.atributos.get(chave, 0) + valor
+
+    def para_dict(self):
+        return {
+            'id': self.id,
+            'pai': self.pai,
+            'nome': self.nome,
+            'categoria': self.categoria,
+            'inicio': round(self.inicio, 4),
+            'duracao': round(self.duracao, 4) if self.duracao is not None else None,
+            'thread': self.thread,
+            'atributos': self.atributos,
+        }
+
+
+class _SpanNulo:
+    """Devolvido por atual() fora de qualquer span, para anotar sem checar None"""
+
+    def anotar(self, **atributos):
+        pass
+
+    def somar(self, chave, valor):
+        pass
+
+
+class Tracer:
+    """Coleta spans de uma execução e grava o trace estruturado.
+
+    Spans se aninham pelo contexto (contextvars), então funcionam igual em
+    threads de asyncio.to_thread e em tarefas asyncio. Tempos são relativos ao
+    início da execução.
+    """
+
+    def __init__(self, nome=None):
+        self.nome = nome
+        self.inicio = time.perf_counter()
+        self.inicio_epoch = time.time()
+        self.data = datetime.now()
+        self.spans = []
+        self._proximo_id = 1
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, nome, categoria='etapa', **atributos):
+        with self._lock:
+            id_ = self._proximo_id
+            self._proximo_id += 1
+        pai = _span_atual.get()
+        span = Span(id_, pai.id if pai else None, nome, categoria, time.perf_counter() - self.inicio, atributos)
+        token = _span_atual.set(span)
+
+        try:
+            yield span
+        except BaseException as e:
+            span.atributos['erro'] = f"{type(e).__name__}: {e}"[:200]
+            raise
+        finally:
+            span.duracao = time.perf_counter() - self.inicio - span.inicio
+            _span_atual.reset(token)
+            with self._lock:
+                self.spans.append(span)
+
+    def registrar(self, nome, categoria, segundos, **atributos):
+        """Registra uma chamada já cronometrada que terminou agora (ex.: streams e geradores)"""
+        pai = _span_atual.get()
+        with self._lock:
+            span = Span(self._proximo_id, pai.id if pai else None, nome, categoria,
+                        time.perf_counter() - self.inicio - segundos, atributos)
+            span.duracao = segundos
+            self._proximo_id += 1
+            self.spans.append(span)
+        return span
+
+    def atual(self):
+        return _span_atual.get() or _SpanNulo()
+
+    def caminho(self, diretorio=TRACE_DIR):
+        sufixo = f'_{self.nome}' if self.nome else ''
+        return os.path.join(diretorio, self.data.strftime('%Y%m%d_%H%M%S') + sufixo + '.json')
+
+    def exportar(self):
+        """Spans em dicts, para devolver de um processo worker e importar() no tracer do job"""
+        with self._lock:
+            return {'inicio_epoch': self.inicio_epoch, 'spans': [span.para_dict() for span in self.spans]}
+
+    def importar(self, exportado):
+        """Acrescenta spans gravados em outro processo, realinhados ao início deste tracer"""
+        deslocamento = exportado['inicio_epoch'] - self.inicio_epoch
+        pai = _span_atual.get()
+        with self._lock:
+            ids = {}
+            for dados in exportado['spans']:
+                ids[dados['id']] = self._proximo_id
+                self._proximo_id += 1
+            for dados in exportado['spans']:
+                span = Span(ids[dados['id']], ids.get(dados['pai'], pai.id if pai else None), dados['nome'],
+                            dados['categoria'], dados['inicio'] + deslocamento, dados['atributos'])
+                span.duracao = dados['duracao']
+                span.thread = dados['thread']
+                self.spans.append(span)
+
+    def resumo(self):
+        """Tempo de cada etapa e totais por tipo de chamada externa, para o log da execução"""
+        with self._lock:
+            spans = list(self.spans)
+
+        etapas = {}
+        chamadas = {}
+        for span in spans:
+            if span.categoria == 'etapa':
+                etapas[span.nome] = round(etapas.get(span.nome, 0) + span.duracao, 2)
+                continue
+
+            c = chamadas.setdefault(span.nome, {'chamadas': 0, 'segundos': 0.0, 'bytes': 0, 'retries': 0, 'erros': 0})
+            c['chamadas'] += 1
+            c['segundos'] += span.duracao
+            c['bytes'] += span.atributos.get('bytes', 0)
+            c['retries'] += max(0, span.atributos.get('tentativas', 1) - 1)
+            c['erros'] += 1 if 'erro' in span.atributos else 0
+
+        for c in chamadas.values():
+            c['segundos'] = round(c['segundos'], 2)
+
+        recursos = {}
+        for span in spans:
+            for chave in ('pico_rss_mb', 'cpu_media', 'cpu_pico', 'processos_filhos_pico', 'fontes_abertas_pico'):
+                if chave in span.atributos:
+                    recursos[f'{span.nome}_{chave}'] = span.atributos[chave]
+
+        return {
+            'total': round(time.perf_counter() - self.inicio, 2),
+            'etapas': etapas,
+            'chamadas': chamadas,
+            'recursos': recursos,
+        }
+
+    def salvar(self, diretorio=TRACE_DIR, chrome=TRACE_CHROME, metadados=None):
+        """Grava traces/<data>.json (e .chrome.json se pedido); retorna o caminho do trace"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.inicio)
+
+        os.makedirs(diretorio, exist_ok=True)
+        base = os.path.splitext(self.caminho(diretorio))[0]
+        trace = {
+            'data': self.data.isoformat(timespec='seconds'),
+            'pid': os.getpid(),
+            'metadados': metadados or {},
+            'resumo': self.resumo(),
+            'spans': [span.para_dict() for span in spans],
+        }
+
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(trace, f, ensure_ascii=False, separators=(',', ':'))
+
+        if chrome:
+            exportar_chrome(trace, base + '.chrome.json')
+
+        return base + '.json'
+
+
+class MonitorRecursos:
+    """Amostra RSS e CPU do processo e dos filhos (ffmpeg) enquanto um trecho roda.
+
+    Lê /proc diretamente (Linux, como no runner do Actions); em outros sistemas
+    cai para o pico de RSS do próprio processo via resource.
+    """
+
+    def __init__(self, span, intervalo=INTERVALO_AMOSTRAGEM):
+        self.span = span
+        self.intervalo = intervalo
+        self.pico_rss = 0
+        self.pico_cpu = 0.0
+        self.pico_processos = 0
+        self._parar = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._tempos_inicio = os.times()
+        self._inicio = time.perf_counter()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+
+        fim = os.times()
+        parede = time.perf_counter() - self._inicio
+        # Filhos só entram em os.times() depois de encerrados, o que vale para o ffmpeg do render
+        cpu = sum(fim[i] - self._tempos_inicio[i] for i in range(4))
+        if not self.pico_rss:
+            self.pico_rss = _rss_proprio_pico()
+
+        self.span.anotar(
+            pico_rss_mb=round(self.pico_rss / 2**20, 1),
+            cpu_media=round(100 * cpu / parede, 1) if parede else 0.0,
+            cpu_pico=round(self.pico_cpu, 1),
+            processos_filhos_pico=self.pico_processos,
+        )
+        return False
+
+    def _amostrar(self):
+        anterior = _cpu_arvore()
+        momento = time.perf_counter()
+        while not self._parar.wait(self.intervalo):
+            pids = _pids_arvore()
+            self.pico_processos = max(self.pico_processos, len(pids) - 1)
+            self.pico_rss = max(self.pico_rss, _rss_arvore(pids))
+            atual = _cpu_arvore(pids)
+            agora = time.perf_counter()
+            if atual is not None and anterior is not None and agora > momento:
+                self.pico_cpu = max(self.pico_cpu, 100 * (atual - anterior) / (agora - momento))
+            anterior, momento = atual, agora
+
+
+def _pids_arvore():
+    """PID do processo e de todos os descendentes, via /proc/<pid>/task/*/children"""
+    pids = [os.getpid()]
+    i = 0
+    while i < len(pids):
+        tarefas = f'/proc/{pids[i]}/task'
+        try:
+            for tid in os.listdir(tarefas):
+                with open(f'{tarefas}/{tid}/children', 'r') as f:
+                    pids.extend(int(p) for p in f.read().split())
+        except OSError:
+            pass
+        i += 1
+    return pids
+
+
+def _rss_arvore(pids):
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/statm', 'r') as f:
+                total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            continue
+    return total
+
+
+def _cpu_arvore(pids=None):
+    """Segundos de CPU (user+system) somados do processo e descendentes vivos; None sem /proc"""
+    if not os.path.isdir('/proc'):
+        return None
+    ticks = os.sysconf('SC_CLK_TCK')
+    total = 0
+    for pid in pids or _pids_arvore():
+        try:
+            with open(f'/proc/{pid}/stat', 'r') as f:
+                campos = f.read().rsplit(')', 1)[1].split()
+            total += int(campos[11]) + int(campos[12])
+        except (OSError, ValueError, IndexError):
+            continue
+    return total / ticks
+
+
+def _rss_proprio_pico():
+    try:
+        import resource
+    except ImportError:
+        return 0
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return pico if sys.platform == 'darwin' else pico * 1024
+
+
+def exportar_chrome(trace, caminho):
+    """Converte o trace para o formato de eventos do Chrome (chrome://tracing, Perfetto)"""
+    pid = trace.get('pid', 0)
+    eventos = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': 'generate_video'}}]
+    for span in trace['spans']:
+        if span['duracao'] is None:
+            continue
+        eventos.append({
+            'name': span['nome'],
+            'cat': span['categoria'],
+            'ph': 'X',
+            'ts': int(span['inicio'] * 1e6),
+            'dur': int(span['duracao'] * 1e6),
+            'pid': pid,
+            'tid': span['thread'],
+            'args': span['atributos'],
+        })
+
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': eventos, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+    return caminho
+
+
+class _TracerAtual:
+    """O `tracer` importado pelos módulos: encaminha para o tracer do job em execução.
+
+    Fora do agendador existe um só tracer por processo; com vários jobs no mesmo
+    processo cada um ativa o seu com usar_tracer().
+    """
+
+    def __init__(self):
+        self._padrao = Tracer()
+
+    def __getattr__(self, nome):
+        return getattr(_tracer_atual.get() or self._padrao, nome)
+
+
+@contextmanager
+def usar_tracer(tracer_job):
+    token = _tracer_atual.set(tracer_job)
+    try:
+        yield tracer_job
+    finally:
+        _tracer_atual.reset(token)
+
+
+tracer = _TracerAtual()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Exporta um trace de execução para o formato do Chrome')
+    parser.add_argument('trace', help='arquivo traces/<data>.json')
+    parser.add_argument('-o', '--saida', help='padrão: <trace>.chrome.json')
+    args = parser.parse_args(argv)
+
+    with open(args.trace, 'r', encoding='utf-8') as f:
+        trace = json.load(f)
+
+    saida = args.saida or os.path.splitext(args.trace)[0] + '.chrome.json'
+    exportar_chrome(trace, saida)
+    print(f"✅ {len(trace['spans'])} spans exportados para {saida}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
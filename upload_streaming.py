@@ -0,0 +1,97 @@
+import os
+import threading
+
+from googleapiclient.http import MediaUpload
+
+# Pedaços de upload resumable precisam ser múltiplos de 256 KiB (menos o último)
+CHUNK = int(os.environ.get('UPLOAD_CHUNK_MB', '8')) * 2**20
+ESPERA = 0.2
+# Bytes do fim do último pedaço enviado conferidos antes do próximo
+CAUDA = 4096
+
+
+class RenderInterrompido(Exception):
+    """O render que alimentava o upload falhou ou reescreveu o arquivo do começo"""
+
+
+class UploadNaoSerializavel(TypeError):
+    """Pedido de to_json() de um upload que acompanha um render em andamento"""
+
+
+class ArquivoCrescendo(MediaUpload):
+    """MediaUpload de um MP4 fragmentado que o render ainda está escrevendo.
+
+    A sessão resumable do YouTube é aberta sem tamanho total e cada pedaço vai
+    com "bytes a-b/*" assim que o arquivo passa dele; só depois de concluir()
+    size() devolve o total e o último pedaço fecha o upload. O googleapiclient
+    decide no size() do início de cada pedaço se ele é o último, então é ali
+    que se espera: enquanto o render não acaba, só segue quando já existe um
+    pedaço inteiro e mais um byte, e o último pedaço nunca sai vazio.
+    abortar() faz o upload falhar sem publicar nada (a sessão fica incompleta).
+    """
+
+    def __init__(self, caminho, chunksize=CHUNK, mimetype='video/mp4'):
+        self.caminho = caminho
+        self._chunksize = chunksize
+        self._mimetype = mimetype
+        self._lido = 0
+        self._total = None
+        self._cauda = b''
+        self._erro = None
+        self._fim = threading.Event()
+
+    def concluir(self):
+        """O render fechou o arquivo: o tamanho atual é o total"""
+        self._total = os.path.getsize(self.caminho)
+        self._fim.set()
+
+    def abortar(self, erro):
+        self._erro = erro
+        self._fim.set()
+
+    def chunksize(self):
+        return self._chunksize
+
+    def mimetype(self):
+        return self._mimetype
+
+    def resumable(self):
+        return True
+
+    def has_stream(self):
+        return False
+
+    def size(self):
+        while not self._fim.is_set() and self._tamanho() <= self._lido + self._chunksize:
+            self._fim.wait(ESPERA)
+        self._verificar()
+        return self._total
+
+    def getbytes(self, begin, length):
+        self._verificar()
+        with open(self.caminho, 'rb') as f:
+            # O compositor reescreve do zero se o render por cortes falhar no meio: o que já subiu não vale mais.
+            # O inode não serve para perceber isso (o arquivo novo costuma herdar o número do apagado)
+            f.seek(self._lido - len(self._cauda))
+            if f.read(len(self._cauda)) != self._cauda:
+                raise RenderInterrompido(f'{os.path.basename(self.caminho)} foi recriado durante o upload')
+            f.seek(begin)
+            dados = f.read(length)
+        self._lido = begin + len(dados)
+        self._cauda = dados[-CAUDA:]
+        return dados
+
+    def _tamanho(self):
+        try:
+            return os.path.getsize(self.caminho)
+        except OSError:
+            return 0
+
+    def _verificar(self):
+        if self._erro is not None:
+            raise RenderInterrompido(str(self._erro))
+
+    def to_json(self):
+        # O googleapiclient serializa uploads para retomá-los em outro processo, mas aqui o estado retomável é o
+        # render: o arquivo ainda cresce e o fim vem por um Event deste processo, que nenhum JSON reconstrói
+        raise UploadNaoSerializavel(f'{os.path.basename(self.caminho)} ainda está sendo renderizado')
@@ -0,0 +1,116 @@
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+
+SCRATCH_DIR = os.environ.get('SCRATCH_DIR', os.path.join('assets', 'execucoes'))
+# 'true': rascunho em memória (tmpfs) quando houver espaço; cai no disco se não houver
+SCRATCH_TMPFS = os.environ.get('SCRATCH_TMPFS', 'false').lower() == 'true'
+TMPFS_DIR = os.environ.get('TMPFS_DIR', '/dev/shm')
+TMPFS_BASE = os.path.join(TMPFS_DIR, 'youtube-automation')
+# Um long baixa e codifica centenas de MB; abaixo disso o tmpfs não compensa o risco de encher a RAM
+TMPFS_LIVRE_MINIMO = int(os.environ.get('TMPFS_LIVRE_MINIMO_MB', '2048')) * 2**20
+MARCADOR = '.dono.json'
+
+
+def _base(tmpfs):
+    if tmpfs and os.path.isdir(TMPFS_DIR) and os.access(TMPFS_DIR, os.W_OK):
+        estado = os.statvfs(TMPFS_DIR)
+        if estado.f_bavail * estado.f_frsize >= TMPFS_LIVRE_MINIMO:
+            return TMPFS_BASE
+        print(f"⚠️ {TMPFS_DIR} com pouco espaço livre - rascunho no disco")
+    return SCRATCH_DIR
+
+
+def _vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AreaTrabalho:
+    """Pasta de rascunho exclusiva de uma execução (áudio, downloads, partes do render, curadoria).
+
+    Cada execução ganha um diretório único sob SCRATCH_DIR (ou no tmpfs com
+    SCRATCH_TMPFS=true) com um marcador do processo dono; limpar() apaga só
+    esse diretório, nunca o resto de assets/. Áreas de processos que morreram
+    sem limpar (mesmo host, PID inexistente) são removidas na criação da
+    próxima, então execuções simultâneas não tocam uma na outra.
+    """
+
+    def __init__(self, nome, base=None, tmpfs=SCRATCH_TMPFS):
+        self.base = base or _base(tmpfs)
+        os.makedirs(self.base, exist_ok=True)
+        limpar_abandonadas(self.base)
+
+        self.pasta = tempfile.mkdtemp(prefix=f"{nome}_{time.strftime('%Y%m%d_%H%M%S')}_", dir=self.base)
+        with open(os.path.join(self.pasta, MARCADOR), 'w', encoding='utf-8') as f:
+            json.dump({'pid': os.getpid(), 'host': socket.gethostname(), 'criado': int(time.time())}, f)
+
+    @property
+    def curacao_file(self):
+        return os.path.join(self.pasta, 'curacao_pendente.json')
+
+    def caminho(self, *partes):
+        return os.path.join(self.pasta, *partes)
+
+    def limpar(self):
+        shutil.rmtree(self.pasta, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.limpar()
+
+
+def limpar_abandonadas(base):
+    """Remove áreas cujo processo dono (neste host) já terminou; retorna quantas"""
+    removidas = 0
+    host = socket.gethostname()
+    try:
+        nomes = os.listdir(base)
+    except OSError:
+        return 0
+
+    for nome in nomes:
+        pasta = os.path.join(base, nome)
+        try:
+            with open(os.path.join(pasta, MARCADOR), 'r', encoding='utf-8') as f:
+                dono = json.load(f)
+        except (OSError, ValueError):
+            # Sem marcador: não foi criada por AreaTrabalho (ou ainda está sendo criada)
+            continue
+        if dono.get('host') == host and not _vivo(dono.get('pid', 0)):
+            shutil.rmtree(pasta, ignore_errors=True)
+            removidas += 1
+    return removidas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Áreas de rascunho das execuções')
+    parser.add_argument('comando', choices=['listar', 'limpar'])
+    parser.add_argument('--tmpfs', action='store_true', help=f'áreas em {TMPFS_DIR} em vez de {SCRATCH_DIR}')
+    args = parser.parse_args(argv)
+
+    base = TMPFS_BASE if args.tmpfs else SCRATCH_DIR
+    if args.comando == 'limpar':
+        print(f"🧹 {limpar_abandonadas(base)} áreas abandonadas removidas")
+
+    for nome in sorted(os.listdir(base)) if os.path.isdir(base) else []:
+        pasta = os.path.join(base, nome)
+        tamanho = sum(os.path.getsize(os.path.join(raiz, arquivo))
+                      for raiz, _, arquivos in os.walk(pasta) for arquivo in arquivos)
+        print(f"📁 {nome}: {tamanho / 2**20:.1f} MB")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])